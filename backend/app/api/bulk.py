@@ -0,0 +1,96 @@
+import json
+from typing import Any, List, Tuple, Type, TypeVar
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def bulk_request_body(item_schema: str) -> dict:
+    """Описание тела пакетного запроса для openapi_extra."""
+    item_ref = {"$ref": f"#/components/schemas/{item_schema}"}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": item_ref}},
+                "application/x-ndjson": {"schema": item_ref},
+            },
+        }
+    }
+
+
+def _too_many(max_items: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Слишком много элементов (максимум {max_items})")
+
+
+async def read_bulk_items(request: Request, max_items: int) -> List[Any]:
+    """Прочитать элементы пакетного запроса: JSON-массив или NDJSON.
+
+    NDJSON разбирается потоково по мере получения тела запроса.
+    Строка NDJSON, которую не удалось разобрать, возвращается как
+    исключение JSONDecodeError на своей позиции и попадает в ошибки элемента.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_MEDIA_TYPES:
+        items: List[Any] = []
+        buffer = b""
+
+        def parse_line(line: bytes) -> None:
+            if not line.strip():
+                return
+            if len(items) >= max_items:
+                raise _too_many(max_items)
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                items.append(e)
+
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                parse_line(line)
+        parse_line(buffer)
+        return items
+
+    try:
+        items = json.loads(await request.body())
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Некорректный JSON: {e}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Ожидается JSON-массив или NDJSON")
+    if len(items) > max_items:
+        raise _too_many(max_items)
+    return items
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'item'}: {err['msg']}"
+        for err in error.errors()
+    )
+
+
+def validate_bulk_items(items: List[Any], model: Type[ModelT]) -> Tuple[List[Tuple[int, ModelT]], dict[int, str]]:
+    """Проверить каждый элемент схемой model.
+
+    Returns:
+      Пары (позиция, объект) для корректных элементов и словарь
+      позиция → текст ошибки для отклонённых
+    """
+    valid: List[Tuple[int, ModelT]] = []
+    errors: dict[int, str] = {}
+    for index, item in enumerate(items):
+        if isinstance(item, json.JSONDecodeError):
+            errors[index] = f"Некорректный JSON: {item}"
+            continue
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as e:
+            errors[index] = _format_validation_error(e)
+    return valid, errors
@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional
+
+from fastapi import HTTPException, Request, Response
+
+from app.services.cache import CachedPayload
+from app.services.etag import parse_note_etag, split_etags
+
+# Клиент может хранить ответ, но обязан перепроверять его (ETag / If-None-Match)
+CACHE_CONTROL = "private, no-cache"
+
+
+def http_date(value: datetime) -> str:
+    """Дата в формате HTTP (RFC 9110, IMF-fixdate)."""
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    """Заголовки ETag, Last-Modified (если известен) и Cache-Control ответа."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def _weak_match(etag: str, candidates: List[str]) -> bool:
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any(c == "*" or (c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Совпадает ли версия клиента с текущей (ответ 304).
+
+    If-None-Match имеет приоритет; If-Modified-Since учитывается только
+    при его отсутствии и сравнивается с точностью до секунды. Без
+    last_modified ответ проверяется только по ETag.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _weak_match(etag, split_etags(if_none_match))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified_response(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
+
+
+def payload_response(payload: CachedPayload) -> Response:
+    """Ответ с уже сериализованным JSON и его валидаторами."""
+    return Response(
+        content=payload.body,
+        media_type="application/json",
+        headers=validator_headers(payload.etag, payload.last_modified),
+    )
+
+
+def if_match_versions(request: Request, note_id: int) -> Optional[List[datetime]]:
+    """Версии заметки (updated_at), допустимые по заголовку If-Match.
+
+    Returns:
+      None, если заголовка нет или он равен "*" (подходит любая версия
+      существующей заметки; если заметки нет, обработчик отвечает 412);
+      иначе список версий из ETag карточки этой заметки. ETag других
+      ответов (например, /full) не сравниваются со строгой версией
+      карточки, и если подходящих нет — сразу 412.
+    """
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return None
+    etags = split_etags(if_match)
+    if "*" in etags:
+        return None
+    # If-Match требует строгого сравнения: слабые ETag не подходят
+    versions = [parse_note_etag(etag, note_id) for etag in etags if not etag.startswith("W/")]
+    versions = [version for version in versions if version is not None]
+    if not versions:
+        raise HTTPException(status_code=412, detail="Версия заметки изменилась")
+    return versions
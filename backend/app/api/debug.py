@@ -0,0 +1,29 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.core.profiling import profile_store
+from app.schemas.debug import RequestProfileOut
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["debug"],
+)
+
+@router.get("/profile", response_model=List[RequestProfileOut], status_code=200,
+    description="Последние профили SQL-запросов, новые первыми")
+async def recent_profiles(
+    limit: int = Query(20, ge=1, le=200, description="Число профилей"),
+    n_plus_one: bool = Query(False, description="Только запросы с признаками N+1")) -> List[RequestProfileOut]:
+    profiles = profile_store.recent(profile_store.max_entries)
+    if n_plus_one:
+        profiles = [profile for profile in profiles if profile.n_plus_one]
+    return profiles[:limit]
+
+@router.get("/profile/{request_id}", response_model=RequestProfileOut, status_code=200,
+    description="Профиль SQL-запросов HTTP-запроса по его X-Request-ID")
+async def get_profile(request_id: str) -> RequestProfileOut:
+    profile = profile_store.get(request_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return profile
@@ -1,9 +1,28 @@
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.replica import get_read_session
 from app.db.session import get_session
+from app.services.graph_service import GraphService
+from app.services.job_service import JobService
+from app.services.loader import NoteLoaders
 from app.services.note_service import NoteService
 from typing import AsyncGenerator
 
 async def get_note_service(db: AsyncSession = Depends(get_session)) -> AsyncGenerator[NoteService, None]:
-   
-   yield NoteService(db)
\ No newline at end of file
+   # Загрузчики живут столько же, сколько сессия запроса
+   yield NoteService(db, loaders=NoteLoaders(db))
+
+
+async def get_read_note_service(db: AsyncSession = Depends(get_read_session)) -> AsyncGenerator[NoteService, None]:
+   # Для GET-обработчиков: сессия на реплике, если она доступна
+   yield NoteService(db, loaders=NoteLoaders(db))
+
+
+async def get_job_service(db: AsyncSession = Depends(get_session)) -> AsyncGenerator[JobService, None]:
+   # Состояние задач читается из основной БД: реплика может отставать от прогресса
+   yield JobService(db)
+
+
+async def get_graph_service(db: AsyncSession = Depends(get_session)) -> AsyncGenerator[GraphService, None]:
+   # Снимок общий для процесса: строится по основной БД, чтобы не закэшировать отставание реплики
+   yield GraphService(db)
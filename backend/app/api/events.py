@@ -0,0 +1,117 @@
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from app.core.config import SETTINGS
+from app.schemas.event import EventSubscriptionUpdate
+from app.services.events import Subscription, change_feed
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"],
+    responses={503: {"description": "Поток изменений отключён"}},
+)
+
+EVENTS_DESCRIPTION = (
+    "События: note.created, note.updated, note.deleted, link.created, link.deleted — "
+    "JSON с полями type, note_ids, related_ids (заметки, у которых изменились связи "
+    "или соседи) и links. resync — события могли потеряться, нужные данные следует "
+    "перечитать. С note_id приходят только события, затрагивающие эти заметки"
+)
+
+
+def _check_note_ids(note_ids: Optional[List[int]]) -> None:
+    if note_ids is not None and len(note_ids) > SETTINGS.batch_max_ids:
+        raise HTTPException(status_code=422, detail=f"Слишком много ID (максимум {SETTINGS.batch_max_ids})")
+
+
+async def _sse_stream(note_ids: Optional[List[int]]) -> AsyncIterator[str]:
+    # Подписка создаётся до первого сообщения: всё, что изменено после
+    # его получения клиентом, придёт в поток
+    subscription = change_feed.subscribe(note_ids)
+    try:
+        yield ": subscribed\n\n"
+        while True:
+            event = await subscription.get(SETTINGS.events_heartbeat_seconds)
+            if event is None:
+                # Пустое сообщение не даёт прокси закрыть простаивающее соединение
+                yield ": ping\n\n"
+            else:
+                yield f"event: {event.type}\ndata: {event.to_json()}\n\n"
+    finally:
+        change_feed.unsubscribe(subscription)
+
+
+@router.get("", status_code=200, response_class=StreamingResponse,
+    description="Поток изменений в формате Server-Sent Events. " + EVENTS_DESCRIPTION)
+async def stream_events(
+    note_id: Optional[List[int]] = Query(None, description="Только события этих заметок")) -> StreamingResponse:
+    if not change_feed.enabled:
+        raise HTTPException(status_code=503, detail="Поток изменений отключён")
+    _check_note_ids(note_id)
+    return StreamingResponse(
+        _sse_stream(note_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _send_events(websocket: WebSocket, subscription: Subscription, lock: asyncio.Lock) -> None:
+    try:
+        while True:
+            event = await subscription.queue.get()
+            async with lock:
+                await websocket.send_text(event.to_json())
+    except (WebSocketDisconnect, RuntimeError):
+        # Клиент отключился; цикл приёма сообщений завершится сам
+        pass
+
+
+@router.websocket("/ws")
+async def events_websocket(websocket: WebSocket,
+    note_id: Optional[List[int]] = Query(None, description="Только события этих заметок")) -> None:
+    """Поток изменений через WebSocket.
+
+    События — те же JSON, что и в GET /events. Набор заметок меняется
+    сообщениями {"action": "subscribe" | "unsubscribe", "note_ids": [...]};
+    в ответ приходит {"type": "subscription", "note_ids": [...]} (null —
+    все события) или {"type": "error", "detail": ...}.
+    """
+    if not change_feed.enabled:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Поток изменений отключён")
+        return
+    if note_id is not None and len(note_id) > SETTINGS.batch_max_ids:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Слишком много ID")
+        return
+
+    await websocket.accept()
+    subscription = change_feed.subscribe(note_id)
+    lock = asyncio.Lock()
+    sender = asyncio.create_task(_send_events(websocket, subscription, lock))
+    try:
+        while True:
+            try:
+                message = EventSubscriptionUpdate.model_validate_json(await websocket.receive_text())
+            except ValidationError as e:
+                reply = {"type": "error", "detail": e.errors(include_url=False, include_context=False)}
+            else:
+                subscribed = subscription.note_ids or set()
+                if message.action == "subscribe" and len(subscribed | set(message.note_ids)) > SETTINGS.batch_max_ids:
+                    reply = {"type": "error", "detail": f"Слишком много ID (максимум {SETTINGS.batch_max_ids})"}
+                else:
+                    if message.action == "subscribe":
+                        subscription.subscribe(message.note_ids)
+                    else:
+                        subscription.unsubscribe(message.note_ids)
+                    note_ids = sorted(subscription.note_ids) if subscription.note_ids is not None else None
+                    reply = {"type": "subscription", "note_ids": note_ids}
+            async with lock:
+                await websocket.send_json(reply)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        change_feed.unsubscribe(subscription)
@@ -0,0 +1,77 @@
+import zlib
+from contextlib import aclosing
+from datetime import datetime
+from typing import AsyncIterator, Literal, Optional
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.db.replica import read_session
+from app.models.note import Note
+from app.schemas.serialization import NOTE_EXPORT, NOTE_LINK_EXPORT
+from app.services.note_service import NoteService
+
+# Строки копятся в буфер и отправляются блоками примерно такого размера
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+)
+
+
+async def _ndjson_lines(request: Request, updated_since: Optional[datetime]) -> AsyncIterator[bytes]:
+    """Выгрузка блоками NDJSON: строки {"type": "note", ...} и {"type": "link", ...}.
+
+    Сессия открывается здесь, а не зависимостью: тело ответа читается уже
+    после выхода из обработчика. Она закрывается по окончании выгрузки
+    или при закрытии генератора (разрыв соединения с клиентом).
+    """
+    async with read_session(request) as db:
+        note_service = NoteService(db)
+        buffer = bytearray()
+        async for item in note_service.export_graph(updated_since):
+            if isinstance(item, Note):
+                buffer += NOTE_EXPORT.dump(item)
+            else:
+                buffer += NOTE_LINK_EXPORT.dump(item)
+            buffer += b"\n"
+            if len(buffer) >= EXPORT_CHUNK_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+
+
+async def _gzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Потоковое сжатие в формат gzip."""
+    compressor = zlib.compressobj(wbits=31)  # 16 + MAX_WBITS: заголовок gzip
+    # При закрытии этого генератора закрывается и исходный (вместе с его сессией)
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+    yield compressor.flush()
+
+
+@router.get("", status_code=200,
+    description="Потоковая выгрузка всех заметок и связей в NDJSON. Сначала идут "
+                "заметки (type=note), затем связи (type=link), всё из одного снимка БД. "
+                "С updated_since выгружаются только изменённые заметки; связи выгружаются "
+                "всегда полностью",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}, "application/gzip": {}}}})
+async def export_graph(
+    request: Request,
+    updated_since: Optional[datetime] = Query(
+        None, description="Выгрузить только заметки, изменённые начиная с этого момента"),
+    compression: Literal["none", "gzip"] = Query("none", description="Сжатие выгрузки")) -> StreamingResponse:
+    body = _ndjson_lines(request, updated_since)
+    if compression == "gzip":
+        return StreamingResponse(
+            _gzip(body),
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="notes-graph.ndjson.gz"'},
+        )
+    return StreamingResponse(body, media_type="application/x-ndjson")
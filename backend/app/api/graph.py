@@ -0,0 +1,77 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from .dependencies import get_graph_service
+from .responses import rows_response
+from app.schemas.graph import GraphStats
+from app.schemas.note import NoteLinkSummary
+from app.schemas.serialization import NOTE_SUMMARY
+from app.services.graph_service import GraphChangedError, GraphService
+from app.services.pagination import InvalidCursorError
+
+router = APIRouter(
+    prefix="/graph",
+    tags=["graph"],
+)
+
+
+def _page_response(response: Response, rows: list, next_cursor: Optional[str]) -> Response:
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows_response(NOTE_SUMMARY, rows, response)
+
+
+@router.get("/stats", response_model=GraphStats, status_code=200,
+    description="Число заметок, связей, корней и листьев, распределение по глубине, "
+                "степени заметок. Считается по снимку графа, который перестраивается "
+                "после изменения связей")
+async def get_graph_stats(graph_service: GraphService = Depends(get_graph_service)) -> GraphStats:
+    return await graph_service.get_stats()
+
+
+@router.get("/roots", response_model=List[NoteLinkSummary], status_code=200,
+    description="Заметки без родителей по возрастанию ID. "
+                "Курсор следующей страницы возвращается в заголовке X-Next-Cursor")
+async def get_graph_roots(response: Response,
+    limit: int = Query(1000, ge=1, le=10000, description="Размер страницы"),
+    after: Optional[str] = Query(None, description="Курсор из X-Next-Cursor предыдущей страницы"),
+    graph_service: GraphService = Depends(get_graph_service)) -> Response:
+    try:
+        rows, next_cursor = await graph_service.get_roots(after, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _page_response(response, rows, next_cursor)
+
+
+@router.get("/leaves", response_model=List[NoteLinkSummary], status_code=200,
+    description="Заметки без детей по возрастанию ID. "
+                "Курсор следующей страницы возвращается в заголовке X-Next-Cursor")
+async def get_graph_leaves(response: Response,
+    limit: int = Query(1000, ge=1, le=10000, description="Размер страницы"),
+    after: Optional[str] = Query(None, description="Курсор из X-Next-Cursor предыдущей страницы"),
+    graph_service: GraphService = Depends(get_graph_service)) -> Response:
+    try:
+        rows, next_cursor = await graph_service.get_leaves(after, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _page_response(response, rows, next_cursor)
+
+
+@router.get("/topo-order", response_model=List[NoteLinkSummary], status_code=200,
+    responses={409: {"description": "Граф изменился, обход нужно начать заново"}},
+    description="Заметки в топологическом порядке: каждая раньше всех своих потомков. "
+                "Заметки на циклах не выдаются (см. acyclic в /graph/stats). Курсор "
+                "следующей страницы — в заголовке X-Next-Cursor; если граф изменился, "
+                "продолжение по курсору возвращает 409")
+async def get_graph_topo_order(response: Response,
+    limit: int = Query(1000, ge=1, le=10000, description="Размер страницы"),
+    after: Optional[str] = Query(None, description="Курсор из X-Next-Cursor предыдущей страницы"),
+    graph_service: GraphService = Depends(get_graph_service)) -> Response:
+    try:
+        rows, next_cursor = await graph_service.get_topo_order(after, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except GraphChangedError:
+        raise HTTPException(status_code=409, detail="Граф изменился, обход нужно начать заново")
+    return _page_response(response, rows, next_cursor)
@@ -0,0 +1,61 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+
+from .dependencies import get_job_service, get_note_service
+from app.core.config import SETTINGS
+from app.schemas.job import BulkImportJob, DeleteSubtreeJob, JobCreate, JobResponse, JobStatus
+from app.services.job_runner import job_runner
+from app.services.job_service import JobService
+from app.services.note_service import NoteService
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+    responses={404: {"description": "Задача не найдена"}},
+)
+
+
+@router.post("", response_model=JobResponse, status_code=202,
+    description="Постановка долгой операции в очередь: bulk_import, delete_subtree "
+                "(с descendants=true — вместе с потомками), rebuild_closure, reindex. "
+                "Выполнение отслеживается по GET /jobs/{id} (адрес — в заголовке Location)")
+async def create_job(response: Response, job: JobCreate = Body(...),
+    job_service: JobService = Depends(get_job_service),
+    note_service: NoteService = Depends(get_note_service)) -> JobResponse:
+    if isinstance(job, BulkImportJob):
+        items = len(job.params.notes) + len(job.params.links)
+        if items > SETTINGS.bulk_max_items:
+            raise HTTPException(status_code=413,
+                                detail=f"Слишком много элементов (максимум {SETTINGS.bulk_max_items})")
+    if isinstance(job, DeleteSubtreeJob) and await note_service.get_note_version(job.params.note_id) is None:
+        raise HTTPException(status_code=404, detail="Заметка не найдена")
+
+    if isinstance(job, BulkImportJob):
+        # Сами данные импорта — в job.payload; в params только их объём
+        created = await job_service.create_job(
+            job.kind, {"notes": len(job.params.notes), "links": len(job.params.links)},
+            payload=job.params.model_dump(mode="json"))
+    else:
+        created = await job_service.create_job(job.kind, job.params.model_dump(mode="json"))
+    job_runner.notify()
+    response.headers["Location"] = f"/jobs/{created.id}"
+    return created
+
+
+@router.get("", response_model=List[JobResponse], status_code=200,
+    description="Последние задачи, новые первыми")
+async def get_jobs(
+    status: Optional[JobStatus] = Query(None, description="Только задачи с этим статусом"),
+    limit: int = Query(50, ge=1, le=500, description="Число задач"),
+    job_service: JobService = Depends(get_job_service)) -> List[JobResponse]:
+    return await job_service.get_jobs(status=status, limit=limit)
+
+
+@router.get("/{job_id}", response_model=JobResponse, status_code=200,
+    description="Состояние и прогресс задачи")
+async def get_job(job_id: int, job_service: JobService = Depends(get_job_service)) -> JobResponse:
+    job = await job_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
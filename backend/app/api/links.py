@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from typing import List
-from .dependencies import get_note_service
-from app.schemas.note import NoteLinkCreate, NoteLinkResponse, NoteResponse
+from .bulk import bulk_request_body, read_bulk_items, validate_bulk_items
+from .dependencies import get_note_service, get_read_note_service
+from .responses import rows_response
+from app.core.config import SETTINGS
+from app.schemas.note import BulkItemResult, BulkResult, NoteLinkCreate, NoteLinkResponse, NoteResponse
+from app.schemas.serialization import NOTE_LINK
 from app.services.note_service import NoteService
 
 from functools import wraps
@@ -35,21 +39,45 @@ router = APIRouter(
 
 @router.post("/", response_model=NoteLinkResponse, status_code=201,
     description="Создание связи между заметками")
-async def create_link(link_data: NoteLinkResponse, 
+async def create_link(link_data: NoteLinkCreate, 
     note_service: NoteService = Depends(get_note_service)) -> NoteLinkResponse:
     try:
         link = await note_service.create_link(link_data)
         if not link:
             raise HTTPException(status_code=400, detail="Связь не создана")
         return link
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка создания связи: {str(e)}")
 
 
+@router.post("/bulk", response_model=BulkResult, status_code=200,
+    description="Пакетное создание связей: JSON-массив NoteLinkCreate или NDJSON. "
+                "Циклы проверяются по существующим связям вместе со всем пакетом",
+    openapi_extra=bulk_request_body("NoteLinkCreate"))
+async def bulk_create_links(request: Request,
+    note_service: NoteService = Depends(get_note_service)) -> BulkResult:
+    items = await read_bulk_items(request, SETTINGS.bulk_max_items)
+    valid, errors = validate_bulk_items(items, NoteLinkCreate)
+    try:
+        outcomes = await note_service.bulk_create_links([link for _, link in valid])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка создания связей: {str(e)}")
+
+    results = [BulkItemResult(index=index, error=error) for index, error in errors.items()]
+    results.extend(
+        BulkItemResult(index=index, id=link_id, error=error)
+        for (index, _), (link_id, error) in zip(valid, outcomes)
+    )
+    results.sort(key=lambda item: item.index)
+    created = sum(1 for item in results if item.id is not None)
+    return BulkResult(created=created, failed=len(results) - created, results=results)
+
 @router.get("/{link_id}", response_model=NoteLinkResponse, status_code=200,
     description="Получение связи между заметками по ID")
 async def get_link_by_id(link_id: int,
-    note_service: NoteService = Depends(get_note_service)) -> NoteLinkResponse:
+    note_service: NoteService = Depends(get_read_note_service)) -> NoteLinkResponse:
     try:
         link = await note_service.get_link_by_id(link_id)
         if not link:
@@ -61,9 +89,9 @@ async def get_link_by_id(link_id: int,
 @router.get("/by-note/{note_id}", response_model=List[NoteLinkResponse], status_code=200,
     description="Получение связей заметки по участию")
 async def get_links_by_participant(note_id: int,
-    note_service: NoteService = Depends(get_note_service)) -> List[NoteLinkResponse]:
+    note_service: NoteService = Depends(get_read_note_service)) -> List[NoteLinkResponse]:
     try:
-        return await note_service.get_links_by_participant(note_id)
+        return rows_response(NOTE_LINK, await note_service.get_links_by_participant(note_id))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения связей: {str(e)}")
 
@@ -1,11 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from .dependencies import get_note_service
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional
+from .bulk import bulk_request_body, read_bulk_items, validate_bulk_items
+from .conditional import (
+    if_match_versions, is_not_modified, not_modified_response, payload_response,
+)
+from .dependencies import get_note_service, get_read_note_service
+from .responses import rows_response
+from app.core.config import SETTINGS
 from app.schemas.note import (
     NoteCreate, NoteUpdate, NoteResponse, NoteWithRelations, 
-    NoteWithRelationsOptimized, NoteLinkSummary
+    NoteWithRelationsOptimized, NoteLinkSummary, NoteWithDepth, NoteSearchHit, NoteGraph,
+    BulkItemResult, BulkResult, NoteBatchRequest, NoteBatchItem
+)
+from app.schemas.serialization import (
+    NOTE_BATCH_ITEM, NOTE_GRAPH, NOTE_RESPONSE, NOTE_SEARCH_HIT, NOTE_SUMMARY, NOTE_WITH_DEPTH,
+)
+from app.services.etag import note_etag
+from app.services.note_service import (
+    NoteBatchFields, NoteService, NoteVersionConflict, TraversalDirection,
+)
+from app.services.pagination import (
+    CatalogOrderBy, InvalidCursorError, SortOrder, catalog_cursor, search_cursor,
 )
-from app.services.note_service import NoteService
 
 from functools import wraps
 from typing import Callable, Any
@@ -43,74 +59,206 @@ async def create_note(note: NoteCreate,
     note_service: NoteService = Depends(get_note_service)) -> NoteResponse:
     return await note_service.create_note(note)
 
+@handle_errors("пакетного создания заметок")
+@router.post("/bulk", response_model=BulkResult, status_code=200,
+    description="Пакетное создание заметок: JSON-массив NoteCreate или NDJSON "
+                "(application/x-ndjson). Все корректные элементы вставляются "
+                "в одной транзакции, ошибки возвращаются по элементам",
+    openapi_extra=bulk_request_body("NoteCreate"))
+async def bulk_create_notes(request: Request,
+    note_service: NoteService = Depends(get_note_service)) -> BulkResult:
+    items = await read_bulk_items(request, SETTINGS.bulk_max_items)
+    valid, errors = validate_bulk_items(items, NoteCreate)
+    note_ids = await note_service.bulk_create_notes([note for _, note in valid])
+
+    results = [BulkItemResult(index=index, error=error) for index, error in errors.items()]
+    results.extend(
+        BulkItemResult(index=index, id=note_id)
+        for (index, _), note_id in zip(valid, note_ids)
+    )
+    results.sort(key=lambda item: item.index)
+    return BulkResult(created=len(note_ids), failed=len(errors), results=results)
+
+@handle_errors("поиска заметок")
+@router.get("/search", response_model=List[NoteSearchHit], status_code=200,
+    description="Полнотекстовый поиск по заголовку и содержимому, по убыванию релевантности. "
+                "Курсор следующей страницы возвращается в заголовке X-Next-Cursor")
+async def search_notes(response: Response,
+    q: str = Query(..., min_length=1, max_length=500, description="Поисковый запрос"),
+    limit: int = Query(20, ge=1, le=100, description="Размер страницы"),
+    after: Optional[str] = Query(None, description="Курсор из X-Next-Cursor предыдущей страницы"),
+    note_service: NoteService = Depends(get_read_note_service)) -> List[NoteSearchHit]:
+    try:
+        hits = await note_service.search_notes(q, limit=limit, after=after)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if hits and len(hits) == limit:
+        response.headers["X-Next-Cursor"] = search_cursor(hits[-1], q)
+    return rows_response(NOTE_SEARCH_HIT, hits, response)
+
+@handle_errors("подсказок заголовков")
+@router.get("/autocomplete", response_model=List[NoteLinkSummary], status_code=200,
+    description="Подсказки заметок по началу или похожести заголовка")
+async def autocomplete_notes(
+    q: str = Query(..., min_length=1, max_length=200, description="Начало заголовка"),
+    limit: int = Query(10, ge=1, le=50, description="Число подсказок"),
+    note_service: NoteService = Depends(get_read_note_service)) -> List[NoteLinkSummary]:
+    return rows_response(NOTE_SUMMARY, await note_service.autocomplete_notes(q, limit=limit))
+
+async def _batch_items(note_service: NoteService, ids: List[int],
+                       fields: NoteBatchFields) -> Response:
+    if len(ids) > SETTINGS.batch_max_ids:
+        raise HTTPException(status_code=413,
+                            detail=f"Слишком много ID (максимум {SETTINGS.batch_max_ids})")
+    rows = await note_service.get_notes_by_ids(ids, fields)
+    serializer = NOTE_SUMMARY if fields == "summary" else NOTE_RESPONSE
+    notes = dict(zip(rows, serializer.to_dicts(list(rows.values()))))
+    items = [{"id": note_id, "found": note_id in notes, "note": notes.get(note_id)} for note_id in ids]
+    return rows_response(NOTE_BATCH_ITEM, items)
+
+@handle_errors("пакетного получения заметок")
+@router.post("/batch", response_model=List[NoteBatchItem], status_code=200,
+    description="Получение многих заметок по ID одним запросом к БД. Ответ идёт "
+                "в порядке ids, отсутствующие заметки помечены found=false")
+async def post_notes_batch(batch: NoteBatchRequest,
+    note_service: NoteService = Depends(get_read_note_service)) -> List[NoteBatchItem]:
+    return await _batch_items(note_service, batch.ids, batch.fields)
+
+@handle_errors("пакетного получения заметок")
+@router.get("/batch", response_model=List[NoteBatchItem], status_code=200,
+    description="То же, что POST /notes/batch: ids повторяющимся параметром "
+                "или через запятую (?ids=1,2,3)")
+async def get_notes_batch(
+    ids: List[str] = Query(..., description="ID заметок"),
+    fields: NoteBatchFields = Query("full", description="summary или full"),
+    note_service: NoteService = Depends(get_read_note_service)) -> List[NoteBatchItem]:
+    try:
+        note_ids = [int(part) for value in ids for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids должны быть целыми числами")
+    if not note_ids:
+        raise HTTPException(status_code=422, detail="Не указаны ids")
+    return await _batch_items(note_service, note_ids, fields)
+
 @handle_errors("получения заметки")
 @router.get("/{note_id}", response_model=NoteResponse, status_code=200,
-    description="Получение полной карточки заметки")
-async def get_note(note_id: int, 
-    note_service: NoteService = Depends(get_note_service)) -> NoteResponse:
-    note = await note_service.get_note(note_id)
-    if not note:
+    description="Получение полной карточки заметки. Поддерживает If-None-Match "
+                "и If-Modified-Since (304 без загрузки содержимого)",
+    responses={304: {"description": "Заметка не изменилась"}})
+async def get_note(note_id: int, request: Request,
+    note_service: NoteService = Depends(get_read_note_service)) -> NoteResponse:
+    version = await note_service.get_note_version(note_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Заметка не найдена")
-    return note
+    etag, last_modified = version
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    payload = await note_service.get_note_payload(note_id, etag=etag)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Заметка не найдена")
+    # Ответ уже сериализован по NoteResponse (возможно, взят из кэша)
+    return payload_response(payload)
 
 @handle_errors("получения каталога заметок")
 @router.get("/", response_model=List[NoteLinkSummary], status_code=200,
-    description="Получение каталога заметок (без контента)")
-async def get_notes(skip: int = 0, limit: int = 100,
-    note_service: NoteService = Depends(get_note_service)) -> List[NoteLinkSummary]:
-    notes = await note_service.get_notes(skip=skip, limit=limit)
-    # Преобразуем в упрощенную схему для каталога
-    return [
-        NoteLinkSummary(id=note.id, title=note.title, importance=note.importance)
-        for note in notes
-    ]
+    description="Получение каталога заметок (без контента). "
+                "Курсор следующей страницы возвращается в заголовке X-Next-Cursor")
+async def get_notes(response: Response, skip: int = 0, limit: int = 100,
+    after: Optional[str] = Query(None, description="Курсор из X-Next-Cursor предыдущей страницы"),
+    order_by: CatalogOrderBy = Query("id", description="Поле сортировки"),
+    order: SortOrder = Query("asc", description="Направление сортировки"),
+    note_service: NoteService = Depends(get_read_note_service)) -> List[NoteLinkSummary]:
+    try:
+        notes = await note_service.get_note_summaries(
+            skip=skip, limit=limit, after=after, order_by=order_by, order=order)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if notes and len(notes) == limit:
+        response.headers["X-Next-Cursor"] = catalog_cursor(notes[-1], order_by, order)
+    # Строки (id, title, importance) сериализуются без создания NoteLinkSummary
+    return rows_response(NOTE_SUMMARY, notes, response)
 
 @handle_errors("получения заметки с связями")
 @router.get("/{note_id}/full", response_model=NoteWithRelationsOptimized, status_code=200,
-    description="Получение заметки с оптимизированными связанными заметками")
+    description="Получение заметки с оптимизированными связанными заметками. "
+                "Поддерживает только If-None-Match: ETag меняется и при добавлении "
+                "или удалении связей, Last-Modified не отдаётся",
+    responses={304: {"description": "Заметка и её связи не изменились"}})
 async def get_full_note(
     note_id: int,
-    note_service: NoteService = Depends(get_note_service)
+    request: Request,
+    note_service: NoteService = Depends(get_read_note_service)
 ) -> NoteWithRelationsOptimized:
-    note = await note_service.get_full_note(note_id)
-    if not note:
+    etag = await note_service.get_full_note_version(note_id)
+    if etag is None:
         raise HTTPException(status_code=404, detail="Заметка не найдена")
-    
-    return NoteWithRelationsOptimized(
-        **note.__dict__,
-        parents=[
-            NoteLinkSummary(id=p.id, title=p.title, importance=p.importance) 
-            for p in note.parents
-        ],
-        children=[
-            NoteLinkSummary(id=c.id, title=c.title, importance=c.importance) 
-            for c in note.children
-        ]
-    )
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    payload = await note_service.get_full_note_payload(note_id, etag=etag)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Заметка не найдена")
+    # Ответ уже сериализован по NoteWithRelationsOptimized (возможно, взят из кэша)
+    return payload_response(payload)
 
 @handle_errors("получения предков")
-@router.get("/{note_id}/ancestors", response_model=List[NoteResponse], status_code=200,
-    description="Получение всех предков заметки")
+@router.get("/{note_id}/ancestors", response_model=List[NoteWithDepth], status_code=200,
+    description="Получение всех предков заметки (каждый предок один раз, с глубиной)")
 async def get_ancestors(note_id: int,
-    note_service: NoteService = Depends(get_note_service)) -> List[NoteResponse]:
-    return await note_service.get_ancestors(note_id)
+    max_depth: Optional[int] = Query(None, ge=1, le=SETTINGS.graph_max_depth,
+                                     description="Максимальная глубина обхода"),
+    limit: Optional[int] = Query(None, ge=1, description="Максимальное число предков"),
+    note_service: NoteService = Depends(get_read_note_service)) -> List[NoteWithDepth]:
+    ancestors = await note_service.get_ancestors(note_id, max_depth=max_depth, limit=limit)
+    return rows_response(NOTE_WITH_DEPTH, ancestors)
 
 @handle_errors("получения потомков")
-@router.get("/{note_id}/descendants", response_model=List[NoteResponse], status_code=200,
-    description="Получение всех потомков заметки")
+@router.get("/{note_id}/descendants", response_model=List[NoteWithDepth], status_code=200,
+    description="Получение всех потомков заметки (каждый потомок один раз, с глубиной)")
 async def get_descendants(note_id: int,
-    note_service: NoteService = Depends(get_note_service)) -> List[NoteResponse]:
-    return await note_service.get_descendants(note_id)
+    max_depth: Optional[int] = Query(None, ge=1, le=SETTINGS.graph_max_depth,
+                                     description="Максимальная глубина обхода"),
+    limit: Optional[int] = Query(None, ge=1, description="Максимальное число потомков"),
+    note_service: NoteService = Depends(get_read_note_service)) -> List[NoteWithDepth]:
+    descendants = await note_service.get_descendants(note_id, max_depth=max_depth, limit=limit)
+    return rows_response(NOTE_WITH_DEPTH, descendants)
 
 
+@handle_errors("получения окрестности заметки")
+@router.get("/{note_id}/graph", response_model=NoteGraph, status_code=200,
+    description="Окрестность заметки до заданной глубины: узлы и связи между ними "
+                "одним ответом. При превышении max_nodes остаются ближайшие узлы")
+async def get_note_graph(note_id: int,
+    depth: int = Query(1, ge=1, le=50, description="Глубина обхода (число связей)"),
+    direction: TraversalDirection = Query("both", description="Направление: up, down или both"),
+    max_nodes: int = Query(200, ge=1, le=SETTINGS.graph_max_nodes,
+                           description="Максимальное число узлов вместе с исходным"),
+    note_service: NoteService = Depends(get_read_note_service)) -> NoteGraph:
+    subgraph = await note_service.get_subgraph(note_id, direction, max_depth=depth, max_nodes=max_nodes)
+    if subgraph is None:
+        raise HTTPException(status_code=404, detail="Заметка не найдена")
+    nodes, edges, truncated = subgraph
+    graph = {"root_id": note_id, "nodes": nodes, "edges": edges, "truncated": truncated}
+    return rows_response(NOTE_GRAPH, graph, many=False)
+
 @handle_errors("обновления заметки")
 @router.put("/{note_id}", response_model=NoteResponse, status_code=200,
-    description="Обновление заметки")
+    description="Обновление заметки. С заголовком If-Match (ETag карточки) "
+                "обновление выполняется, только если заметка не менялась",
+    responses={412: {"description": "Версия заметки изменилась или заметки нет (при If-Match)"}})
 async def update_notes(note_id: int, note_data: NoteUpdate,
+    request: Request, response: Response,
     note_service: NoteService = Depends(get_note_service)) -> NoteResponse:
-    note = await note_service.update_note(note_id, note_data)
+    expected_versions = if_match_versions(request, note_id)
+    try:
+        note = await note_service.update_note(note_id, note_data, expected_versions)
+    except NoteVersionConflict:
+        raise HTTPException(status_code=412, detail="Версия заметки изменилась")
     if not note:
+        # If-Match (и "*") не выполняется, если заметки нет (RFC 9110, 13.1.1)
+        if "if-match" in request.headers:
+            raise HTTPException(status_code=412, detail="Заметка не найдена")
         raise HTTPException(status_code=404, detail="Заметка не найдена")
+    response.headers["ETag"] = note_etag(note.id, note.updated_at)
     return note
 
 @handle_errors("удаления заметки")
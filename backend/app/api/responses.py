@@ -0,0 +1,25 @@
+from typing import Any, Optional
+
+from fastapi import Response
+
+from app.schemas.serialization import RowSerializer
+
+
+def rows_response(serializer: RowSerializer, rows: Any, response: Optional[Response] = None,
+                  many: bool = True) -> Response:
+    """Ответ с JSON, сериализованным из строк запроса без создания моделей.
+
+    Обработчик возвращает готовый Response, поэтому FastAPI не валидирует
+    его по response_model (она остаётся только для схемы OpenAPI).
+
+    Args:
+      serializer: сериализатор модели ответа
+      rows: строки (many=True) или один объект
+      response: Response из параметров обработчика; его заголовки
+        (например, X-Next-Cursor) переносятся в ответ
+    """
+    body = serializer.dump_many(rows) if many else serializer.dump(rows)
+    result = Response(content=body, media_type="application/json")
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
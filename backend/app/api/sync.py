@@ -0,0 +1,33 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from .dependencies import get_read_note_service
+from .responses import rows_response
+from app.schemas.note import SyncPage
+from app.schemas.serialization import SYNC_PAGE
+from app.services.note_service import NoteService
+from app.services.pagination import InvalidCursorError
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["sync"],
+)
+
+
+@router.get("", response_model=SyncPage, status_code=200,
+    description="Изменения заметок и связей после токена since: созданные и изменённые "
+                "заметки, созданные связи, ID удалённых заметок и связей. Без since — всё "
+                "содержимое (первая синхронизация). Пока has_more=true, следующую страницу "
+                "запрашивают сразу с next_token; последний next_token сохраняется до "
+                "следующей синхронизации. Изменение может прийти повторно — применение "
+                "идемпотентно")
+async def sync(
+    since: Optional[str] = Query(None, description="next_token предыдущего ответа"),
+    limit: int = Query(1000, ge=1, le=10000, description="Максимум изменений на странице"),
+    note_service: NoteService = Depends(get_read_note_service)) -> Response:
+    try:
+        page = await note_service.get_changes(since, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return rows_response(SYNC_PAGE, page, many=False)
@@ -0,0 +1,30 @@
+"""Перестроение таблицы note_closure по существующим связям.
+
+Запуск: python -m app.commands.rebuild_closure
+"""
+import asyncio
+
+from app.db.session import SessionLocal, engine
+from app.services.note_service import NoteService
+
+
+async def rebuild_closure() -> int:
+    """Перестроить замыкание в одной транзакции под блокировкой графа."""
+    async with SessionLocal() as session:
+        note_service = NoteService(session, closure_enabled=True)
+        await note_service.lock_link_graph()
+        total = await note_service.closure.rebuild()
+        await session.commit()
+    return total
+
+
+async def main() -> None:
+    try:
+        total = await rebuild_closure()
+        print(f"note_closure перестроена: {total} пар")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
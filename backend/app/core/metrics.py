@@ -0,0 +1,250 @@
+"""Метрики приложения в текстовом формате Prometheus.
+
+Счётчики и гистограммы ведутся в памяти процесса; при нескольких
+воркерах каждый отдаёт свои значения.
+
+RequestMetricsMiddleware для каждого запроса считает число и суммарное
+время SQL-запросов (через app.db.statements) и время ответа вместе с
+отправкой тела, а медленные запросы пишет в лог вместе с их SQL.
+"""
+import logging
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from app.core.config import SETTINGS
+from app.db.statements import StatementRecorder, record_statements
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Сколько SQL-запросов медленного запроса попадает в лог
+SLOW_LOG_MAX_STATEMENTS = 50
+SLOW_LOG_MAX_SQL_LENGTH = 500
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # Для каждого набора меток: счётчики по корзинам, сумма, количество
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        counts, totals = self._values.setdefault(label_values, ([0] * len(self.buckets), [0.0, 0]))
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        totals[0] += value
+        totals[1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, (total, count)) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _labels(self.label_names, label_values, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _labels(self.label_names, label_values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {int(count)}")
+            labels = _labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {int(count)}")
+        return lines
+
+
+def gauge_lines(name: str, help_text: str, value: float, kind: str = "gauge") -> List[str]:
+    """Одна метрика без меток (значение снимается в момент запроса /metrics)."""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {_number(value)}"]
+
+
+REQUESTS = Counter("http_requests_total", "Число HTTP-запросов", ("method", "route", "status"))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Время обработки HTTP-запроса",
+                            ("method", "route"))
+REQUEST_DB_STATEMENTS = Histogram("http_request_db_statements", "Число SQL-запросов на HTTP-запрос",
+                                  ("method", "route"), buckets=STATEMENT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Суммарное время SQL-запросов на HTTP-запрос",
+                               ("method", "route"))
+SLOW_REQUESTS = Counter("http_slow_requests_total", "Число запросов медленнее SLOW_REQUEST_SECONDS",
+                        ("method", "route"))
+
+REQUEST_METRICS = (REQUESTS, REQUEST_SECONDS, REQUEST_DB_STATEMENTS, REQUEST_DB_SECONDS, SLOW_REQUESTS)
+
+
+def _route_label(scope: dict) -> str:
+    # Шаблон пути, а не сам путь: /notes/{note_id}, а не /notes/42
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _log_slow_request(method: str, path: str, status: int, duration: float,
+                      recorder: StatementRecorder) -> None:
+    statements = "\n".join(
+        f"  {s.duration * 1000:.1f} мс  {s.sql[:SLOW_LOG_MAX_SQL_LENGTH]}"
+        for s in recorder.statements[:SLOW_LOG_MAX_STATEMENTS]
+    )
+    logger.warning(
+        "Медленный запрос %s %s -> %s: %.3f с, SQL-запросов %d (%.3f с)\n%s",
+        method, path, status, duration, recorder.count, recorder.total_time, statements,
+    )
+
+
+class RequestMetricsMiddleware:
+    """ASGI-middleware: метрики по маршрутам и лог медленных запросов.
+
+    Время считается до отправки последнего блока тела, поэтому для
+    потоковых ответов (GET /export) учитывается вся выгрузка. Потоки
+    событий (text/event-stream) в лог медленных запросов не попадают.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        event_stream = False
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status, event_stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                event_stream = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", ()))
+            await send(message)
+
+        with record_statements() as recorder:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                duration = time.perf_counter() - start
+                method, route = scope["method"], _route_label(scope)
+                REQUESTS.inc(method, route, str(status))
+                REQUEST_SECONDS.observe(duration, method, route)
+                REQUEST_DB_STATEMENTS.observe(recorder.count, method, route)
+                REQUEST_DB_SECONDS.observe(recorder.total_time, method, route)
+                threshold = SETTINGS.slow_request_seconds
+                if threshold and duration >= threshold and not event_stream:
+                    SLOW_REQUESTS.inc(method, route)
+                    _log_slow_request(method, scope["path"], status, duration, recorder)
+
+
+def pool_metric_lines(stats: dict) -> List[str]:
+    """Метрики пула соединений из app.db.pool.pool_stats()."""
+    lines: List[str] = []
+    for key, help_text in (
+        ("size", "Размер пула соединений"),
+        ("checked_out", "Соединения, выданные из пула"),
+        ("checked_in", "Свободные соединения в пуле"),
+        ("overflow", "Соединения сверх размера пула"),
+    ):
+        lines += gauge_lines(f"db_pool_{key}", help_text, stats[key])
+    for key, help_text in (
+        ("checkouts", "Выдачи соединений из пула"),
+        ("checkout_timeouts", "Отказы из-за истечения ожидания соединения"),
+        ("checkout_wait_seconds", "Суммарное ожидание соединения"),
+        ("connects", "Новые соединения с БД"),
+        ("invalidations", "Инвалидированные соединения"),
+    ):
+        value = stats["checkout_wait_seconds_total"] if key == "checkout_wait_seconds" else stats[key]
+        lines += gauge_lines(f"db_pool_{key}_total", help_text, value, kind="counter")
+    return lines
+
+
+def cache_metric_lines(stats: dict) -> List[str]:
+    """Метрики кэша заметок из NoteCache.stats(); пусто, если кэш выключен."""
+    if not stats.get("enabled"):
+        return []
+    lines = gauge_lines("note_cache_entries", "Записей в кэше заметок", stats["entries"])
+    lines += gauge_lines("note_cache_bytes", "Объём кэша заметок", stats["bytes"])
+    for key in ("hits", "misses", "evictions", "expirations", "invalidations"):
+        lines += gauge_lines(f"note_cache_{key}_total", f"Кэш заметок: {key}", stats[key], kind="counter")
+    return lines
+
+
+def replica_metric_lines(stats: dict) -> List[str]:
+    """Метрики реплики для чтения; пусто, если реплика не настроена."""
+    if not stats.get("configured"):
+        return []
+    lines = gauge_lines("db_replica_healthy", "Реплика доступна для чтения", int(stats["healthy"]))
+    if stats.get("lag_seconds") is not None:
+        lines += gauge_lines("db_replica_lag_seconds", "Отставание реплики", stats["lag_seconds"])
+    return lines
+
+
+def events_metric_lines(stats: dict) -> List[str]:
+    """Метрики потока изменений (app.services.events); пусто, если он выключен."""
+    if not stats.get("enabled"):
+        return []
+    lines = gauge_lines("events_listener_connected", "Соединение LISTEN установлено", int(stats["connected"]))
+    lines += gauge_lines("events_subscribers", "Подписчики /events", stats["subscribers"])
+    lines += gauge_lines("events_received_total", "Полученные уведомления", stats["received"], kind="counter")
+    lines += gauge_lines("events_dropped_total", "Переполнения очередей подписчиков", stats["dropped"], kind="counter")
+    lines += gauge_lines("events_reconnects_total", "Переподключения LISTEN", stats["reconnects"], kind="counter")
+    return lines
+
+
+def graph_snapshot_metric_lines(stats: dict) -> List[str]:
+    """Метрики снимка графа для /graph/* (GraphSnapshotCache.stats())."""
+    lines = gauge_lines("graph_snapshot_cached", "Снимок графа построен и актуален", int(stats["cached"]))
+    lines += gauge_lines("graph_snapshot_builds_total", "Построения снимка графа", stats["builds"], kind="counter")
+    lines += gauge_lines("graph_snapshot_invalidations_total", "Сбросы снимка графа", stats["invalidations"],
+                         kind="counter")
+    return lines
+
+
+def render_metrics(extra: Iterable[List[str]] = ()) -> str:
+    """Все метрики запросов и дополнительные блоки строк в формате Prometheus."""
+    lines: List[str] = []
+    for metric in REQUEST_METRICS:
+        lines.extend(metric.render())
+    for block in extra:
+        lines.extend(block)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,160 @@
+"""Профилирование SQL по запросам в режиме отладки (DEBUG_PROFILING).
+
+ProfilingMiddleware записывает все SQL-запросы каждого HTTP-запроса,
+схлопывает одинаковые по форме (литералы и параметры заменяются на ?)
+и помечает как N+1 формы, выполненные не меньше N_PLUS_ONE_THRESHOLD раз.
+Краткая сводка возвращается в заголовке X-Debug-Profile, полная — по
+GET /debug/profile/{request_id}.
+"""
+import logging
+import re
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.core.config import SETTINGS
+from app.db.statements import RecordedStatement, record_statements
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+PROFILE_HEADER = "X-Debug-Profile"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"\$\d+|%\(\w+\)s|%s|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(sql: str) -> str:
+    """Форма запроса: литералы и параметры заменены на ?, списки IN схлопнуты."""
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _PARAMETER.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("(...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+@dataclass
+class StatementShape:
+    """Запросы одной формы в рамках HTTP-запроса."""
+    shape: str
+    count: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+
+@dataclass
+class RequestProfile:
+    request_id: str
+    method: str
+    path: str
+    started_at: datetime
+    status: int = 0
+    duration: float = 0.0
+    statement_count: int = 0
+    db_time: float = 0.0
+    shapes: List[StatementShape] = field(default_factory=list)
+    n_plus_one: List[str] = field(default_factory=list)
+
+
+def summarize(statements: List[RecordedStatement], threshold: int) -> tuple:
+    """Формы запросов по убыванию суммарного времени и формы с признаками N+1."""
+    by_shape: Dict[str, StatementShape] = {}
+    for statement in statements:
+        shape = statement_shape(statement.sql)
+        entry = by_shape.setdefault(shape, StatementShape(shape))
+        entry.count += 1
+        entry.total_time += statement.duration
+        entry.max_time = max(entry.max_time, statement.duration)
+    shapes = sorted(by_shape.values(), key=lambda s: s.total_time, reverse=True)
+    n_plus_one = [s.shape for s in shapes if s.count >= threshold]
+    return shapes, n_plus_one
+
+
+class ProfileStore:
+    """Последние профили запросов (не больше max_entries)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+
+    def add(self, profile: RequestProfile) -> None:
+        self._profiles[profile.request_id] = profile
+        self._profiles.move_to_end(profile.request_id)
+        while len(self._profiles) > self.max_entries:
+            self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[RequestProfile]:
+        return self._profiles.get(request_id)
+
+    def recent(self, limit: int) -> List[RequestProfile]:
+        return list(reversed(self._profiles.values()))[:limit]
+
+
+profile_store = ProfileStore(SETTINGS.debug_profile_history)
+
+
+def _summary_header(profile: RequestProfile) -> str:
+    return (
+        f"statements={profile.statement_count}; db_ms={profile.db_time * 1000:.1f}; "
+        f"shapes={len(profile.shapes)}; n_plus_one={len(profile.n_plus_one)}; "
+        f"url=/debug/profile/{profile.request_id}"
+    )
+
+
+class ProfilingMiddleware:
+    """ASGI-middleware профилирования; подключается только при DEBUG_PROFILING.
+
+    ID запроса берётся из заголовка X-Request-ID или генерируется. Заголовок
+    X-Debug-Profile содержит запросы, выполненные до начала ответа; для
+    потоковых ответов полный профиль доступен по /debug/profile/{id}.
+    """
+
+    def __init__(self, app, threshold: Optional[int] = None):
+        self.app = app
+        self.threshold = threshold or SETTINGS.n_plus_one_threshold
+
+    def _build(self, profile: RequestProfile, statements: List[RecordedStatement]) -> None:
+        profile.statement_count = len(statements)
+        profile.db_time = sum(s.duration for s in statements)
+        profile.shapes, profile.n_plus_one = summarize(statements, self.threshold)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/debug/"):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(REQUEST_ID_HEADER.lower().encode(), b"").decode() or uuid.uuid4().hex
+        profile = RequestProfile(request_id, scope["method"], scope["path"], datetime.now(timezone.utc))
+        start = time.perf_counter()
+
+        with record_statements() as recorder:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    profile.status = message["status"]
+                    self._build(profile, list(recorder.statements))
+                    message = {**message, "headers": [
+                        *message.get("headers", []),
+                        (REQUEST_ID_HEADER.encode(), request_id.encode()),
+                        (PROFILE_HEADER.encode(), _summary_header(profile).encode()),
+                    ]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profile.duration = time.perf_counter() - start
+                self._build(profile, recorder.statements)
+                profile_store.add(profile)
+                if profile.n_plus_one:
+                    logger.warning(
+                        "Возможный N+1 в %s %s (%s): %s", profile.method, profile.path, request_id,
+                        "; ".join(f"{s.count}× {s.shape[:200]}" for s in profile.shapes
+                                  if s.shape in profile.n_plus_one),
+                    )
@@ -0,0 +1,74 @@
+"""Пул соединений с учётом ожидания и событий соединений.
+
+Счётчики общие для процесса (pool_metrics), чтобы переживать пересоздание
+пула при engine.dispose().
+"""
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+@dataclass
+class PoolMetrics:
+    """Накопленные счётчики пула с момента запуска процесса."""
+    checkouts: int = 0
+    checkout_timeouts: int = 0
+    checkout_wait_seconds_total: float = 0.0
+    checkout_wait_seconds_max: float = 0.0
+    connects: int = 0
+    invalidations: int = 0
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool, измеряющий время ожидания свободного соединения.
+
+    Время включает установку нового соединения, если пул его создаёт.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.checkout_timeouts += 1
+            raise
+        waited = time.perf_counter() - start
+        pool_metrics.checkouts += 1
+        pool_metrics.checkout_wait_seconds_total += waited
+        pool_metrics.checkout_wait_seconds_max = max(pool_metrics.checkout_wait_seconds_max, waited)
+        return connection
+
+
+def _on_connect(dbapi_connection, connection_record) -> None:
+    pool_metrics.connects += 1
+
+
+def _on_invalidate(dbapi_connection, connection_record, exception) -> None:
+    pool_metrics.invalidations += 1
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Подсчёт новых и инвалидированных соединений пула engine."""
+    event.listen(engine.sync_engine, "connect", _on_connect)
+    event.listen(engine.sync_engine, "invalidate", _on_invalidate)
+
+
+def pool_stats(pool) -> dict:
+    """Текущее состояние пула и накопленные счётчики."""
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "timeout_seconds": pool.timeout(),
+    }
+    stats.update(vars(pool_metrics))
+    return stats
@@ -0,0 +1,162 @@
+"""Маршрутизация чтения на реплику.
+
+GET-обработчики получают сессию через get_read_session: она открывается
+на реплике, если реплика настроена, доступна и отстаёт не больше
+db_replica_max_lag_seconds, а клиент недавно ничего не записывал. Иначе
+используется основная БД.
+
+Чтение своих записей: после успешного изменяющего запроса клиенту
+ставится cookie PRIMARY_COOKIE на db_read_your_writes_seconds, и пока она
+есть, его чтения идут в основную БД.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core.config import SETTINGS
+from app.db.session import ReplicaSessionLocal, SessionLocal, replica_engine
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_COOKIE = "notes_read_primary"
+
+# Отставание реплики в секундах. Если всё полученное WAL уже применено,
+# реплика не отстаёт, даже если последняя транзакция была давно.
+# Не реплика (pg_is_in_recovery() = false) — отставание 0.
+_LAG_SQL = text("""
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+""")
+
+
+class ReplicaMonitor:
+    """Периодическая проверка доступности и отставания реплики.
+
+    До первой успешной проверки реплика считается недоступной.
+    """
+
+    def __init__(self, engine: Optional[AsyncEngine], max_lag_seconds: float, interval: float):
+        self.engine = engine
+        self.max_lag_seconds = max_lag_seconds
+        self.interval = interval
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def probe(self) -> None:
+        try:
+            async with self.engine.connect() as connection:
+                lag = (await connection.execute(_LAG_SQL)).scalar()
+        except (SQLAlchemyError, OSError) as e:
+            self.mark_down(e)
+            return
+        self.lag_seconds = float(lag or 0)
+        self.healthy = self.lag_seconds <= self.max_lag_seconds
+        self.last_error = None if self.healthy else f"Отставание {self.lag_seconds:.1f} с"
+
+    def mark_down(self, error: Exception) -> None:
+        if self.healthy:
+            logger.warning("Реплика недоступна, чтение переключено на основную БД: %s", error)
+        self.healthy = False
+        self.lag_seconds = None
+        self.last_error = str(error)
+
+    async def _run(self) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.engine is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "configured": self.engine is not None,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "error": self.last_error,
+        }
+
+
+replica_monitor = ReplicaMonitor(
+    replica_engine,
+    max_lag_seconds=SETTINGS.db_replica_max_lag_seconds,
+    interval=SETTINGS.db_replica_check_interval,
+)
+
+
+def reads_from_primary(request: Request) -> bool:
+    """Должен ли этот запрос читать из основной БД."""
+    return (
+        ReplicaSessionLocal is None
+        or not replica_monitor.healthy
+        or PRIMARY_COOKIE in request.cookies
+    )
+
+
+def mark_wrote(response: Response) -> None:
+    """Закрепить чтения клиента за основной БД после его записи."""
+    if ReplicaSessionLocal is None:
+        return
+    response.set_cookie(
+        PRIMARY_COOKIE, "1",
+        max_age=SETTINGS.db_read_your_writes_seconds,
+        httponly=True,
+        samesite="lax",
+    )
+
+
+@asynccontextmanager
+async def read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """Сессия для чтения — на реплике или в основной БД.
+
+    Доступность реплики проверяется получением соединения из её пула;
+    если это не удалось, реплика помечается недоступной и запрос
+    выполняется в основной БД. Сама сессия открывает соединение лениво,
+    поэтому параметры транзакции (NoteService._begin_snapshot) применяются.
+    """
+    if not reads_from_primary(request):
+        try:
+            # Отдельная проверка, а не session.connection(): у уже открытой
+            # транзакции сессии нельзя сменить уровень изоляции и режим чтения.
+            # Соединение возвращается в пул (LIFO) и достаётся этой же сессии.
+            async with replica_engine.connect():
+                pass
+        except (SQLAlchemyError, OSError) as e:
+            replica_monitor.mark_down(e)
+        else:
+            async with ReplicaSessionLocal() as session:
+                yield session
+            return
+    async with SessionLocal() as session:
+        yield session
+
+
+async def get_read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """Зависимость: сессия для чтения на время обработки запроса (см. read_session).
+
+    Потоковым ответам она не подходит: тело отправляется после выхода из
+    обработчика, и сессия к этому времени может быть уже закрыта.
+    """
+    async with read_session(request) as session:
+        yield session
@@ -1,21 +1,77 @@
-from typing import AsyncIterator
+from typing import AsyncIterator, Optional
+from uuid import uuid4
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
-from app.core.config import SETTINGS
+from app.core.config import SETTINGS, Settings
+from app.db import statements  # noqa: F401  # регистрирует учёт SQL-запросов
+from app.db.pool import InstrumentedPool, instrument_engine
 
-engine = create_async_engine(
-    SETTINGS.sqlalchemy_url, 
-    echo=False, 
-    pool_pre_ping=True
+
+def _prepared_statement_name() -> str:
+    # Уникальные имена: через PgBouncer соседние запросы могут попасть
+    # в одно серверное соединение, и совпадение имён дало бы ошибку
+    return f"__asyncpg_{uuid4()}__"
+
+
+def connect_args(settings: Settings) -> dict:
+    """Параметры asyncpg.connect() для настроек settings."""
+    args: dict = {
+        "timeout": settings.db_connect_timeout,
+        "command_timeout": settings.db_command_timeout,
+    }
+    if settings.db_pgbouncer:
+        # В режиме transaction подготовленный запрос не переживает транзакцию
+        args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=_prepared_statement_name,
+        )
+    else:
+        args.update(
+            statement_cache_size=settings.db_statement_cache_size,
+            prepared_statement_cache_size=settings.db_statement_cache_size,
+        )
+    return args
+
+
+# Вместо pre-ping (лишний запрос при каждой выдаче соединения):
+# - pool_recycle закрывает соединения раньше idle-таймаутов сервера и PgBouncer;
+# - LIFO держит в работе недавно использованные соединения, а редко нужные
+#   стареют и пересоздаются по pool_recycle;
+# - соединение, на котором запрос упал с ошибкой разрыва, SQLAlchemy
+#   инвалидирует вместе с остальными соединениями пула.
+_ENGINE_OPTIONS = dict(
+    echo=False,
+    pool_size=SETTINGS.db_pool_size,
+    max_overflow=SETTINGS.db_max_overflow,
+    pool_timeout=SETTINGS.db_pool_timeout,
+    pool_recycle=SETTINGS.db_pool_recycle,
+    pool_pre_ping=SETTINGS.db_pool_pre_ping,
+    pool_use_lifo=True,
+    connect_args=connect_args(SETTINGS),
 )
 
+engine = create_async_engine(SETTINGS.sqlalchemy_url, poolclass=InstrumentedPool, **_ENGINE_OPTIONS)
+instrument_engine(engine)
+
 SessionLocal = async_sessionmaker(
-    bind=engine, 
-    expire_on_commit=False, 
+    bind=engine,
+    expire_on_commit=False,
     class_=AsyncSession
 )
 
+# Реплика для чтения (см. app.db.replica); метрики пула считаются только для основной БД
+replica_engine: Optional[AsyncEngine] = (
+    create_async_engine(SETTINGS.db_replica_url, **_ENGINE_OPTIONS)
+    if SETTINGS.db_replica_url else None
+)
+
+ReplicaSessionLocal: Optional[async_sessionmaker] = (
+    async_sessionmaker(bind=replica_engine, expire_on_commit=False, class_=AsyncSession)
+    if replica_engine is not None else None
+)
+
 
 async def get_session() -> AsyncIterator[AsyncSession]:
     """Зависимость для получения асинхронной сессии БД."""
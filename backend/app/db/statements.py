@@ -0,0 +1,108 @@
+"""Учёт SQL-запросов, выполненных в текущем контексте.
+
+Слушатели событий SQLAlchemy навешиваются на класс Engine, поэтому
+учитываются запросы всех движков приложения. Запись ведётся только
+внутри record_statements(), вне его события игнорируются.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass
+class RecordedStatement:
+    """Выполненный SQL-запрос."""
+    sql: str
+    duration: float  # секунды
+    executemany: bool = False
+
+
+@dataclass
+class StatementRecorder:
+    """Список запросов, выполненных внутри record_statements()."""
+    statements: List[RecordedStatement] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def total_time(self) -> float:
+        return sum(s.duration for s in self.statements)
+
+
+_current: ContextVar[Optional[List[StatementRecorder]]] = ContextVar("statement_recorders", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any,
+                           context: Any, executemany: bool) -> None:
+    if _current.get():
+        conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any,
+                          context: Any, executemany: bool) -> None:
+    recorders = _current.get()
+    starts = conn.info.get("statement_start")
+    if not recorders or not starts:
+        return
+    recorded = RecordedStatement(statement, time.perf_counter() - starts.pop(), executemany)
+    for recorder in recorders:
+        recorder.statements.append(recorded)
+
+
+@contextmanager
+def record_statements() -> Iterator[StatementRecorder]:
+    """Записывать запросы, выполненные внутри блока (допускается вложенность)."""
+    recorder = StatementRecorder()
+    token = _current.set([*(_current.get() or []), recorder])
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_statements(limit: int, label: str = "") -> Iterator[StatementRecorder]:
+    """Проверить, что внутри блока выполнено не больше limit запросов.
+
+    Пример:
+        with assert_max_statements(STATEMENT_BUDGETS["GET /notes/{note_id}"]):
+            await client.get(f"/notes/{note_id}")
+    """
+    with record_statements() as recorder:
+        yield recorder
+    if recorder.count > limit:
+        listing = "\n".join(f"  {s.sql}" for s in recorder.statements)
+        raise AssertionError(
+            f"{label or 'Блок'}: выполнено {recorder.count} SQL-запросов при лимите {limit}:\n{listing}")
+
+
+# Допустимое число SQL-запросов на эндпоинт (без учёта BEGIN/COMMIT)
+# при выключенной таблице note_closure и выключенном потоке изменений
+# (EVENTS_ENABLED: с ним у каждой записи ещё один запрос pg_notify).
+STATEMENT_BUDGETS: dict[str, int] = {
+    "POST /notes/": 2,  # INSERT + refresh
+    "POST /notes/bulk": 1,  # резервирование id; строки загружает COPY asyncpg, его SQLAlchemy не видит
+    "GET /notes/": 1,
+    "GET /notes/{note_id}": 2,  # версия (ETag) + заметка; 304 — только версия
+    "GET /notes/{note_id}/full": 4,  # версия + заметка + связи родителей + связи детей
+    "GET /notes/{note_id}/ancestors": 2,  # связи достижимой части графа + заметки с глубиной
+    "GET /notes/{note_id}/descendants": 2,
+    "GET /notes/{note_id}/graph": 2,  # обход с узлами + связи между узлами
+    "POST /notes/batch": 1,
+    "PUT /notes/{note_id}": 2,  # соседи (сброс их /full в кэше) + UPDATE
+    "DELETE /notes/{note_id}": 2,  # соседи + DELETE
+    "POST /links/": 3,  # блокировка графа + проверка цикла + INSERT
+    "POST /links/bulk": 4,  # блокировка графа + заметки пакета + связи ниже пакета + INSERT
+    "GET /links/{link_id}": 1,
+    "GET /links/by-note/{note_id}": 1,
+    "DELETE /links/{link_id}": 1,
+}
@@ -1,7 +1,8 @@
 from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from typing import AsyncIterator, Optional
 
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
 from sqlalchemy import text
@@ -9,9 +10,28 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.notes import router as notes_router
 from app.api.links import router as links_router
+from app.api.export import router as export_router
+from app.api.debug import router as debug_router
+from app.api.jobs import router as jobs_router
+from app.api.events import router as events_router
+from app.api.sync import router as sync_router
+from app.api.graph import router as graph_router
 
 
-from app.db.session import engine, get_session
+from app.core.config import SETTINGS
+from app.core.profiling import ProfilingMiddleware
+from app.core.metrics import (
+    RequestMetricsMiddleware, cache_metric_lines, events_metric_lines, graph_snapshot_metric_lines,
+    pool_metric_lines, render_metrics, replica_metric_lines,
+)
+from app.db.pool import pool_stats
+from app.db.replica import mark_wrote, replica_monitor
+from app.db.session import engine, get_session, replica_engine
+from app.services.cache import get_note_cache
+from app.services.closure_service import check_closure_built
+from app.services.events import change_feed
+from app.services.graph_snapshot import get_graph_snapshot_cache
+from app.services.job_runner import job_runner
 # from app.models.base import Base  # больше не нужно
 
 class HealthOut(BaseModel):
@@ -22,17 +42,84 @@ class DBHealthOut(BaseModel):
     """Модель ответа для проверки соединения с БД."""
     db: str
 
+class CacheStatsOut(BaseModel):
+    """Модель ответа со статистикой кэша заметок."""
+    enabled: bool
+    entries: int = 0
+    bytes: int = 0
+    max_entries: int = 0
+    max_bytes: int = 0
+    ttl_seconds: float = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+class PoolStatsOut(BaseModel):
+    """Модель ответа с состоянием пула соединений с БД."""
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    max_overflow: int
+    timeout_seconds: float
+    checkouts: int
+    checkout_timeouts: int
+    checkout_wait_seconds_total: float
+    checkout_wait_seconds_max: float
+    connects: int
+    invalidations: int
+
+class ReplicaStatusOut(BaseModel):
+    """Модель ответа с состоянием реплики для чтения."""
+    configured: bool
+    healthy: bool
+    lag_seconds: Optional[float] = None
+    error: Optional[str] = None
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     """Корректное завершение соединений с БД при остановке приложения."""
     # ВАЖНО: никаких create_all здесь — схему управляет Alembic
+    await check_closure_built()
+    replica_monitor.start()
+    job_runner.start()
+    change_feed.start()
     yield
+    await change_feed.stop()
+    await job_runner.stop()
+    await replica_monitor.stop()
     await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
 
 app = FastAPI(title="Notes Graph API", version="0.1.0", lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware)
+if SETTINGS.debug_profiling:
+    app.add_middleware(ProfilingMiddleware)
+
+# Методы, после которых клиент читает из основной БД (чтение своих записей).
+# POST /notes/batch только читает, но отличать его здесь не нужно:
+# лишнее закрепление за основной БД безопасно.
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    if request.method in WRITE_METHODS and response.status_code < 400:
+        mark_wrote(response)
+    return response
 
 app.include_router(notes_router)
 app.include_router(links_router)
+app.include_router(export_router)
+app.include_router(jobs_router)
+app.include_router(events_router)
+app.include_router(sync_router)
+app.include_router(graph_router)
+if SETTINGS.debug_profiling:
+    app.include_router(debug_router)
 
 @app.get("/health", response_model=HealthOut)
 def health_check() -> HealthOut:
@@ -44,3 +131,30 @@ async def db_health_check(session: AsyncSession = Depends(get_session)) -> DBHea
     """Проверка доступности подключения к базе данных."""
     await session.execute(text("SELECT 1"))
     return DBHealthOut(db="ok")
+
+@app.get("/db/pool", response_model=PoolStatsOut)
+def db_pool_stats() -> PoolStatsOut:
+    """Состояние пула соединений: занятые, сверх лимита, ожидание выдачи."""
+    return PoolStatsOut(**pool_stats(engine.pool))
+
+@app.get("/db/replica", response_model=ReplicaStatusOut)
+def db_replica_status() -> ReplicaStatusOut:
+    """Доступность и отставание реплики для чтения."""
+    return ReplicaStatusOut(**replica_monitor.stats())
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Метрики в текстовом формате Prometheus: запросы, SQL, пул, кэш, реплика, поток изменений, снимок графа."""
+    body = render_metrics([
+        pool_metric_lines(pool_stats(engine.pool)),
+        cache_metric_lines(get_note_cache().stats()),
+        replica_metric_lines(replica_monitor.stats()),
+        events_metric_lines(change_feed.stats()),
+        graph_snapshot_metric_lines(get_graph_snapshot_cache().stats()),
+    ])
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/cache/stats", response_model=CacheStatsOut)
+def cache_stats() -> CacheStatsOut:
+    """Счётчики кэша заметок: попадания, промахи, вытеснения."""
+    return CacheStatsOut(**get_note_cache().stats())
@@ -1,2 +1,2 @@
-from app.models.note import Note, NoteLink 
-
+from app.models.note import Note, NoteLink, NoteClosure, SyncTombstone
+from app.models.job import Job, JobItem
@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import CheckConstraint, DateTime, ForeignKey, Index, Integer, String, Text, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class Job(Base):
+    """Фоновая задача (очередь в таблице PostgreSQL).
+
+    Задачу выполняет JobRunner одного из процессов приложения. Задача
+    обрабатывается пакетами; после каждого пакета в state сохраняется
+    позиция, с которой её можно продолжить после перезапуска.
+
+    Объёмные входные данные (импорт) лежат в payload: колонка загружается
+    только обработчиком задачи, а не списками и опросом состояния.
+    """
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False, comment="Тип задачи")
+    status: Mapped[str] = mapped_column(String(20), nullable=False, server_default="pending",
+                                        comment="pending, running, succeeded или failed")
+    params: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default=text("'{}'::jsonb"),
+                                         comment="Параметры задачи")
+    payload: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True, deferred=True,
+                                                    comment="Входные данные задачи; читаются только при выполнении")
+    state: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default=text("'{}'::jsonb"),
+                                        comment="Позиция для продолжения после перезапуска")
+    progress_done: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0",
+                                               comment="Обработано элементов")
+    progress_total: Mapped[Optional[int]] = mapped_column(Integer, nullable=True,
+                                                          comment="Всего элементов, если известно")
+    result: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True, comment="Итог выполнения")
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True, comment="Последняя ошибка")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0",
+                                          comment="Число запусков")
+    run_after: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True, comment="Не запускать раньше (пауза перед повтором после ошибки)")
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(),
+                                                 nullable=False, comment="Время постановки в очередь")
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True,
+                                                           comment="Время первого запуска")
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True,
+                                                            comment="Время завершения")
+
+    __table_args__ = (
+        CheckConstraint("status IN ('pending', 'running', 'succeeded', 'failed')", name="ck_job_status"),
+        # Выборка задач для выполнения: только незавершённые
+        Index("ix_job_active_id", "id", postgresql_where=text("status IN ('pending', 'running')")),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Job(id={self.id}, kind='{self.kind}', status='{self.status}')>"
+
+
+class JobItem(Base):
+    """Элементы, которые задача должна обработать (например, заметки к удалению).
+
+    Список фиксируется в начале задачи, обработанные элементы удаляются
+    в той же транзакции, что и сама обработка.
+    """
+    __tablename__ = "job_item"
+
+    job_id: Mapped[int] = mapped_column(ForeignKey("job.id", ondelete="CASCADE"), primary_key=True,
+                                        comment="ID задачи")
+    note_id: Mapped[int] = mapped_column(Integer, primary_key=True, comment="ID заметки")
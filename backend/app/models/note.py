@@ -1,6 +1,8 @@
 from datetime import datetime
 
 from sqlalchemy import (
+    BigInteger,
+    Computed,
     String,
     Text,
     ForeignKey,
@@ -10,13 +12,24 @@ from sqlalchemy import (
     Index,
     DateTime,
     Integer,
+    text,
 )
-
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.models.base import Base
 
 from typing import Optional
 
+# Конфигурация полнотекстового поиска; должна совпадать с миграцией 6d3a8f0e4c21
+SEARCH_CONFIG = "simple"
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')"
+)
+
+# Номер (xid8) текущей транзакции; должен совпадать с миграцией 8f2d6b4e1a37.
+# Колонка change_xid хранит транзакцию последнего изменения строки (для GET /sync)
+CHANGE_XID_SQL = "pg_current_xact_id()::text::bigint"
 
 class Note(Base):
     """Модель заметки в графе.
@@ -34,6 +47,14 @@ class Note(Base):
                                                   server_default=func.now(), onupdate=func.now(),
                                                  nullable=False, comment="Время последнего обновления")
     importance: Mapped[Optional[int]] = mapped_column(Integer,nullable=True,comment="Важность заметки от 0 до 9")
+    # Вычисляемая колонка для поиска; не загружается вместе с заметкой
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True),
+                                                         nullable=True, deferred=True, deferred_raiseload=True,
+                                                         comment="Полнотекстовый индекс заголовка и содержимого")
+    # При вставке — значение по умолчанию, при изменении — триггер note_change_xid
+    change_xid: Mapped[int] = mapped_column(BigInteger, server_default=text(CHANGE_XID_SQL), nullable=False,
+                                            deferred=True, deferred_raiseload=True,
+                                            comment="Транзакция последнего изменения")
     
     # Ограничения и индексы
     __table_args__ = (
@@ -41,19 +62,29 @@ class Note(Base):
         CheckConstraint("length(btrim(title)) > 0", name="ck_note_title_not_empty"),  # Заголовок не может быть пустым
         Index("ix_note_title", "title"),  # Индекс для быстрого поиска по заголовку
         Index("ix_note_title_lower", func.lower(title)),  # Индекс для регистронезависимого поиска
+        Index("ix_note_importance_id", func.coalesce(importance, -1), "id"),  # Keyset-пагинация по важности
+        Index("ix_note_updated_at_id", "updated_at", "id"),  # Keyset-пагинация по времени обновления
+        Index("ix_note_search_vector", search_vector, postgresql_using="gin"),  # Полнотекстовый поиск
+        Index("ix_note_change_xid_id", "change_xid", "id"),  # Изменения для GET /sync
+        Index("ix_note_title_trgm", func.lower(title).label("title_lower"), postgresql_using="gin",
+              postgresql_ops={"title_lower": "gin_trgm_ops"}),  # Автодополнение по заголовку (pg_trgm)
     )
-    # Связи с другими заметками (иерархия)
+    # Связи с другими заметками (иерархия).
+    # По умолчанию не загружаются: эндпоинты явно запрашивают нужные связи
+    # через loader options в NoteService, неявный доступ вызывает ошибку.
     parent_links: Mapped[list["NoteLink"]] = relationship(
         back_populates="child",
         cascade="all, delete-orphan",  # Удаляем связи при удалении заметки
+        passive_deletes=True,  # Удаление связей выполняет БД (ON DELETE CASCADE)
         foreign_keys="NoteLink.child_id",
-        lazy="selectin",  # Загружаем связи вместе с заметкой
+        lazy="raise",
     )
     children_links: Mapped[list["NoteLink"]] = relationship(
         back_populates="parent",
         cascade="all, delete-orphan",  # Удаляем связи при удалении заметки
+        passive_deletes=True,  # Удаление связей выполняет БД (ON DELETE CASCADE)
         foreign_keys="NoteLink.parent_id",
-        lazy="selectin",  # Загружаем связи вместе с заметкой
+        lazy="raise",
     )
 
     # Свойства для удобного доступа к связанным заметкам
@@ -81,25 +112,82 @@ class NoteLink(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     parent_id: Mapped[int] = mapped_column(ForeignKey("note.id", ondelete="CASCADE"), nullable=False, index=True, comment="ID родительской заметки")
     child_id: Mapped[int] = mapped_column(ForeignKey("note.id", ondelete="CASCADE"), nullable=False, index=True, comment="ID дочерней заметки")
+    # Связи не изменяются, только создаются и удаляются
+    change_xid: Mapped[int] = mapped_column(BigInteger, server_default=text(CHANGE_XID_SQL), nullable=False,
+                                            deferred=True, deferred_raiseload=True,
+                                            comment="Транзакция создания связи")
 
     # Ограничения для корректности связей
     __table_args__ = (
         UniqueConstraint("parent_id", "child_id", name="uq_note_link"),  # Уникальная связь между двумя заметками
         CheckConstraint("parent_id <> child_id", name="ck_no_self_link"),  # Заметка не может ссылаться сама на себя
+        Index("ix_notelink_change_xid_id", "change_xid", "id"),  # Изменения для GET /sync
     )
 
     # Связи с заметками
     parent: Mapped["Note"] = relationship(
         back_populates="children_links",
         foreign_keys="NoteLink.parent_id",
-        lazy="joined",  # Загружаем связанную заметку сразу
+        lazy="raise",  # Загружается только явно (см. NOTE_LOAD_OPTIONS)
     )
     child: Mapped["Note"] = relationship(
         back_populates="parent_links",
         foreign_keys="NoteLink.child_id",
-        lazy="joined",  # Загружаем связанную заметку сразу
+        lazy="raise",  # Загружается только явно (см. NOTE_LOAD_OPTIONS)
     )
 
     def __repr__(self) -> str:
         """Строковое представление связи между заметками."""
-        return f"<NoteLink(parent_id={self.parent_id}, child_id={self.child_id})>"
\ No newline at end of file
+        return f"<NoteLink(parent_id={self.parent_id}, child_id={self.child_id})>"
+
+
+class NoteClosure(Base):
+    """Транзитивное замыкание графа заметок.
+
+    Хранит пару (предок, потомок) для каждого пути в графе с длиной
+    кратчайшего пути. Таблица опциональна (настройка note_closure_enabled)
+    и поддерживается инкрементально при изменении связей. Перед включением
+    её нужно построить (python -m app.commands.rebuild_closure): приложение
+    не запускается, если таблица не соответствует связям.
+    """
+    __tablename__ = "note_closure"
+
+    ancestor_id: Mapped[int] = mapped_column(ForeignKey("note.id", ondelete="CASCADE"), primary_key=True, comment="ID заметки-предка")
+    descendant_id: Mapped[int] = mapped_column(ForeignKey("note.id", ondelete="CASCADE"), primary_key=True, comment="ID заметки-потомка")
+    depth: Mapped[int] = mapped_column(Integer, nullable=False, comment="Длина кратчайшего пути")
+
+    __table_args__ = (
+        CheckConstraint("ancestor_id <> descendant_id", name="ck_note_closure_not_reflexive"),
+        CheckConstraint("depth > 0", name="ck_note_closure_depth"),
+        Index("ix_note_closure_descendant", "descendant_id", "depth"),  # Поиск предков заметки
+        Index("ix_note_closure_ancestor_depth", "ancestor_id", "depth"),  # Поиск потомков с ограничением глубины
+    )
+
+    def __repr__(self) -> str:
+        """Строковое представление пары замыкания."""
+        return f"<NoteClosure(ancestor_id={self.ancestor_id}, descendant_id={self.descendant_id}, depth={self.depth})>"
+
+
+class SyncTombstone(Base):
+    """Отметка об удалении заметки или связи для GET /sync.
+
+    Строки добавляют триггеры note_tombstone и notelink_tombstone, в том
+    числе для связей, удалённых каскадно вместе с заметкой.
+    """
+    __tablename__ = "sync_tombstone"
+
+    kind: Mapped[str] = mapped_column(String(10), primary_key=True, comment="note или link")
+    entity_id: Mapped[int] = mapped_column(Integer, primary_key=True, comment="ID удалённой заметки или связи")
+    change_xid: Mapped[int] = mapped_column(BigInteger, server_default=text(CHANGE_XID_SQL), nullable=False,
+                                            comment="Транзакция удаления")
+    deleted_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(),
+                                                 nullable=False, comment="Время удаления")
+
+    __table_args__ = (
+        CheckConstraint("kind IN ('note', 'link')", name="ck_sync_tombstone_kind"),
+        Index("ix_sync_tombstone_kind_change_xid", "kind", "change_xid", "entity_id"),  # Удаления для GET /sync
+    )
+
+    def __repr__(self) -> str:
+        """Строковое представление отметки об удалении."""
+        return f"<SyncTombstone(kind={self.kind}, entity_id={self.entity_id})>"
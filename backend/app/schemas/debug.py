@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class StatementShapeOut(BaseModel):
+    """SQL-запросы одной формы в рамках HTTP-запроса."""
+    shape: str = Field(..., description="Текст запроса с ? вместо литералов и параметров")
+    count: int = Field(..., description="Сколько раз выполнен")
+    total_time: float = Field(..., description="Суммарное время, с")
+    max_time: float = Field(..., description="Самое долгое выполнение, с")
+
+    class Config:
+        from_attributes = True
+
+
+class RequestProfileOut(BaseModel):
+    """Профиль SQL-запросов одного HTTP-запроса."""
+    request_id: str
+    method: str
+    path: str
+    started_at: datetime
+    status: int
+    duration: float = Field(..., description="Время обработки, с")
+    statement_count: int
+    db_time: float = Field(..., description="Суммарное время SQL, с")
+    shapes: List[StatementShapeOut] = Field(default_factory=list, description="По убыванию суммарного времени")
+    n_plus_one: List[str] = Field(default_factory=list, description="Формы, повторённые подозрительно много раз")
+
+    class Config:
+        from_attributes = True
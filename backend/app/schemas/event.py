@@ -0,0 +1,11 @@
+from typing import List, Literal
+
+from pydantic import BaseModel, Field
+
+
+class EventSubscriptionUpdate(BaseModel):
+    """Сообщение клиента WebSocket /events/ws: изменение набора заметок подписки."""
+    action: Literal["subscribe", "unsubscribe"] = Field(
+        ..., description="subscribe — добавить заметки (подписка на все события сужается до них), "
+                         "unsubscribe — убрать")
+    note_ids: List[int] = Field(..., min_length=1, description="ID заметок")
@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class DegreeStats(BaseModel):
+    max: int = Field(..., description="Наибольшая степень заметки")
+    mean: float = Field(..., description="Средняя степень (связей на заметку)")
+
+
+class GraphStats(BaseModel):
+    """Сводка по графу связей; считается по снимку, а не по каждому запросу."""
+    notes: int = Field(..., description="Число заметок")
+    links: int = Field(..., description="Число связей")
+    roots: int = Field(..., description="Заметок без родителей")
+    leaves: int = Field(..., description="Заметок без детей")
+    isolated: int = Field(..., description="Заметок без связей")
+    acyclic: bool = Field(..., description="В графе нет циклов")
+    max_depth: int = Field(..., description="Длина самого длинного пути от корня")
+    depth_distribution: List[int] = Field(
+        ..., description="Число заметок на каждой глубине (глубина — самый длинный путь от корня); "
+                         "заметки на циклах не учитываются")
+    in_degree: DegreeStats = Field(..., description="Число родителей")
+    out_degree: DegreeStats = Field(..., description="Число детей")
+    version: str = Field(..., description="Версия снимка графа (меняется только вместе с графом)")
+    built_at: datetime = Field(..., description="Время построения снимка")
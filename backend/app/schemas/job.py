@@ -0,0 +1,79 @@
+from datetime import datetime
+from typing import Annotated, List, Literal, Optional, Union
+
+from pydantic import BaseModel, Field
+
+from app.schemas.note import NoteCreate, NoteLinkCreate
+
+JobKind = Literal["bulk_import", "delete_subtree", "rebuild_closure", "reindex"]
+
+JobStatus = Literal["pending", "running", "succeeded", "failed"]
+
+ReindexTable = Literal["note", "notelink", "note_closure"]
+
+
+class BulkImportParams(BaseModel):
+    """Импорт: сначала создаются все заметки, затем связи между существующими заметками."""
+    notes: List[NoteCreate] = Field(default_factory=list, description="Заметки для создания")
+    links: List[NoteLinkCreate] = Field(default_factory=list, description="Связи для создания")
+
+
+class DeleteSubtreeParams(BaseModel):
+    """Удаление заметки; с descendants=true — вместе со всеми её потомками."""
+    note_id: int = Field(..., description="ID заметки")
+    descendants: bool = Field(False, description="Удалить и всех потомков заметки")
+
+
+class RebuildClosureParams(BaseModel):
+    """Перестроение note_closure по текущим связям (без параметров)."""
+
+
+class ReindexParams(BaseModel):
+    """Перестроение индексов таблиц (REINDEX TABLE CONCURRENTLY)."""
+    tables: List[ReindexTable] = Field(
+        default_factory=lambda: ["note", "notelink", "note_closure"],
+        min_length=1, description="Таблицы, индексы которых перестраиваются")
+
+
+class BulkImportJob(BaseModel):
+    kind: Literal["bulk_import"]
+    params: BulkImportParams
+
+
+class DeleteSubtreeJob(BaseModel):
+    kind: Literal["delete_subtree"]
+    params: DeleteSubtreeParams
+
+
+class RebuildClosureJob(BaseModel):
+    kind: Literal["rebuild_closure"]
+    params: RebuildClosureParams = Field(default_factory=RebuildClosureParams)
+
+
+class ReindexJob(BaseModel):
+    kind: Literal["reindex"]
+    params: ReindexParams = Field(default_factory=ReindexParams)
+
+
+JobCreate = Annotated[
+    Union[BulkImportJob, DeleteSubtreeJob, RebuildClosureJob, ReindexJob],
+    Field(discriminator="kind"),
+]
+
+
+class JobResponse(BaseModel):
+    """Состояние фоновой задачи."""
+    id: int = Field(..., description="ID задачи")
+    kind: JobKind = Field(..., description="Тип задачи")
+    status: JobStatus = Field(..., description="pending, running, succeeded или failed")
+    progress_done: int = Field(..., description="Обработано элементов")
+    progress_total: Optional[int] = Field(None, description="Всего элементов, если уже известно")
+    attempts: int = Field(..., description="Число запусков (больше 1 — задача продолжалась после сбоя)")
+    result: Optional[dict] = Field(None, description="Итог выполнения")
+    error: Optional[str] = Field(None, description="Последняя ошибка")
+    created_at: datetime = Field(..., description="Время постановки в очередь")
+    started_at: Optional[datetime] = Field(None, description="Время первого запуска")
+    finished_at: Optional[datetime] = Field(None, description="Время завершения")
+
+    class Config:
+        from_attributes = True
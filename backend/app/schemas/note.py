@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Literal, Optional, List, Tuple, Union
 from pydantic import BaseModel, Field, field_validator
 
 
@@ -26,6 +26,14 @@ class NoteBase(BaseModel):
         description="Важность заметки от 0 до 9"
     )
 
+    @field_validator("title")
+    @classmethod
+    def title_not_blank(cls, value: str) -> str:
+        """Заголовок не может состоять из пробелов (ck_note_title_not_empty)."""
+        if not value.strip():
+            raise ValueError("Заголовок не может быть пустым")
+        return value
+
 
 class NoteCreate(NoteBase):
     """Схема для создания новой заметки.
@@ -59,6 +67,14 @@ class NoteUpdate(BaseModel):
         description="Новая важность заметки от 0 до 9"
     )
 
+    @field_validator("title")
+    @classmethod
+    def title_not_blank(cls, value: Optional[str]) -> Optional[str]:
+        """Заголовок не может состоять из пробелов (ck_note_title_not_empty)."""
+        if value is not None and not value.strip():
+            raise ValueError("Заголовок не может быть пустым")
+        return value
+
 
 class NoteResponse(NoteBase):
     """Схема для ответа с заметкой.
@@ -98,6 +114,16 @@ class NoteLinkResponse(BaseModel):
         from_attributes = True
 
 
+class NoteExport(NoteResponse):
+    """Строка выгрузки графа (NDJSON) с заметкой."""
+    type: Literal["note"] = "note"
+
+
+class NoteLinkExport(NoteLinkResponse):
+    """Строка выгрузки графа (NDJSON) со связью."""
+    type: Literal["link"] = "link"
+
+
 class NoteLinkSummary(BaseModel):
     """Упрощенная схема заметки для боковой панели.
     
@@ -112,6 +138,11 @@ class NoteLinkSummary(BaseModel):
         from_attributes = True
 
 
+class NoteSearchHit(NoteLinkSummary):
+    """Результат полнотекстового поиска."""
+    rank: float = Field(..., description="Релевантность (больше — выше в выдаче)")
+
+
 class NoteWithRelations(NoteResponse):
     """Схема заметки с полной информацией о связанных заметках.
     
@@ -148,4 +179,71 @@ class NoteWithRelationsOptimized(NoteResponse):
     children: List[NoteLinkSummary] = Field(
         default_factory=list,
         description="Дочерние заметки (только ID, title, importance)"
-    )
\ No newline at end of file
+    )
+
+class NoteWithDepth(NoteResponse):
+    """Схема заметки в результате обхода графа.
+
+    Используется для списков предков и потомков: каждая заметка
+    встречается один раз с минимальным расстоянием от исходной.
+    """
+    depth: int = Field(..., ge=1, description="Расстояние от исходной заметки (число связей)")
+
+
+class NoteGraph(BaseModel):
+    """Окрестность заметки для отрисовки графа.
+
+    nodes упорядочены по удалённости от исходной заметки (она первая),
+    edges — связи между возвращёнными узлами.
+    """
+    root_id: int = Field(..., description="ID исходной заметки")
+    nodes: List[NoteLinkSummary] = Field(default_factory=list, description="Заметки окрестности")
+    edges: List[Tuple[int, int]] = Field(default_factory=list, description="Связи [parent_id, child_id]")
+    truncated: bool = Field(False, description="Окрестность усечена до max_nodes узлов")
+
+class NoteBatchRequest(BaseModel):
+    """Запрос пакетного получения заметок по ID."""
+    ids: List[int] = Field(..., min_length=1, description="ID заметок; порядок ответа совпадает с этим")
+    fields: Literal["summary", "full"] = Field(
+        "full", description="summary — NoteLinkSummary, full — NoteResponse")
+
+
+class NoteBatchItem(BaseModel):
+    """Элемент ответа пакетного получения; found=false — заметки с таким ID нет."""
+    id: int = Field(..., description="Запрошенный ID")
+    found: bool = Field(..., description="Заметка найдена")
+    note: Optional[Union[NoteResponse, NoteLinkSummary]] = Field(
+        None, description="Заметка в запрошенном наборе полей")
+
+
+class BulkItemResult(BaseModel):
+    """Результат обработки одного элемента пакетного запроса."""
+    index: int = Field(..., description="Позиция элемента во входных данных")
+    id: Optional[int] = Field(None, description="ID созданного объекта, если элемент принят")
+    error: Optional[str] = Field(None, description="Причина отказа, если элемент отклонён")
+
+
+class BulkResult(BaseModel):
+    """Ответ пакетного создания.
+
+    results идут в порядке входных данных, по одному на каждый элемент.
+    """
+    created: int = Field(..., description="Число созданных объектов")
+    failed: int = Field(..., description="Число отклонённых элементов")
+    results: List[BulkItemResult] = Field(default_factory=list, description="Результаты по элементам")
+
+
+class SyncPage(BaseModel):
+    """Страница изменений для синхронизации (GET /sync).
+
+    Изменения одной страницы применяются в порядке полей: notes, links,
+    deleted_link_ids, deleted_note_ids. Связь может ссылаться на заметку
+    из следующей страницы той же синхронизации: согласованное состояние —
+    после страницы с has_more=false.
+    """
+    notes: List[NoteResponse] = Field(default_factory=list, description="Созданные или изменённые заметки")
+    links: List[NoteLinkResponse] = Field(default_factory=list, description="Созданные связи")
+    deleted_link_ids: List[int] = Field(default_factory=list, description="ID удалённых связей")
+    deleted_note_ids: List[int] = Field(default_factory=list, description="ID удалённых заметок")
+    next_token: str = Field(..., description="Токен для следующего запроса (since)")
+    has_more: bool = Field(..., description="Есть ещё изменения: запросить сразу с next_token")
@@ -0,0 +1,157 @@
+"""Быстрая сериализация ответов из строк запросов без создания моделей.
+
+Обычный путь ответа — валидация строк Row / ORM-объектов в Pydantic-модель
+(from_attributes) и затем dump_json. Для Row from_attributes особенно
+медленный. RowSerializer строит по модели ответа TypedDict с теми же
+полями и типами и сериализует его TypeAdapter-ом: значения берутся из
+строки кортежем (itemgetter / attrgetter), проверки модели не выполняются.
+
+Данные приходят из БД и уже удовлетворяют ограничениям схемы, поэтому
+JSON совпадает с model_dump_json(); схема OpenAPI по-прежнему строится
+из response_model маршрутов.
+"""
+import types
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Dict, List, Literal, Sequence, Union, get_args, get_origin
+
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import PydanticUndefined
+from sqlalchemy.engine import Row
+from typing_extensions import TypedDict
+
+from app.schemas.note import (
+    NoteBatchItem, NoteExport, NoteGraph, NoteLinkExport, NoteLinkResponse, NoteLinkSummary,
+    NoteResponse, NoteSearchHit, NoteWithDepth, NoteWithRelationsOptimized, SyncPage,
+)
+
+
+def _plain_type(annotation: Any) -> Any:
+    """Тип аннотации, в котором модели заменены на TypedDict."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _typed_dict(annotation)
+    origin = get_origin(annotation)
+    if origin is None or origin is Literal:
+        return annotation
+    args = tuple(_plain_type(arg) for arg in get_args(annotation))
+    if origin in (Union, types.UnionType):
+        return Union[args]
+    return origin[args]
+
+
+_typed_dicts: Dict[type, type] = {}
+
+
+def _typed_dict(model: type) -> type:
+    if model not in _typed_dicts:
+        _typed_dicts[model] = TypedDict(f"{model.__name__}Row", {
+            name: _plain_type(field.annotation) for name, field in model.model_fields.items()
+        })
+    return _typed_dicts[model]
+
+
+def _nested_model(annotation: Any):
+    """Модель элементов поля List[Model] (или Model), иначе None."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    if get_origin(annotation) in (list, List) and get_args(annotation):
+        item = get_args(annotation)[0]
+        if isinstance(item, type) and issubclass(item, BaseModel):
+            return item, True
+    return None
+
+
+class RowSerializer:
+    """Сериализатор строк (Row, ORM-объектов или dict) по модели ответа.
+
+    Поля модели, которых нет у строки, получают значение по умолчанию
+    модели (например, type в NoteExport). Вложенные поля Model и
+    List[Model] сериализуются рекурсивно.
+    """
+
+    def __init__(self, model: type):
+        self.model = model
+        self.names = tuple(model.model_fields)
+        self._nested: Dict[str, tuple] = {}
+        for name, field in model.model_fields.items():
+            nested = _nested_model(field.annotation)
+            if nested is not None:
+                self._nested[name] = (RowSerializer(nested[0]), nested[1])
+        self._converters: Dict[Any, Callable[[Any], dict]] = {}
+        self._one = TypeAdapter(_typed_dict(model))
+        self._many = TypeAdapter(List[_typed_dict(model)])
+
+    def _converter(self, sample: Any) -> Callable[[Any], dict]:
+        """Функция строка → dict для строк того же вида, что sample (кэшируется)."""
+        if isinstance(sample, Row):
+            key: Any = sample._fields
+        elif isinstance(sample, dict):
+            key = frozenset(sample)
+        else:
+            key = type(sample)
+        convert = self._converters.get(key)
+        if convert is None:
+            convert = self._converters[key] = self._build_converter(sample)
+        return convert
+
+    def _build_converter(self, sample: Any) -> Callable[[Any], dict]:
+        if isinstance(sample, Row):
+            present = [name for name in self.names if name in sample._fields]
+            getter = itemgetter(*(sample._fields.index(name) for name in present))
+        elif isinstance(sample, dict):
+            present = [name for name in self.names if name in sample]
+            getter = itemgetter(*present)
+        else:
+            present = [name for name in self.names if hasattr(sample, name)]
+            getter = attrgetter(*present)
+        defaults = {}
+        for name in self.names:
+            if name not in present:
+                default = self.model.model_fields[name].get_default(call_default_factory=True)
+                if default is PydanticUndefined:
+                    raise ValueError(f"У строки нет обязательного поля {self.model.__name__}.{name}")
+                defaults[name] = default
+        single = len(present) == 1
+        nested = [(name, serializer, many) for name, (serializer, many) in self._nested.items()
+                  if name in present]
+
+        def convert(row: Any) -> dict:
+            values = getter(row)
+            data = dict(zip(present, (values,) if single else values))
+            data.update(defaults)
+            for name, serializer, many in nested:
+                value = data[name]
+                if value is not None:
+                    data[name] = serializer.to_dicts(value) if many else serializer.to_dict(value)
+            return data
+
+        return convert
+
+    def to_dict(self, row: Any) -> dict:
+        return self._converter(row)(row)
+
+    def to_dicts(self, rows: Sequence[Any]) -> List[dict]:
+        if not rows:
+            return []
+        convert = self._converter(rows[0])
+        return [convert(row) for row in rows]
+
+    def dump(self, row: Any) -> bytes:
+        """JSON одного объекта модели."""
+        return self._one.dump_json(self.to_dict(row))
+
+    def dump_many(self, rows: Sequence[Any]) -> bytes:
+        """JSON-массив объектов модели."""
+        return self._many.dump_json(self.to_dicts(rows))
+
+
+NOTE_RESPONSE = RowSerializer(NoteResponse)
+NOTE_FULL = RowSerializer(NoteWithRelationsOptimized)
+NOTE_SUMMARY = RowSerializer(NoteLinkSummary)
+NOTE_SEARCH_HIT = RowSerializer(NoteSearchHit)
+NOTE_WITH_DEPTH = RowSerializer(NoteWithDepth)
+NOTE_GRAPH = RowSerializer(NoteGraph)
+NOTE_LINK = RowSerializer(NoteLinkResponse)
+NOTE_EXPORT = RowSerializer(NoteExport)
+NOTE_LINK_EXPORT = RowSerializer(NoteLinkExport)
+NOTE_BATCH_ITEM = RowSerializer(NoteBatchItem)
+SYNC_PAGE = RowSerializer(SyncPage)
@@ -0,0 +1,169 @@
+"""Кэш сериализованных ответов с заметками.
+
+Кэш живёт в памяти процесса: при нескольких воркерах каждый хранит свою
+копию. Изменения из другого процесса сбрасывают её по событиям потока
+изменений (app.services.events); если он выключен или событие потеряно,
+они видны после истечения TTL.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Hashable, Optional, Tuple
+
+from app.core.config import SETTINGS
+
+# Примерные накладные расходы на одну запись (ключ, узел OrderedDict, кортеж)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+@dataclass(frozen=True)
+class CachedPayload:
+    """Сериализованный ответ вместе с его валидаторами (ETag, Last-Modified)."""
+    body: bytes
+    etag: str
+    last_modified: Optional[datetime] = None  # None — ответ без Last-Modified
+
+
+def card_key(note_id: int) -> Tuple[str, int]:
+    """Ключ ответа GET /notes/{id} (NoteResponse)."""
+    return ("card", note_id)
+
+
+def full_key(note_id: int) -> Tuple[str, int]:
+    """Ключ ответа GET /notes/{id}/full (NoteWithRelationsOptimized)."""
+    return ("full", note_id)
+
+
+class NoteCache:
+    """Интерфейс кэша; реализация по умолчанию ничего не хранит.
+
+    Чтение из БД с последующей записью в кэш оформляется так:
+        token = cache.load_token()
+        ... загрузка ...
+        cache.set(key, payload, token)
+    Если между load_token() и set() был вызван invalidate(), значение
+    не сохраняется: оно могло быть прочитано до изменения.
+    """
+
+    enabled = False
+
+    def get(self, key: Hashable) -> Optional[CachedPayload]:
+        return None
+
+    def load_token(self) -> int:
+        return 0
+
+    def set(self, key: Hashable, value: CachedPayload, token: int) -> None:
+        pass
+
+    def invalidate(self, *keys: Hashable) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"enabled": False}
+
+
+class LRUTTLCache(NoteCache):
+    """LRU-кэш с TTL и ограничениями по числу записей и объёму памяти."""
+
+    enabled = True
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_bytes: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[float, CachedPayload]]" = OrderedDict()
+        self._bytes = 0
+        self._epoch = 0  # Увеличивается при каждой инвалидации
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[CachedPayload]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def load_token(self) -> int:
+        return self._epoch
+
+    def set(self, key: Hashable, value: CachedPayload, token: int) -> None:
+        if token != self._epoch:
+            return
+        size = len(value.body) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, *keys: Hashable) -> None:
+        self._epoch += 1
+        for key in keys:
+            if self._remove(key):
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= len(entry[1].body) + ENTRY_OVERHEAD_BYTES
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+def _create_note_cache() -> NoteCache:
+    if not SETTINGS.note_cache_enabled:
+        return NoteCache()
+    return LRUTTLCache(
+        max_entries=SETTINGS.note_cache_max_entries,
+        ttl_seconds=SETTINGS.note_cache_ttl_seconds,
+        max_bytes=SETTINGS.note_cache_max_bytes,
+    )
+
+
+note_cache: NoteCache = _create_note_cache()
+
+
+def get_note_cache() -> NoteCache:
+    """Общий для процесса кэш заметок."""
+    return note_cache
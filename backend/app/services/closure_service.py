@@ -0,0 +1,230 @@
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import ARRAY, Integer, any_, bindparam, delete, exists, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import SETTINGS
+from app.db.session import SessionLocal
+from app.models.note import NoteClosure
+
+# Новая связь parent → child: каждый предок parent (и сам parent)
+# становится предком каждого потомка child (и самого child).
+_ADD_LINK_SQL = text("""
+INSERT INTO note_closure (ancestor_id, descendant_id, depth)
+SELECT a.id, d.id, min(a.depth + 1 + d.depth)
+FROM (
+    SELECT ancestor_id AS id, depth FROM note_closure WHERE descendant_id = :parent_id
+    UNION ALL SELECT CAST(:parent_id AS integer), 0
+) AS a
+CROSS JOIN (
+    SELECT descendant_id AS id, depth FROM note_closure WHERE ancestor_id = :child_id
+    UNION ALL SELECT CAST(:child_id AS integer), 0
+) AS d
+WHERE a.id <> d.id
+GROUP BY a.id, d.id
+ON CONFLICT (ancestor_id, descendant_id)
+DO UPDATE SET depth = LEAST(note_closure.depth, EXCLUDED.depth)
+""")
+
+# Восстановление пар ancestors × descendants после удаления связи или заметки.
+# Путь a → d, если он ещё существует, раскладывается как
+# (a, x) + связь x → y + (y, d), где y — первый узел пути из descendants;
+# обе части не входили в удалённые пары и остались в таблице.
+_REDERIVE_PAIRS = """
+INSERT INTO note_closure (ancestor_id, descendant_id, depth)
+SELECT ax.ancestor_id, yd.descendant_id, min(ax.depth + 1 + yd.depth)
+FROM (
+    SELECT ancestor_id, descendant_id, depth FROM note_closure WHERE ancestor_id = ANY(:ancestor_ids)
+    UNION ALL SELECT a, a, 0 FROM unnest(CAST(:ancestor_ids AS integer[])) AS a
+) AS ax
+JOIN notelink l ON l.parent_id = ax.descendant_id
+JOIN (
+    SELECT ancestor_id, descendant_id, depth FROM note_closure WHERE descendant_id = ANY(:descendant_ids)
+    UNION ALL SELECT d, d, 0 FROM unnest(CAST(:descendant_ids AS integer[])) AS d
+) AS yd ON yd.ancestor_id = l.child_id
+WHERE ax.ancestor_id <> yd.descendant_id
+GROUP BY ax.ancestor_id, yd.descendant_id
+"""
+
+_REDERIVE_SQL = text(_REDERIVE_PAIRS + """
+ON CONFLICT (ancestor_id, descendant_id) DO NOTHING
+""").bindparams(
+    bindparam("ancestor_ids", type_=ARRAY(Integer)),
+    bindparam("descendant_ids", type_=ARRAY(Integer)),
+)
+
+# Проход пересчёта после удаления набора заметок: заново найденные пары
+# и укороченные пути становятся частями путей следующего прохода
+_REDERIVE_STEP_SQL = text(_REDERIVE_PAIRS + """
+ON CONFLICT (ancestor_id, descendant_id)
+DO UPDATE SET depth = EXCLUDED.depth WHERE EXCLUDED.depth < note_closure.depth
+""").bindparams(
+    bindparam("ancestor_ids", type_=ARRAY(Integer)),
+    bindparam("descendant_ids", type_=ARRAY(Integer)),
+)
+
+# Перестроение по уровням: на шаге k добавляются пары с кратчайшим путём k + 1
+_REBUILD_SEED_SQL = text("""
+INSERT INTO note_closure (ancestor_id, descendant_id, depth)
+SELECT DISTINCT parent_id, child_id, 1 FROM notelink
+""")
+
+_REBUILD_STEP_SQL = text("""
+INSERT INTO note_closure (ancestor_id, descendant_id, depth)
+SELECT DISTINCT c.ancestor_id, l.child_id, c.depth + 1
+FROM note_closure c
+JOIN notelink l ON l.parent_id = c.descendant_id
+WHERE c.depth = :depth AND c.ancestor_id <> l.child_id
+ON CONFLICT (ancestor_id, descendant_id) DO NOTHING
+""")
+
+# Таблица соответствует связям, если её пары глубины 1 совпадают с notelink.
+# Пока note_closure_enabled выключена, изменения связей таблицу не обновляют,
+# и любое такое изменение нарушает это совпадение.
+_IS_BUILT_SQL = text("""
+SELECT NOT EXISTS (
+    SELECT parent_id, child_id FROM notelink
+    EXCEPT SELECT ancestor_id, descendant_id FROM note_closure WHERE depth = 1
+) AND NOT EXISTS (
+    SELECT ancestor_id, descendant_id FROM note_closure WHERE depth = 1
+    EXCEPT SELECT parent_id, child_id FROM notelink
+)
+""")
+
+
+class ClosureService:
+    """Поддержка таблицы note_closure.
+
+    Все методы изменения должны вызываться в той же транзакции, что и
+    изменение notelink, под блокировкой графа (NoteService.lock_link_graph).
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def related(self, note_id: int, direction: str, max_depth: Optional[int] = None):
+        """Подзапрос предков ("up") или потомков ("down") с колонками id и depth."""
+        if direction == "up":
+            related_id, own_id = NoteClosure.ancestor_id, NoteClosure.descendant_id
+        else:
+            related_id, own_id = NoteClosure.descendant_id, NoteClosure.ancestor_id
+
+        stmt = select(related_id.label("id"), NoteClosure.depth).where(own_id == note_id)
+        if max_depth is not None:
+            stmt = stmt.where(NoteClosure.depth <= max_depth)
+        return stmt.subquery("traversal")
+
+    async def ancestor_ids(self, note_id: int) -> List[int]:
+        result = await self.db.execute(
+            select(NoteClosure.ancestor_id).where(NoteClosure.descendant_id == note_id))
+        return list(result.scalars().all())
+
+    async def descendant_ids(self, note_id: int) -> List[int]:
+        result = await self.db.execute(
+            select(NoteClosure.descendant_id).where(NoteClosure.ancestor_id == note_id))
+        return list(result.scalars().all())
+
+    async def related_ids(self, note_ids: Sequence[int]) -> Tuple[List[int], List[int]]:
+        """Предки и потомки набора заметок (без самих заметок набора)."""
+        ids = bindparam("ids", list(note_ids), type_=ARRAY(Integer))
+        ancestors = await self.db.execute(
+            select(NoteClosure.ancestor_id).distinct().where(NoteClosure.descendant_id == any_(ids)))
+        descendants = await self.db.execute(
+            select(NoteClosure.descendant_id).distinct().where(NoteClosure.ancestor_id == any_(ids)))
+        own = set(note_ids)
+        return ([note_id for note_id in ancestors.scalars().all() if note_id not in own],
+                [note_id for note_id in descendants.scalars().all() if note_id not in own])
+
+    async def is_reachable(self, start_id: int, target_id: int) -> bool:
+        """Проверить, достижима ли target_id из start_id (одним индексным поиском)."""
+        result = await self.db.execute(select(exists().where(
+            NoteClosure.ancestor_id == start_id,
+            NoteClosure.descendant_id == target_id,
+        )))
+        return bool(result.scalar())
+
+    async def is_built(self) -> bool:
+        """Построена ли таблица по текущим связям (не пуста ли и не устарела)."""
+        result = await self.db.execute(_IS_BUILT_SQL)
+        return bool(result.scalar())
+
+    async def add_link(self, parent_id: int, child_id: int) -> None:
+        await self.db.execute(_ADD_LINK_SQL, {"parent_id": parent_id, "child_id": child_id})
+
+    async def remove_link(self, parent_id: int, child_id: int) -> None:
+        """Обновить замыкание после удаления связи parent → child."""
+        ancestor_ids = await self.ancestor_ids(parent_id)
+        descendant_ids = await self.descendant_ids(child_id)
+        await self.rederive(ancestor_ids + [parent_id], descendant_ids + [child_id])
+
+    async def rederive(self, ancestor_ids: List[int], descendant_ids: List[int]) -> None:
+        """Пересчитать пары ancestor_ids × descendant_ids по текущим связям.
+
+        Используется после удаления связи или заметки: удаляет все пары,
+        пути которых могли проходить через удалённый элемент, и
+        восстанавливает те, что остались достижимы.
+        """
+        if not ancestor_ids or not descendant_ids:
+            return
+        await self.db.execute(delete(NoteClosure).where(
+            NoteClosure.ancestor_id.in_(ancestor_ids),
+            NoteClosure.descendant_id.in_(descendant_ids),
+        ))
+        await self.db.execute(
+            _REDERIVE_SQL, {"ancestor_ids": ancestor_ids, "descendant_ids": descendant_ids})
+
+    async def remove_notes(self, ancestor_ids: List[int], descendant_ids: List[int]) -> None:
+        """Обновить замыкание после удаления набора заметок.
+
+        ancestor_ids и descendant_ids — результат related_ids() до удаления.
+        Одного прохода, как в rederive(), мало: оставшаяся заметка может быть
+        потомком одной удалённой и предком другой, и её собственные пары тоже
+        пересчитываются. Проходы повторяются, пока находятся новые пары или
+        более короткие пути.
+        """
+        if not ancestor_ids or not descendant_ids:
+            return
+        await self.db.execute(delete(NoteClosure).where(
+            NoteClosure.ancestor_id.in_(ancestor_ids),
+            NoteClosure.descendant_id.in_(descendant_ids),
+        ))
+        params = {"ancestor_ids": ancestor_ids, "descendant_ids": descendant_ids}
+        while (await self.db.execute(_REDERIVE_STEP_SQL, params)).rowcount:
+            pass
+
+    async def rebuild(self) -> int:
+        """Полностью перестроить замыкание по таблице notelink.
+
+        Returns:
+          Число пар в таблице после перестроения
+        """
+        await self.db.execute(text("LOCK TABLE note_closure IN EXCLUSIVE MODE"))
+        await self.db.execute(delete(NoteClosure))
+        result = await self.db.execute(_REBUILD_SEED_SQL)
+        total = result.rowcount
+        depth = 1
+        while True:
+            result = await self.db.execute(_REBUILD_STEP_SQL, {"depth": depth})
+            if not result.rowcount:
+                return total
+            total += result.rowcount
+            depth += 1
+
+
+async def check_closure_built(session_factory: async_sessionmaker[AsyncSession] = SessionLocal) -> None:
+    """Не запускаться с note_closure_enabled, пока note_closure не построена.
+
+    По непостроенной или устаревшей таблице is_reachable не находит путей,
+    и проверка циклов пропускала бы связи, замыкающие цикл.
+
+    Raises:
+      RuntimeError: если note_closure_enabled включена, а таблица не соответствует связям
+    """
+    if not SETTINGS.note_closure_enabled:
+        return
+    async with session_factory() as session:
+        built = await ClosureService(session).is_built()
+    if not built:
+        raise RuntimeError(
+            "note_closure не соответствует связям: перестройте её командой "
+            "python -m app.commands.rebuild_closure или выключите NOTE_CLOSURE_ENABLED")
@@ -0,0 +1,78 @@
+"""Алгоритмы над графом связей в памяти (списки смежности из целых id)."""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Adjacency = Dict[int, List[int]]
+
+
+def build_adjacency(edges: Iterable[Tuple[int, int]]) -> Adjacency:
+    """Списки смежности родитель → дети."""
+    adjacency: Adjacency = defaultdict(list)
+    for parent_id, child_id in edges:
+        adjacency[parent_id].append(child_id)
+    return adjacency
+
+
+def is_acyclic(adjacency: Adjacency) -> bool:
+    """Проверка отсутствия циклов топологической сортировкой (алгоритм Кана)."""
+    in_degree: Dict[int, int] = defaultdict(int)
+    for parent_id, children in adjacency.items():
+        in_degree.setdefault(parent_id, 0)
+        for child_id in children:
+            in_degree[child_id] += 1
+
+    queue = [node for node, degree in in_degree.items() if degree == 0]
+    visited = 0
+    while queue:
+        node = queue.pop()
+        visited += 1
+        for child_id in adjacency.get(node, ()):
+            in_degree[child_id] -= 1
+            if in_degree[child_id] == 0:
+                queue.append(child_id)
+    return visited == len(in_degree)
+
+
+def has_path(adjacency: Adjacency, start_id: int, target_id: int) -> bool:
+    """Достижима ли target_id из start_id (итеративный обход в глубину)."""
+    if start_id == target_id:
+        return True
+    seen = {start_id}
+    stack = [start_id]
+    while stack:
+        for child_id in adjacency.get(stack.pop(), ()):
+            if child_id == target_id:
+                return True
+            if child_id not in seen:
+                seen.add(child_id)
+                stack.append(child_id)
+    return False
+
+
+def bfs_levels(adjacency: Adjacency, start_id: int, max_depth: Optional[int] = None,
+               limit: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Узлы, достижимые из start_id, с кратчайшим расстоянием до них.
+
+    Каждый узел раскрывается один раз, поэтому циклы и ромбы не дают ни
+    повторов, ни зацикливания. Обход заканчивается на уровне max_depth или
+    на уровне, где набрано limit узлов (этот уровень возвращается целиком).
+
+    Returns:
+      Пары (id, расстояние) в порядке (расстояние, id), без самого start_id
+    """
+    seen = {start_id}
+    frontier = [start_id]
+    found: List[Tuple[int, int]] = []
+    depth = 0
+    while frontier and (max_depth is None or depth < max_depth) and (limit is None or len(found) < limit):
+        depth += 1
+        level = []
+        for node in frontier:
+            for next_id in adjacency.get(node, ()):
+                if next_id not in seen:
+                    seen.add(next_id)
+                    level.append(next_id)
+        level.sort()
+        found.extend((node, depth) for node in level)
+        frontier = level
+    return found
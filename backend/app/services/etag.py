@@ -0,0 +1,54 @@
+"""Версии (ETag) ответов с заметками.
+
+ETag карточки кодирует updated_at заметки и поэтому может быть разобран
+обратно для If-Match. ETag ответа /full — хэш версий заметки, её связей и
+соседних заметок: он меняется при добавлении и удалении связей и при
+изменении заголовка или важности соседей.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _to_micros(value: datetime) -> int:
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def note_etag(note_id: int, updated_at: datetime) -> str:
+    """ETag карточки заметки: "n<id>-<updated_at в микросекундах>"."""
+    return f'"n{note_id}-{_to_micros(updated_at)}"'
+
+
+def parse_note_etag(etag: str, note_id: int) -> Optional[datetime]:
+    """updated_at из ETag карточки, или None если ETag не от этой заметки."""
+    value = etag.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    prefix = f'"n{note_id}-'
+    if not (value.startswith(prefix) and value.endswith('"')):
+        return None
+    try:
+        return _EPOCH + int(value[len(prefix):-1]) * _MICROSECOND
+    except ValueError:
+        return None
+
+
+def full_note_etag(note_id: int, updated_at: datetime,
+                   links: Iterable[Tuple[int, int, datetime]]) -> str:
+    """ETag ответа /full по версии заметки и её связей.
+
+    Args:
+      links: тройки (id связи, id соседней заметки, updated_at соседа)
+    """
+    digest = hashlib.sha1(f"{note_id}:{_to_micros(updated_at)}".encode())
+    for link_id, neighbour_id, neighbour_updated_at in sorted(links):
+        digest.update(f"|{link_id}:{neighbour_id}:{_to_micros(neighbour_updated_at)}".encode())
+    return f'"f{note_id}-{digest.hexdigest()[:20]}"'
+
+
+def split_etags(header: str) -> List[str]:
+    """Список ETag из заголовка If-Match / If-None-Match."""
+    return [value.strip() for value in header.split(",") if value.strip()]
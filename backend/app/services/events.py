@@ -0,0 +1,286 @@
+"""Поток изменений заметок и связей через LISTEN/NOTIFY.
+
+NoteService в транзакции изменения вызывает pg_notify: уведомление
+доставляется только после commit, а при откате не отправляется вовсе.
+В каждом процессе ChangeFeed держит одно соединение с LISTEN и раздаёт
+события подписчикам GET /events (SSE) и /events/ws. По событиям из других
+процессов он же сбрасывает кэш заметок и снимок графа этого процесса.
+
+Поток выключен по умолчанию (events_enabled): каждая запись с ним
+выполняет ещё один запрос. Его стоит включать, когда нужны /events или
+несколько процессов приложения держат кэш заметок.
+
+Уведомления не сохраняются: пока соединения с LISTEN нет, события
+теряются. После переподключения подписчики получают событие resync
+(перечитать нужные данные), а кэш процесса очищается. То же событие
+получает подписчик, не успевающий разбирать свою очередь.
+
+LISTEN требует сессионного соединения: через PgBouncer в режиме
+transaction уведомления не доходят, поэтому для него задаётся
+events_listen_url с прямым адресом Postgres.
+"""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, replace
+from typing import Iterable, List, Optional, Set, Tuple
+from uuid import uuid4
+
+import asyncpg
+
+from app.core.config import SETTINGS
+from app.services.cache import NoteCache, card_key, full_key, get_note_cache
+from app.services.graph_snapshot import GraphSnapshotCache, get_graph_snapshot_cache
+
+logger = logging.getLogger(__name__)
+
+CHANGES_CHANNEL = "note_changes"
+
+# Предел полезной нагрузки NOTIFY — 8000 байт; большие события делятся
+MAX_PAYLOAD_BYTES = 7900
+
+# Отличает события этого процесса: свой кэш он сбрасывает сам после commit
+PROCESS_ID = uuid4().hex[:16]
+
+RESYNC = "resync"
+# События, меняющие состав графа: после них снимок графа устаревает
+GRAPH_EVENTS = frozenset({"note.created", "note.deleted", "link.created", "link.deleted"})
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """Изменение заметок или связей.
+
+    note.created, note.updated, note.deleted — изменились сами заметки
+    note_ids; link.created, link.deleted — связи links. В related_ids —
+    заметки, у которых из-за этого изменились связи или данные соседей
+    (ответ /notes/{id}/full и /links/by-note/{id}).
+    """
+    type: str
+    note_ids: Tuple[int, ...] = ()
+    related_ids: Tuple[int, ...] = ()
+    links: Tuple[Tuple[int, int, int], ...] = ()  # (id, parent_id, child_id)
+    origin: str = PROCESS_ID
+
+    def to_dict(self) -> dict:
+        """Событие в виде, отдаваемом клиентам."""
+        return {
+            "type": self.type,
+            "note_ids": list(self.note_ids),
+            "related_ids": list(self.related_ids),
+            "links": [
+                {"id": link_id, "parent_id": parent_id, "child_id": child_id}
+                for link_id, parent_id, child_id in self.links
+            ],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    def encode(self) -> List[str]:
+        """Полезная нагрузка для pg_notify; событие больше предела делится на части."""
+        payload = json.dumps({**self.to_dict(), "origin": self.origin}, separators=(",", ":"))
+        if len(payload) <= MAX_PAYLOAD_BYTES:
+            return [payload]
+        if not self.links:
+            # Заметки и их соседи не сопоставлены попарно: делится больший список
+            field = max(("note_ids", "related_ids"), key=lambda name: len(getattr(self, name)))
+            items = getattr(self, field)
+            middle = len(items) // 2
+            return replace(self, **{field: items[:middle]}).encode() + replace(self, **{field: items[middle:]}).encode()
+
+        # Связи делятся вместе с заметками на их концах: иначе подписчик на эти
+        # заметки и сброс кэша по related_ids пропустили бы часть связей.
+        # Остальные заметки события уходят отдельной частью без связей.
+        ends = {note_id for _, parent_id, child_id in self.links for note_id in (parent_id, child_id)}
+        middle = max(len(self.links) // 2, 1)
+        parts = [self._links_part(self.links[:middle])]
+        if self.links[middle:]:
+            parts.append(self._links_part(self.links[middle:]))
+        rest = tuple(note_id for note_id in self.related_ids if note_id not in ends)
+        if self.note_ids or rest:
+            parts.append(replace(self, links=(), related_ids=rest))
+        return [payload for part in parts for payload in part.encode()]
+
+    def _links_part(self, links: Tuple[Tuple[int, int, int], ...]) -> "ChangeEvent":
+        """Часть события со связями links; related_ids — заметки на их концах."""
+        ends = dict.fromkeys(note_id for _, parent_id, child_id in links for note_id in (parent_id, child_id))
+        return replace(self, note_ids=(), related_ids=tuple(ends), links=links)
+
+    @classmethod
+    def decode(cls, payload: str) -> "ChangeEvent":
+        data = json.loads(payload)
+        return cls(
+            type=data["type"],
+            note_ids=tuple(data.get("note_ids", ())),
+            related_ids=tuple(data.get("related_ids", ())),
+            links=tuple((link["id"], link["parent_id"], link["child_id"]) for link in data.get("links", ())),
+            origin=data.get("origin", ""),
+        )
+
+
+class Subscription:
+    """Очередь событий одного клиента.
+
+    note_ids=None — все события; иначе только затрагивающие эти заметки
+    (в note_ids или related_ids события). resync доставляется всем.
+    """
+
+    def __init__(self, note_ids: Optional[Iterable[int]], queue_size: int):
+        self.note_ids: Optional[Set[int]] = set(note_ids) if note_ids is not None else None
+        self.queue: "asyncio.Queue[ChangeEvent]" = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def matches(self, event: ChangeEvent) -> bool:
+        if self.note_ids is None or event.type == RESYNC:
+            return True
+        return not self.note_ids.isdisjoint(event.note_ids) or not self.note_ids.isdisjoint(event.related_ids)
+
+    def subscribe(self, note_ids: Iterable[int]) -> None:
+        """Добавить заметки; подписка на все события сужается до них."""
+        if self.note_ids is None:
+            self.note_ids = set()
+        self.note_ids.update(note_ids)
+
+    def unsubscribe(self, note_ids: Iterable[int]) -> None:
+        if self.note_ids is not None:
+            self.note_ids.difference_update(note_ids)
+
+    def offer(self, event: ChangeEvent) -> bool:
+        """Поставить событие в очередь; при переполнении очередь заменяется на resync.
+
+        Returns:
+          False, если события были отброшены
+        """
+        if not self.matches(event):
+            return True
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(ChangeEvent(RESYNC))
+            return False
+
+    async def get(self, timeout: float) -> Optional[ChangeEvent]:
+        """Следующее событие или None, если за timeout секунд его не было."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def _listen_dsn() -> str:
+    return SETTINGS.events_listen_url or SETTINGS.sqlalchemy_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+class ChangeFeed:
+    """Одно соединение с LISTEN на процесс и раздача событий подписчикам."""
+
+    def __init__(self, enabled: bool, queue_size: int, check_interval: float,
+                 cache: Optional[NoteCache] = None, channel: str = CHANGES_CHANNEL,
+                 graph_cache: Optional[GraphSnapshotCache] = None):
+        self.enabled = enabled
+        self.queue_size = queue_size
+        self.check_interval = check_interval
+        self.cache = cache if cache is not None else get_note_cache()
+        self.graph_cache = graph_cache if graph_cache is not None else get_graph_snapshot_cache()
+        self.channel = channel
+        self.connected = False
+        self.received = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self._subscriptions: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, note_ids: Optional[Iterable[int]] = None) -> Subscription:
+        subscription = Subscription(note_ids, self.queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def dispatch(self, event: ChangeEvent) -> None:
+        """Раздать событие подписчикам и сбросить затронутые записи кэша."""
+        if event.origin != PROCESS_ID:
+            if self.cache.enabled:
+                keys = [card_key(note_id) for note_id in event.note_ids]
+                keys += [full_key(note_id) for note_id in {*event.note_ids, *event.related_ids}]
+                self.cache.invalidate(*keys)
+            if event.type in GRAPH_EVENTS:
+                self.graph_cache.invalidate()
+        for subscription in self._subscriptions:
+            if not subscription.offer(event):
+                self.dropped += 1
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            event = ChangeEvent.decode(payload)
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Некорректное событие в канале %s: %.200s", channel, payload)
+            return
+        self.received += 1
+        self.dispatch(event)
+
+    async def _listen(self, lost: asyncio.Event) -> None:
+        connection = await asyncpg.connect(_listen_dsn(), timeout=SETTINGS.db_connect_timeout)
+        try:
+            connection.add_termination_listener(lambda _: lost.set())
+            await connection.add_listener(self.channel, self._on_notification)
+            self.connected = True
+            if self.reconnects:
+                # Пока соединения не было, события могли потеряться
+                self.cache.clear()
+                self.graph_cache.invalidate()
+                self.dispatch(ChangeEvent(RESYNC))
+            while not lost.is_set():
+                try:
+                    await asyncio.wait_for(lost.wait(), self.check_interval)
+                except asyncio.TimeoutError:
+                    # Разрыв без закрытия TCP-соединения обнаруживается только запросом
+                    await connection.fetchval("SELECT 1", timeout=self.check_interval)
+        finally:
+            self.connected = False
+            connection.terminate()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen(asyncio.Event())
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                logger.warning("Соединение LISTEN %s потеряно: %s", self.channel, e)
+            self.reconnects += 1
+            await asyncio.sleep(self.check_interval)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "connected": self.connected,
+            "subscribers": len(self._subscriptions),
+            "received": self.received,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+        }
+
+
+change_feed = ChangeFeed(
+    enabled=SETTINGS.events_enabled,
+    queue_size=SETTINGS.events_queue_size,
+    check_interval=SETTINGS.events_heartbeat_seconds,
+)
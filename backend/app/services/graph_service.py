@@ -0,0 +1,112 @@
+import asyncio
+from array import array
+from typing import List, Optional, Tuple
+
+from sqlalchemy import ARRAY, Integer, Row, any_, bindparam, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.note import Note
+from app.services.graph_snapshot import GraphSnapshot, GraphSnapshotCache, get_graph_snapshot_cache, page_after
+from app.services.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+# Оба массива читаются Index Only Scan (note_pkey, uq_note_link) без сортировки;
+# перевод id в позиции снимка дешевле в Python, чем соединениями в SQL
+_SNAPSHOT_SQL = text("""
+SELECT
+    (SELECT array_agg(id ORDER BY id) FROM note) AS note_ids,
+    array_agg(parent_id ORDER BY parent_id, child_id) AS parent_ids,
+    array_agg(child_id ORDER BY parent_id, child_id) AS child_ids
+FROM notelink
+""")
+
+
+class GraphChangedError(Exception):
+    """Граф изменился после выдачи курсора топологического порядка."""
+
+
+def _graph_cursor(kind: str, key: int, version: Optional[str] = None) -> str:
+    payload = {"g": kind, "k": key}
+    if version is not None:
+        payload["v"] = version
+    return encode_cursor(payload)
+
+
+def _decode_graph_cursor(cursor: str, kind: str) -> dict:
+    payload = decode_cursor(cursor)
+    if not isinstance(payload, dict) or payload.get("g") != kind or not isinstance(payload.get("k"), int):
+        raise InvalidCursorError("Некорректный курсор")
+    return payload
+
+
+class GraphService:
+    """Аналитика по графу заметок над кэшируемым снимком связей."""
+
+    def __init__(self, db: AsyncSession, cache: Optional[GraphSnapshotCache] = None):
+        self.db = db
+        self.cache = cache if cache is not None else get_graph_snapshot_cache()
+
+    async def _load_snapshot(self) -> GraphSnapshot:
+        row = (await self.db.execute(_SNAPSHOT_SQL)).one()
+        # Массивы строятся и обходятся в потоке, не задерживая цикл событий
+        return await asyncio.to_thread(
+            lambda: GraphSnapshot(row.note_ids or (), row.parent_ids or (), row.child_ids or ()).compute_all())
+
+    async def get_snapshot(self) -> GraphSnapshot:
+        return await self.cache.get(self._load_snapshot)
+
+    async def get_stats(self) -> dict:
+        return (await self.get_snapshot()).stats
+
+    async def _summaries(self, note_ids: array) -> List[Row]:
+        """(id, title, importance) заметок в порядке note_ids; удалённые после снимка пропускаются."""
+        if not note_ids:
+            return []
+        result = await self.db.execute(
+            select(Note.id, Note.title, Note.importance)
+            .where(Note.id == any_(bindparam("ids", list(note_ids), type_=ARRAY(Integer)))))
+        rows = {row.id: row for row in result.all()}
+        return [rows[note_id] for note_id in note_ids if note_id in rows]
+
+    async def _id_page(self, kind: str, ids: array, after: Optional[str],
+                       limit: int) -> Tuple[List[Row], Optional[str]]:
+        after_id = _decode_graph_cursor(after, kind)["k"] if after is not None else None
+        page = page_after(ids, after_id, limit)
+        next_cursor = _graph_cursor(kind, page[-1]) if len(page) == limit else None
+        return await self._summaries(page), next_cursor
+
+    async def get_roots(self, after: Optional[str] = None, limit: int = 1000) -> Tuple[List[Row], Optional[str]]:
+        """Заметки без родителей по возрастанию id.
+
+        Returns:
+          Строки (id, title, importance) и курсор следующей страницы (None — страница последняя)
+        """
+        return await self._id_page("roots", (await self.get_snapshot()).roots, after, limit)
+
+    async def get_leaves(self, after: Optional[str] = None, limit: int = 1000) -> Tuple[List[Row], Optional[str]]:
+        """Заметки без детей по возрастанию id (см. get_roots)."""
+        return await self._id_page("leaves", (await self.get_snapshot()).leaves, after, limit)
+
+    async def get_topo_order(self, after: Optional[str] = None,
+                             limit: int = 1000) -> Tuple[List[Row], Optional[str]]:
+        """Заметки в топологическом порядке (родитель раньше потомков).
+
+        Курсор привязан к снимку: порядок после изменения графа другой,
+        и продолжать его со старой позиции нельзя.
+
+        Raises:
+          InvalidCursorError: курсор повреждён
+          GraphChangedError: граф изменился после выдачи курсора
+        """
+        snapshot = await self.get_snapshot()
+        offset = 0
+        if after is not None:
+            payload = _decode_graph_cursor(after, "topo")
+            if payload.get("v") != snapshot.version:
+                raise GraphChangedError()
+            offset = payload["k"]
+            if offset < 0:
+                raise InvalidCursorError("Некорректный курсор")
+        page = snapshot.topo_order[offset:offset + limit]
+        end = offset + len(page)
+        next_cursor = _graph_cursor("topo", end, snapshot.version) if end < len(snapshot.topo_order) else None
+        return await self._summaries(page), next_cursor
@@ -0,0 +1,207 @@
+"""Компактный снимок графа связей для аналитики (GET /graph/*).
+
+Узлы снимка — позиции 0..n-1 заметок в порядке возрастания id; связи
+хранятся в виде CSR: дети узла u — targets[offsets[u]:offsets[u + 1]].
+Все массивы — array("i"), без объектов на узел или связь, поэтому
+снимок большого графа занимает несколько байт на элемент.
+
+Снимок общий для процесса и перестраивается после изменений заметок и
+связей: этого процесса — сразу после commit, других процессов — по
+событиям потока изменений (app.services.events), а без них — по TTL.
+"""
+import asyncio
+import hashlib
+import time
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timezone
+from functools import cached_property
+from itertools import accumulate
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+from app.core.config import SETTINGS
+
+
+class GraphSnapshot:
+    """Заметки и связи в виде массивов целых чисел и вычисления над ними."""
+
+    def __init__(self, note_ids: Sequence[int], parent_ids: Sequence[int], child_ids: Sequence[int]):
+        """
+        Args:
+          note_ids: id всех заметок по возрастанию
+          parent_ids, child_ids: концы связей, упорядоченные по parent_ids
+        """
+        n = len(note_ids)
+        self.built_at = datetime.now(timezone.utc)
+        self.note_ids = array("i", note_ids)
+        # Словарь id → позиция нужен только на время построения
+        position = {note_id: node for node, note_id in enumerate(note_ids)}
+        self.targets = array("i", [position[child_id] for child_id in child_ids])
+        counts = [0] * (n + 1)
+        for parent_id in parent_ids:
+            counts[position[parent_id] + 1] += 1
+        self.offsets = array("i", accumulate(counts))
+        # Версия зависит только от содержимого: снимки одного графа, построенные
+        # разными процессами или после перестроения по TTL, совпадают, и курсоры
+        # топологического порядка остаются действительными
+        digest = hashlib.blake2b(digest_size=6)
+        for values in (self.note_ids, self.offsets, self.targets):
+            digest.update(values.tobytes())
+        self.version = digest.hexdigest()
+        in_degree = [0] * n
+        for child in self.targets:
+            in_degree[child] += 1
+        self.in_degree = array("i", in_degree)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.note_ids)
+
+    @property
+    def link_count(self) -> int:
+        return len(self.targets)
+
+    def out_degrees(self) -> List[int]:
+        offsets = self.offsets
+        return [end - start for start, end in zip(offsets, offsets[1:])]
+
+    @cached_property
+    def roots(self) -> array:
+        """id заметок без родителей по возрастанию."""
+        return array("i", (note_id for note_id, degree in zip(self.note_ids, self.in_degree) if degree == 0))
+
+    @cached_property
+    def leaves(self) -> array:
+        """id заметок без детей по возрастанию."""
+        return array("i", (note_id for note_id, degree in zip(self.note_ids, self.out_degrees()) if degree == 0))
+
+    @cached_property
+    def _layers(self) -> tuple:
+        """Топологический порядок (позиции) и глубина каждого узла.
+
+        Алгоритм Кана от корней в порядке id; глубина — длина самого
+        длинного пути от корня. Узлы на циклах в порядок не попадают.
+        """
+        offsets, targets = self.offsets, self.targets
+        remaining = array("i", self.in_degree)
+        depth = array("i", bytes(4 * self.node_count))
+        order = array("i", (node for node, degree in enumerate(remaining) if degree == 0))
+        i = 0
+        while i < len(order):
+            node = order[i]
+            i += 1
+            child_depth = depth[node] + 1
+            for child in targets[offsets[node]:offsets[node + 1]]:
+                if depth[child] < child_depth:
+                    depth[child] = child_depth
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    order.append(child)
+        return order, depth
+
+    @property
+    def acyclic(self) -> bool:
+        return len(self._layers[0]) == self.node_count
+
+    @cached_property
+    def topo_order(self) -> array:
+        """id заметок в топологическом порядке: родитель раньше любого потомка."""
+        note_ids = self.note_ids
+        return array("i", (note_ids[node] for node in self._layers[0]))
+
+    @cached_property
+    def stats(self) -> dict:
+        order, depth = self._layers
+        depth_distribution = [0] * (max(depth, default=-1) + 1)
+        for node in order:
+            depth_distribution[depth[node]] += 1
+        out_degrees = self.out_degrees()
+        isolated = sum(1 for degree_in, degree_out in zip(self.in_degree, out_degrees) if not degree_in and not degree_out)
+        mean_degree = self.link_count / self.node_count if self.node_count else 0.0
+        return {
+            "notes": self.node_count,
+            "links": self.link_count,
+            "roots": len(self.roots),
+            "leaves": len(self.leaves),
+            "isolated": isolated,
+            "acyclic": self.acyclic,
+            "max_depth": len(depth_distribution) - 1 if depth_distribution else 0,
+            "depth_distribution": depth_distribution,
+            "in_degree": {"max": max(self.in_degree, default=0), "mean": mean_degree},
+            "out_degree": {"max": max(out_degrees, default=0), "mean": mean_degree},
+            "version": self.version,
+            "built_at": self.built_at,
+        }
+
+    def compute_all(self) -> "GraphSnapshot":
+        """Выполнить все вычисления заранее (в отдельном потоке при построении)."""
+        self.stats
+        self.topo_order
+        return self
+
+
+def page_after(ids: array, after_id: Optional[int], limit: int) -> array:
+    """Не более limit id из возрастающего массива ids, больших after_id."""
+    start = bisect_right(ids, after_id) if after_id is not None else 0
+    return ids[start:start + limit]
+
+
+class GraphSnapshotCache:
+    """Снимок графа процесса с перестроением после сброса или по TTL.
+
+    Одновременные запросы ждут одного построения. Снимок, построение
+    которого началось до invalidate(), отдаётся вызвавшему, но не
+    сохраняется: он мог быть прочитан до изменения.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[GraphSnapshot] = None
+        self._expires_at = 0.0
+        self._epoch = 0
+        self._lock = asyncio.Lock()
+        self.builds = 0
+        self.invalidations = 0
+
+    def _fresh(self) -> Optional[GraphSnapshot]:
+        if self._snapshot is not None and self._expires_at > time.monotonic():
+            return self._snapshot
+        return None
+
+    async def get(self, load: Callable[[], Awaitable[GraphSnapshot]]) -> GraphSnapshot:
+        """Актуальный снимок; при необходимости строится через load()."""
+        snapshot = self._fresh()
+        if snapshot is not None:
+            return snapshot
+        async with self._lock:
+            snapshot = self._fresh()
+            if snapshot is not None:
+                return snapshot
+            epoch = self._epoch
+            snapshot = await load()
+            self.builds += 1
+            if epoch == self._epoch:
+                self._snapshot = snapshot
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            return snapshot
+
+    def invalidate(self) -> None:
+        self._epoch += 1
+        if self._snapshot is not None:
+            self._snapshot = None
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "cached": self._fresh() is not None,
+            "builds": self.builds,
+            "invalidations": self.invalidations,
+        }
+
+
+graph_snapshot_cache = GraphSnapshotCache(ttl_seconds=SETTINGS.graph_snapshot_ttl_seconds)
+
+
+def get_graph_snapshot_cache() -> GraphSnapshotCache:
+    """Общий для процесса снимок графа."""
+    return graph_snapshot_cache
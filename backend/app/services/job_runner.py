@@ -0,0 +1,380 @@
+"""Выполнение фоновых задач из таблицы job в процессе приложения.
+
+Каждый процесс запускает jobs_concurrency воркеров (asyncio-задач).
+Воркер захватывает задачу session-level advisory-блокировкой
+(JOB_LOCK_CLASS, id) на отдельном соединении и держит её до конца
+выполнения. Если процесс упал, PostgreSQL снимает блокировку вместе с
+соединением, и задача в статусе running достаётся другому воркеру,
+который продолжает её с позиции из job.state.
+
+Задачи выполняются пакетами по jobs_batch_size элементов, каждый пакет —
+отдельная транзакция. Прогресс сохраняется в той же транзакции, что и
+изменения пакета, либо пакет идемпотентен и его повтор безопасен.
+
+Задача с ошибкой повторяется не раньше чем через jobs_retry_backoff_seconds,
+пауза удваивается с каждой попыткой. После jobs_max_attempts запусков
+(включая прерванные падением процесса) задача помечается failed.
+
+Через PgBouncer в режиме transaction session-level блокировки не
+работают: задачи нужно выполнять в процессах с прямым соединением с БД.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.config import SETTINGS
+from app.db.session import SessionLocal, engine
+from app.models.job import Job, JobItem
+from app.models.note import Note, NoteLink
+from app.schemas.job import BulkImportParams, DeleteSubtreeParams, ReindexParams
+from app.services.note_service import NoteService
+
+logger = logging.getLogger(__name__)
+
+# Первый ключ advisory-блокировки задачи; второй — id задачи
+JOB_LOCK_CLASS = 0x6A6F62
+
+# Сколько незавершённых задач проверяется за одну попытку захвата
+CLAIM_CANDIDATES = 20
+
+# Сколько ошибок по элементам сохраняется в результате импорта
+MAX_REPORTED_ERRORS = 100
+
+ACTIVE_STATUSES = ("pending", "running")
+
+# Ошибка задачи, попытки которой кончились падением процесса
+EXHAUSTED_ERROR = "Задача прервана, попытки исчерпаны"
+
+# Потомки заметки вместе с ней самой; UNION отбрасывает уже найденные узлы
+_SUBTREE_SQL = text("""
+WITH RECURSIVE subtree(id) AS (
+    SELECT CAST(:note_id AS integer)
+    UNION
+    SELECT l.child_id FROM notelink l JOIN subtree s ON l.parent_id = s.id
+)
+INSERT INTO job_item (job_id, note_id)
+SELECT :job_id, id FROM subtree
+ON CONFLICT DO NOTHING
+""")
+
+
+class JobContext:
+    """Состояние выполняемой задачи, доступное обработчику."""
+
+    def __init__(self, job: Job, session: AsyncSession, batch_size: int):
+        self.job_id = job.id
+        self.params = job.params
+        self.state = dict(job.state)
+        self.progress_done = job.progress_done
+        self.progress_total = job.progress_total
+        self.session = session
+        self.batch_size = batch_size
+
+    async def load_payload(self) -> dict:
+        """Входные данные задачи (job.payload), которые не загружаются вместе с ней."""
+        payload = await self.session.scalar(select(Job.payload).where(Job.id == self.job_id))
+        return payload or {}
+
+    async def save_progress(self, done: int, total: Optional[int] = None, **state) -> None:
+        """Записать прогресс и позицию продолжения.
+
+        Не выполняет commit: запись фиксируется ближайшим commit сессии
+        вместе с изменениями пакета.
+        """
+        self.progress_done = done
+        if total is not None:
+            self.progress_total = total
+        self.state.update(state)
+        await self.session.execute(
+            update(Job).where(Job.id == self.job_id)
+            .values(progress_done=done, progress_total=self.progress_total, state=self.state))
+
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[dict]]]
+
+
+async def _bulk_import(ctx: JobContext) -> dict:
+    params = BulkImportParams.model_validate(await ctx.load_payload())
+    note_service = NoteService(ctx.session)
+    total = len(params.notes) + len(params.links)
+    notes_done = ctx.state.get("notes_done", 0)
+    links_done = ctx.state.get("links_done", 0)
+    links_created = ctx.state.get("links_created", 0)
+    errors: List[dict] = ctx.state.get("errors", [])
+
+    while notes_done < len(params.notes):
+        batch = params.notes[notes_done:notes_done + ctx.batch_size]
+        notes_done += len(batch)
+        # Прогресс фиксируется тем же commit, что и заметки пакета
+        await ctx.save_progress(notes_done, total, notes_done=notes_done)
+        await note_service.bulk_create_notes(batch)
+
+    while links_done < len(params.links):
+        batch = params.links[links_done:links_done + ctx.batch_size]
+        batch_end = links_done + len(batch)
+
+        async def save_batch(outcomes: List[tuple], start: int = links_done, end: int = batch_end) -> None:
+            # Итоги пакета фиксируются тем же commit, что и его связи: иначе
+            # повтор пакета после сбоя счёл бы созданные связи уже существующими
+            nonlocal links_created
+            for offset, (link_id, error) in enumerate(outcomes):
+                if link_id is not None:
+                    links_created += 1
+                elif len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"index": start + offset, "error": error})
+            await ctx.save_progress(notes_done + end, total, links_done=end,
+                                    links_created=links_created, errors=errors)
+
+        await note_service.bulk_create_links(batch, before_commit=save_batch)
+        links_done = batch_end
+
+    return {
+        "notes_created": len(params.notes),
+        "links_created": links_created,
+        "links_failed": len(params.links) - links_created,
+        "errors": errors,
+    }
+
+
+async def _delete_note_links(ctx: JobContext, note_service: NoteService, note_id: int) -> dict:
+    if ctx.progress_total is None:
+        result = await ctx.session.execute(
+            select(func.count()).select_from(NoteLink)
+            .where((NoteLink.parent_id == note_id) | (NoteLink.child_id == note_id)))
+        await ctx.save_progress(0, result.scalar() + 1)
+        await ctx.session.commit()
+
+    links_deleted = ctx.state.get("links_deleted", 0)
+    while removed := await note_service.delete_note_links(note_id, ctx.batch_size):
+        links_deleted += removed
+        await ctx.save_progress(links_deleted, links_deleted=links_deleted)
+        await ctx.session.commit()
+
+    deleted = await note_service.delete_note(note_id)
+    await ctx.save_progress(links_deleted + 1)
+    await ctx.session.commit()
+    return {"notes_deleted": int(deleted), "links_deleted": links_deleted}
+
+
+async def _delete_subtree(ctx: JobContext) -> dict:
+    params = DeleteSubtreeParams.model_validate(ctx.params)
+    note_service = NoteService(ctx.session)
+    if not params.descendants:
+        return await _delete_note_links(ctx, note_service, params.note_id)
+
+    if not ctx.state.get("snapshot"):
+        # Список удаляемых заметок фиксируется один раз: после удаления
+        # части заметок их потомки уже не находятся обходом от исходной
+        exists = await ctx.session.scalar(select(Note.id).where(Note.id == params.note_id))
+        if exists is None:
+            return {"notes_deleted": 0}
+        result = await ctx.session.execute(_SUBTREE_SQL, {"note_id": params.note_id, "job_id": ctx.job_id})
+        await ctx.save_progress(0, result.rowcount, snapshot=True)
+        await ctx.session.commit()
+
+    notes_deleted = ctx.progress_done
+    while True:
+        batch = (
+            select(JobItem.note_id).where(JobItem.job_id == ctx.job_id)
+            .order_by(JobItem.note_id).limit(ctx.batch_size)
+        )
+        result = await ctx.session.execute(
+            delete(JobItem)
+            .where(JobItem.job_id == ctx.job_id, JobItem.note_id.in_(batch))
+            .returning(JobItem.note_id))
+        note_ids = list(result.scalars().all())
+        if not note_ids:
+            break
+        notes_deleted += len(note_ids)
+        # Элементы задачи, прогресс и сами заметки удаляются одним commit
+        await ctx.save_progress(notes_deleted)
+        await note_service.delete_notes(note_ids)
+    await ctx.session.commit()
+    return {"notes_deleted": notes_deleted}
+
+
+async def _rebuild_closure(ctx: JobContext) -> dict:
+    note_service = NoteService(ctx.session, closure_enabled=True)
+    await note_service.lock_link_graph()
+    total = await note_service.closure.rebuild()
+    await ctx.save_progress(1, 1)
+    await ctx.session.commit()
+    return {"pairs": total}
+
+
+# Невалидные индексы, оставшиеся от прерванного REINDEX CONCURRENTLY
+_LEFTOVER_INDEXES_SQL = text("""
+SELECT c.relname
+FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+WHERE i.indrelid = CAST(:table AS regclass) AND NOT i.indisvalid
+  AND c.relname ~ '_cc(new|old)[0-9]*$'
+""")
+
+
+async def _reindex(ctx: JobContext) -> dict:
+    params = ReindexParams.model_validate(ctx.params)
+    tables_done = ctx.state.get("tables_done", 0)
+    for table in params.tables[tables_done:]:
+        # REINDEX CONCURRENTLY нельзя выполнять внутри транзакции
+        async with engine.connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            # Иначе после каждого сбоя таблица копила бы невалидные индексы,
+            # которые тоже обновляются при каждой записи
+            result = await connection.execute(_LEFTOVER_INDEXES_SQL, {"table": table})
+            for index_name in result.scalars().all():
+                await connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"'))
+            await connection.execute(text(f'REINDEX TABLE CONCURRENTLY "{table}"'))
+        tables_done += 1
+        await ctx.save_progress(tables_done, len(params.tables), tables_done=tables_done)
+        await ctx.session.commit()
+    return {"tables": params.tables}
+
+
+JOB_HANDLERS: Dict[str, JobHandler] = {
+    "bulk_import": _bulk_import,
+    "delete_subtree": _delete_subtree,
+    "rebuild_closure": _rebuild_closure,
+    "reindex": _reindex,
+}
+
+
+class JobRunner:
+    """Воркеры фоновых задач этого процесса."""
+
+    def __init__(self, concurrency: int, poll_interval: float, batch_size: int, max_attempts: int,
+                 retry_backoff: float, db_engine: AsyncEngine = engine,
+                 session_factory: async_sessionmaker = SessionLocal):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.engine = db_engine
+        self.session_factory = session_factory
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self.concurrency <= 0 or self._tasks:
+            return
+        if SETTINGS.db_pgbouncer:
+            logger.warning("Фоновые задачи через PgBouncer (transaction) могут выполняться дважды: "
+                           "advisory-блокировки не переживают транзакцию")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Остановить воркеры; прерванные задачи продолжит другой процесс или следующий запуск."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Разбудить воркеры этого процесса (новая задача в очереди)."""
+        self._wakeup.set()
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_next()
+            except Exception:
+                logger.exception("Ошибка воркера фоновых задач")
+                claimed = False
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def run_next(self) -> bool:
+        """Захватить и выполнить одну задачу. Returns: была ли задача."""
+        async with self.engine.connect() as lock_connection:
+            job_id = await self._claim(lock_connection)
+            if job_id is None:
+                return False
+            try:
+                await self._execute(job_id)
+            finally:
+                await self._unlock(lock_connection, job_id)
+        return True
+
+    async def _claim(self, connection: AsyncConnection) -> Optional[int]:
+        result = await connection.execute(
+            select(Job.id)
+            .where(Job.status.in_(ACTIVE_STATUSES), or_(Job.run_after.is_(None), Job.run_after <= func.now()))
+            .order_by(Job.id).limit(CLAIM_CANDIDATES))
+        for job_id in result.scalars().all():
+            # running без блокировки — задача упавшего процесса, её можно продолжить
+            if not await connection.scalar(select(func.pg_try_advisory_lock(JOB_LOCK_CLASS, job_id))):
+                continue
+            claimed = await connection.scalar(
+                update(Job)
+                .where(Job.id == job_id, Job.status.in_(ACTIVE_STATUSES), Job.attempts < self.max_attempts)
+                .values(status="running", attempts=Job.attempts + 1, run_after=None,
+                        started_at=func.coalesce(Job.started_at, func.now()))
+                .returning(Job.id))
+            if claimed is None:
+                # Процесс упал во время последней попытки: задача больше не запускается
+                await connection.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status.in_(ACTIVE_STATUSES), Job.attempts >= self.max_attempts)
+                    .values(status="failed", error=func.coalesce(Job.error, EXHAUSTED_ERROR),
+                            finished_at=func.now()))
+            await connection.commit()
+            if claimed is not None:
+                return job_id
+            await self._unlock(connection, job_id)
+        await connection.commit()
+        return None
+
+    async def _unlock(self, connection: AsyncConnection, job_id: int) -> None:
+        try:
+            await connection.execute(select(func.pg_advisory_unlock(JOB_LOCK_CLASS, job_id)))
+            await connection.commit()
+        except BaseException:
+            # Соединение с неснятой блокировкой нельзя возвращать в пул
+            await connection.invalidate()
+            raise
+
+    async def _execute(self, job_id: int) -> None:
+        async with self.session_factory() as session:
+            job = await session.get(Job, job_id)
+            context = JobContext(job, session, self.batch_size)
+            kind, attempts = job.kind, job.attempts
+            # Не держать открытым снимок чтения: его ждал бы, например, REINDEX CONCURRENTLY
+            await session.commit()
+            try:
+                handler = JOB_HANDLERS.get(kind)
+                if handler is None:
+                    raise ValueError(f"Неизвестный тип задачи: {kind}")
+                result = await handler(context)
+            except Exception as e:
+                await session.rollback()
+                failed = attempts >= self.max_attempts
+                logger.exception("Задача %s (%s), попытка %s: ошибка", job_id, kind, attempts)
+                retry_delay = timedelta(seconds=self.retry_backoff * 2 ** (attempts - 1))
+                await session.execute(
+                    update(Job).where(Job.id == job_id)
+                    .values(status="failed" if failed else "pending", error=str(e)[:2000],
+                            run_after=None if failed else func.now() + retry_delay,
+                            finished_at=func.now() if failed else None))
+                await session.commit()
+                return
+            await session.execute(
+                update(Job).where(Job.id == job_id)
+                .values(status="succeeded", result=result, error=None, finished_at=func.now()))
+            await session.commit()
+
+
+job_runner = JobRunner(
+    concurrency=SETTINGS.jobs_concurrency,
+    poll_interval=SETTINGS.jobs_poll_interval,
+    batch_size=SETTINGS.jobs_batch_size,
+    max_attempts=SETTINGS.jobs_max_attempts,
+    retry_backoff=SETTINGS.jobs_retry_backoff_seconds,
+)
@@ -0,0 +1,38 @@
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.job import Job
+
+
+class JobService:
+    """Постановка фоновых задач в очередь и чтение их состояния."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_job(self, kind: str, params: dict, payload: Optional[dict] = None) -> Job:
+        """Поставить задачу в очередь; выполнит её JobRunner одного из процессов.
+
+        Args:
+          kind: тип задачи
+          params: параметры, видимые вместе с задачей
+          payload: объёмные входные данные (читаются только при выполнении)
+        """
+        job = Job(kind=kind, params=params, payload=payload)
+        self.db.add(job)
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+
+    async def get_job(self, job_id: int) -> Optional[Job]:
+        return await self.db.get(Job, job_id)
+
+    async def get_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+        """Последние задачи, новые первыми."""
+        stmt = select(Job).order_by(Job.id.desc()).limit(limit)
+        if status is not None:
+            stmt = stmt.where(Job.status == status)
+        result = await self.db.execute(stmt)
+        return list(result.scalars().all())
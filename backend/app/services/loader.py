@@ -0,0 +1,129 @@
+"""Загрузчики заметок и связей в рамках одного запроса (DataLoader).
+
+Вызовы load() за один проход цикла событий собираются в один SQL-запрос,
+а результаты запоминаются до конца сессии (до commit или rollback), так что
+повторные обращения к той же заметке или связи не идут в БД.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Sequence, TypeVar
+
+from sqlalchemy import ARRAY, Integer, any_, cast, event, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.note import Note, NoteLink
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+BatchFn = Callable[[List[K]], Awaitable[Dict[K, V]]]
+
+
+class BatchLoader(Generic[K, V]):
+    """Пакетная загрузка по ключам с запоминанием результатов.
+
+    Ключи, запрошенные до того, как запустится задача выборки (то есть
+    в том же проходе цикла событий), загружаются одним вызовом batch_fn.
+    Ключи, которых нет в результате batch_fn, получают default.
+    """
+
+    def __init__(self, batch_fn: BatchFn, default: Callable[[], V] = lambda: None):
+        self._batch_fn = batch_fn
+        self._default = default
+        self._memo: Dict[K, asyncio.Future] = {}
+        self._queue: List[K] = []
+        self._dispatch_scheduled = False
+
+    def load(self, key: K) -> Awaitable[V]:
+        future = self._memo.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._memo[key] = future
+            self._queue.append(key)
+            if not self._dispatch_scheduled:
+                self._dispatch_scheduled = True
+                loop.create_task(self._dispatch())
+        return future
+
+    async def load_many(self, keys: Sequence[K]) -> List[V]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def prime(self, key: K, value: V) -> None:
+        """Запомнить уже загруженное значение, если ключ ещё не запрашивался."""
+        if key not in self._memo:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+            self._memo[key] = future
+
+    def clear(self) -> None:
+        """Забыть запомненные значения; ожидающие загрузки завершатся как обычно."""
+        self._memo = {key: future for key, future in self._memo.items() if not future.done()}
+
+    async def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        self._dispatch_scheduled = False
+        futures = [(key, self._memo.get(key)) for key in keys]
+        try:
+            values = await self._batch_fn(keys)
+        except Exception as e:
+            for key, future in futures:
+                if self._memo.get(key) is future:
+                    del self._memo[key]  # следующий load() повторит запрос
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in futures:
+            if future is not None and not future.done():
+                future.set_result(values[key] if key in values else self._default())
+
+
+def _id_array(ids: List[int]):
+    return cast(ids, ARRAY(Integer))
+
+
+class NoteLoaders:
+    """Загрузчики одной сессии БД: заметки, связи по ID и связи заметки.
+
+    Результаты сбрасываются после commit и rollback сессии: запомненные
+    значения могли измениться.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.notes: BatchLoader[int, Optional[Note]] = BatchLoader(self._load_notes)
+        self.links: BatchLoader[int, Optional[NoteLink]] = BatchLoader(self._load_links)
+        self.links_by_note: BatchLoader[int, List[NoteLink]] = BatchLoader(
+            self._load_links_by_note, default=list)
+        event.listen(db.sync_session, "after_commit", self._on_session_end)
+        event.listen(db.sync_session, "after_rollback", self._on_session_end)
+
+    def _on_session_end(self, session) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self.notes.clear()
+        self.links.clear()
+        self.links_by_note.clear()
+
+    async def _load_notes(self, note_ids: List[int]) -> Dict[int, Note]:
+        result = await self.db.execute(select(Note).where(Note.id == any_(_id_array(note_ids))))
+        return {note.id: note for note in result.scalars().all()}
+
+    async def _load_links(self, link_ids: List[int]) -> Dict[int, NoteLink]:
+        result = await self.db.execute(select(NoteLink).where(NoteLink.id == any_(_id_array(link_ids))))
+        return {link.id: link for link in result.scalars().all()}
+
+    async def _load_links_by_note(self, note_ids: List[int]) -> Dict[int, List[NoteLink]]:
+        ids = _id_array(note_ids)
+        result = await self.db.execute(
+            select(NoteLink)
+            .where(or_(NoteLink.parent_id == any_(ids), NoteLink.child_id == any_(ids)))
+            .order_by(NoteLink.id)
+        )
+        requested = set(note_ids)
+        by_note: Dict[int, List[NoteLink]] = {note_id: [] for note_id in note_ids}
+        for link in result.scalars().all():
+            self.links.prime(link.id, link)
+            for note_id in {link.parent_id, link.child_id} & requested:
+                by_note[note_id].append(link)
+        return by_note
@@ -1,109 +1,878 @@
-from typing import Optional, List
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Optional, List, Literal, Sequence, Tuple, Union
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import and_, or_, func, select, update
-from sqlalchemy.orm import selectinload
+from sqlalchemy import (
+    ARRAY, Double, Integer, Row, any_, bindparam, case, cast, column, delete, literal, or_, func, select, text,
+    union_all, update,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, selectinload
 
-from app.models.note import Note, NoteLink
+from app.core.config import SETTINGS
+from app.models.note import SEARCH_CONFIG, Note, NoteLink, SyncTombstone
 from app.schemas.note import NoteCreate, NoteUpdate, NoteLinkCreate
+from app.schemas.serialization import NOTE_FULL, NOTE_RESPONSE
+from app.services.cache import CachedPayload, NoteCache, card_key, full_key, get_note_cache
+from app.services.closure_service import ClosureService
+from app.services.dag import bfs_levels, build_adjacency, has_path, is_acyclic
+from app.services.etag import full_note_etag, note_etag
+from app.services.events import CHANGES_CHANNEL, ChangeEvent
+from app.services.graph_snapshot import GraphSnapshotCache, get_graph_snapshot_cache
+from app.services.loader import NoteLoaders
+from app.services.pagination import (
+    SYNC_LINK, SYNC_LINK_DELETED, SYNC_NOTE, SYNC_NOTE_DELETED, SYNC_START, CatalogOrderBy, SortOrder,
+    SyncPosition, catalog_after_clause, catalog_sort_keys, decode_sync_token, search_after_clause,
+    sync_after_clause, sync_token,
+)
+
+TraversalDirection = Literal["up", "down", "both"]
+
+NoteLoadProfile = Literal["card", "full"]
+
+NoteBatchFields = Literal["summary", "full"]
+
+# Что загружается вместе с заметкой для каждого сценария.
+# "card" — только колонки заметки (NoteResponse);
+# "full" — связи и соседние заметки без content (NoteWithRelationsOptimized);
+# updated_at соседей нужен для ETag ответа.
+NOTE_LOAD_OPTIONS: dict[str, tuple] = {
+    "card": (),
+    "full": (
+        selectinload(Note.parent_links)
+        .joinedload(NoteLink.parent, innerjoin=True)
+        .load_only(Note.id, Note.title, Note.importance, Note.updated_at, raiseload=True),
+        selectinload(Note.children_links)
+        .joinedload(NoteLink.child, innerjoin=True)
+        .load_only(Note.id, Note.title, Note.importance, Note.updated_at, raiseload=True),
+    ),
+}
+
+
+class NoteVersionConflict(Exception):
+    """Версия заметки не совпала с ожидаемой (If-Match)."""
+
+# Соседи текущего фронта обхода: "up" — родители, "down" — дети
+_NEIGHBOURS_SQL: dict[str, str] = {
+    "up": "SELECT l.parent_id AS id FROM notelink l WHERE l.child_id = ANY(bfs.frontier)",
+    "down": "SELECT l.child_id AS id FROM notelink l WHERE l.parent_id = ANY(bfs.frontier)",
+    "both": (
+        "SELECT l.parent_id AS id FROM notelink l WHERE l.child_id = ANY(bfs.frontier) "
+        "UNION SELECT l.child_id FROM notelink l WHERE l.parent_id = ANY(bfs.frontier)"
+    ),
+}
+
+# Обход в ширину одним запросом: каждая итерация — целый уровень графа.
+# visited хранит все уже найденные узлы, поэтому циклы и ромбы (DAG diamonds)
+# не дают повторов и повторного обхода, а глубина узла — минимальная.
+# Проверка по visited — хеш-антисоединение, но сам массив копируется на
+# каждом уровне, поэтому обход рассчитан на ограниченное max_nodes число узлов.
+_TRAVERSAL_SQL = """
+WITH RECURSIVE bfs(frontier, visited, depth) AS (
+    SELECT ARRAY[CAST(:note_id AS integer)], ARRAY[CAST(:note_id AS integer)], 0
+    UNION ALL
+    SELECT step.ids, bfs.visited || step.ids, bfs.depth + 1
+    FROM bfs
+    CROSS JOIN LATERAL (
+        SELECT array_agg(DISTINCT nb.id ORDER BY nb.id) AS ids
+        FROM ({neighbours}) AS nb
+        WHERE NOT EXISTS (SELECT 1 FROM unnest(bfs.visited) AS seen(id) WHERE seen.id = nb.id)
+    ) AS step
+    WHERE step.ids IS NOT NULL
+      AND (CAST(:max_depth AS integer) IS NULL OR bfs.depth < CAST(:max_depth AS integer))
+      AND (CAST(:max_nodes AS integer) IS NULL OR cardinality(bfs.visited) - 1 < CAST(:max_nodes AS integer))
+)
+SELECT node.id, bfs.depth
+FROM bfs CROSS JOIN LATERAL unnest(bfs.frontier) AS node(id)
+"""
+
+# Все связи, достижимые от заметки по направлению обхода. Рекурсия идёт
+# по одному id: UNION отбрасывает уже найденные узлы, поэтому каждый узел
+# раскрывается один раз, а цикл (вставленный в обход проверок) не зацикливает
+# запрос. Глубину считает обход в ширину по этим связям (dag.bfs_levels):
+# в SQL для неё пришлось бы хранить список посещённых узлов, а его копия на
+# каждом уровне делает обход глубоких графов квадратичным.
+_WALK_SQL = """
+WITH RECURSIVE reach(id) AS (
+    SELECT CAST(:note_id AS integer)
+    UNION
+    SELECT l.{next_id} FROM reach JOIN notelink l ON l.{this_id} = reach.id
+)
+SELECT array_agg(l.{this_id}) AS this_ids, array_agg(l.{next_id}) AS next_ids
+FROM reach JOIN notelink l ON l.{this_id} = reach.id
+"""
+
+# Найденные обходом узлы с глубиной как подзапрос (колонки id, depth)
+_WALK_RESULT_SQL = text("""
+SELECT id, depth FROM unnest(CAST(:ids AS integer[]), CAST(:depths AS integer[])) AS walk(id, depth)
+""")
+
+# Колонки связи (текущий узел, следующий узел) для _WALK_SQL
+_WALK_COLUMNS: dict[str, Tuple[str, str]] = {
+    "up": ("child_id", "parent_id"),
+    "down": ("parent_id", "child_id"),
+}
+
+# Достижимость target из start по направлению родитель → ребёнок.
+# UNION отбрасывает уже посещённые узлы, а LIMIT 1 останавливает
+# рекурсию, как только target найден.
+_REACHABILITY_SQL = text("""
+WITH RECURSIVE reach(id) AS (
+    SELECT CAST(:start AS integer)
+    UNION
+    SELECT l.child_id FROM notelink l JOIN reach r ON l.parent_id = r.id
+)
+SELECT 1 FROM reach WHERE id = CAST(:target AS integer) LIMIT 1
+""")
+
+# Подграф, в котором может замкнуться цикл через новые связи: все
+# существующие связи, исходящие из узлов, достижимых из детей новых связей.
+_DOWNSTREAM_EDGES_SQL = text("""
+WITH RECURSIVE reach(id) AS (
+    SELECT unnest(CAST(:seed_ids AS integer[]))
+    UNION
+    SELECT l.child_id FROM notelink l JOIN reach r ON l.parent_id = r.id
+)
+SELECT l.parent_id, l.child_id FROM notelink l JOIN reach r ON l.parent_id = r.id
+""").bindparams(bindparam("seed_ids", type_=ARRAY(Integer)))
+
+_BULK_INSERT_LINKS_SQL = text("""
+INSERT INTO notelink (parent_id, child_id)
+SELECT * FROM unnest(CAST(:parent_ids AS integer[]), CAST(:child_ids AS integer[]))
+ON CONFLICT ON CONSTRAINT uq_note_link DO NOTHING
+RETURNING id, parent_id, child_id
+""").bindparams(
+    bindparam("parent_ids", type_=ARRAY(Integer)),
+    bindparam("child_ids", type_=ARRAY(Integer)),
+)
+
+# Резервирование id для пакетной вставки: значения последовательности
+# выдаются по порядку, поэтому i-й id соответствует i-й заметке пакета.
+_ALLOCATE_NOTE_IDS_SQL = text("""
+SELECT nextval(pg_get_serial_sequence('note', 'id')) FROM generate_series(1, :count)
+""")
+
+# Ключ транзакционной advisory-блокировки на изменение структуры графа:
+# проверка циклов и вставка связи выполняются под ней, поэтому
+# параллельные create_link не могут вместе замкнуть цикл.
+# Удалению связей и заметок блокировка нужна только для note_closure:
+# удаление лишь убирает пути и не может создать цикл, а проверка цикла,
+# увидевшая ещё не удалённую связь, в худшем случае отклонит связь,
+# как если бы удаление выполнилось позже. Пересчёт note_closure читает
+# саму таблицу и без блокировки мог бы потерять параллельный add_link.
+LINK_GRAPH_LOCK_KEY = 0x6E6F7465
+
+# Транзакции с номером меньше xmin снимка завершены: изменения ниже этой
+# границы уже не появятся задним числом, и выдавать их в /sync безопасно
+_SNAPSHOT_XMIN_SQL = text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+# Все части события одним запросом; NOTIFY доставляется после commit
+_PUBLISH_SQL = text(
+    "SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload")
 
 class NoteService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, closure_enabled: Optional[bool] = None,
+                 cache: Optional[NoteCache] = None, loaders: Optional[NoteLoaders] = None,
+                 events_enabled: Optional[bool] = None, graph_cache: Optional[GraphSnapshotCache] = None):
         # Инициализация с сессией БД
         self.db = db
+        # Загрузчики запроса: объединяют одинаковые обращения к заметкам и связям
+        self.loaders = loaders
+        # Кэш сериализованных карточек заметок (общий для процесса)
+        self.cache = cache if cache is not None else get_note_cache()
+        # Снимок графа для аналитики (GET /graph/*), сбрасывается при изменении состава графа
+        self.graph_cache = graph_cache if graph_cache is not None else get_graph_snapshot_cache()
+        if closure_enabled is None:
+            closure_enabled = SETTINGS.note_closure_enabled
+        # Таблица замыкания (note_closure), если включена в настройках
+        self.closure: Optional[ClosureService] = ClosureService(db) if closure_enabled else None
+        # Уведомления об изменениях (pg_notify, см. app.services.events)
+        self.events_enabled = SETTINGS.events_enabled if events_enabled is None else events_enabled
+        # Соседи изменённой заметки нужны для сброса кэша и для событий
+        self.track_neighbours = self.cache.enabled or self.events_enabled
         
     async def create_note(self, note_data: NoteCreate) -> Note:
         # Создание заметки
         new_note = Note(**note_data.model_dump())#Pydantic схема → Словарь → SQLAlchemy объект
         
         self.db.add(new_note)
+        if self.events_enabled:
+            await self.db.flush()
+            await self._publish(ChangeEvent("note.created", note_ids=(new_note.id,)))
         await self.db.commit()
+        self.graph_cache.invalidate()
         await self.db.refresh(new_note)
 
         return new_note
 
-    async def get_note(self, note_id: int) -> Optional[Note]:
-        # Получение заметки по ID
-        result = await self.db.execute(select(Note).where(Note.id == note_id))
+    async def bulk_create_notes(self, notes: Sequence[NoteCreate]) -> List[int]:
+        """Создать заметки пакетом в одной транзакции.
+
+        Сначала одним запросом резервируются id, затем строки загружаются
+        бинарным COPY asyncpg. Заметки должны быть заранее провалидированы.
+
+        Returns:
+          ID созданных заметок в порядке входного списка
+        """
+        if not notes:
+            return []
+
+        result = await self.db.execute(_ALLOCATE_NOTE_IDS_SQL, {"count": len(notes)})
+        note_ids = list(result.scalars().all())
+
+        connection = await self.db.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            Note.__tablename__,
+            columns=["id", "title", "content", "importance"],
+            records=[
+                (note_id, note.title, note.content, note.importance)
+                for note_id, note in zip(note_ids, notes)
+            ],
+        )
+        await self._publish(ChangeEvent("note.created", note_ids=tuple(note_ids)))
+        await self.db.commit()
+        self.graph_cache.invalidate()
+        return note_ids
+
+    async def get_note(self, note_id: int, load: NoteLoadProfile = "card") -> Optional[Note]:
+        """Получить заметку по ID.
+
+        Args:
+          note_id: ID заметки
+          load: набор загружаемых связей (см. NOTE_LOAD_OPTIONS)
+        """
+        if load == "card" and self.loaders is not None:
+            return await self.loaders.notes.load(note_id)
+        result = await self.db.execute(
+            select(Note).options(*NOTE_LOAD_OPTIONS[load]).where(Note.id == note_id))
         return result.scalar_one_or_none()
 
     async def get_full_note(self, note_id: int) -> Optional[Note]:
-        """Получить заметку с загруженными связями для NoteWithRelations.
+        """Получить заметку с загруженными связями для NoteWithRelationsOptimized.
     
         Args:
           note_id: ID заметки
         
         Returns:
-          Note с загруженными parent_links и children_links, или None если не найдена
+          Note с загруженными parent_links и children_links (соседние заметки
+          без content), или None если не найдена
+        """
+        return await self.get_note(note_id, load="full")
+    
+    async def get_note_version(self, note_id: int) -> Optional[Tuple[str, datetime]]:
+        """ETag и Last-Modified карточки заметки без загрузки содержимого."""
+        result = await self.db.execute(select(Note.updated_at).where(Note.id == note_id))
+        updated_at = result.scalar_one_or_none()
+        if updated_at is None:
+            return None
+        return note_etag(note_id, updated_at), updated_at
+
+    async def get_full_note_version(self, note_id: int) -> Optional[str]:
+        """ETag ответа /full одним запросом по связям и соседям.
+
+        Last-Modified у /full нет: время добавления и удаления связей
+        не хранится, и If-Modified-Since вернул бы 304 на устаревший ответ.
         """
-    # Используем selectinload для загрузки связей одним запросом
+        neighbour = aliased(Note)
+        is_parent = NoteLink.parent_id == Note.id
         result = await self.db.execute(
-            select(Note)
-            .options(
-                selectinload(Note.parent_links).selectinload(NoteLink.parent),
-                selectinload(Note.children_links).selectinload(NoteLink.child)
-            )
+            select(Note.updated_at, NoteLink.id, neighbour.id, neighbour.updated_at)
+            .select_from(Note)
+            .outerjoin(NoteLink, or_(is_parent, NoteLink.child_id == Note.id))
+            .outerjoin(neighbour, neighbour.id == case(
+                (is_parent, NoteLink.child_id), else_=NoteLink.parent_id))
             .where(Note.id == note_id)
         )
-        return result.scalar_one_or_none()
-    
-    async def get_notes(self, skip: int = 0, limit: int = 100) -> List[Note]:
-        # Получение списка заметок
+        rows = result.all()
+        if not rows:
+            return None
+        updated_at = rows[0][0]
+        links = [(link_id, neighbour_id, neighbour_updated_at)
+                 for _, link_id, neighbour_id, neighbour_updated_at in rows
+                 if link_id is not None]
+        return full_note_etag(note_id, updated_at, links)
+
+    async def get_note_payload(self, note_id: int,
+                               etag: Optional[str] = None) -> Optional[CachedPayload]:
+        """JSON карточки заметки (NoteResponse), из кэша или из БД.
+
+        Args:
+          note_id: ID заметки
+          etag: текущая версия; запись кэша другой версии (например, устаревшая
+            после изменения в другом процессе) не используется
+        """
+        key = card_key(note_id)
+        payload = self.cache.get(key)
+        if payload is not None and (etag is None or payload.etag == etag):
+            return payload
+
+        token = self.cache.load_token()
+        note = await self.get_note(note_id)
+        if note is None:
+            return None
+        payload = CachedPayload(
+            body=NOTE_RESPONSE.dump(note),
+            etag=note_etag(note.id, note.updated_at),
+            last_modified=note.updated_at,
+        )
+        self.cache.set(key, payload, token)
+        return payload
+
+    async def get_full_note_payload(self, note_id: int,
+                                    etag: Optional[str] = None) -> Optional[CachedPayload]:
+        """JSON заметки со связями (NoteWithRelationsOptimized), из кэша или из БД.
+
+        Args:
+          note_id: ID заметки
+          etag: текущая версия (см. get_note_payload)
+        """
+        key = full_key(note_id)
+        payload = self.cache.get(key)
+        if payload is not None and (etag is None or payload.etag == etag):
+            return payload
+
+        token = self.cache.load_token()
+        note = await self.get_full_note(note_id)
+        if note is None:
+            return None
+        links = [(link.id, link.parent.id, link.parent.updated_at) for link in note.parent_links]
+        links += [(link.id, link.child.id, link.child.updated_at) for link in note.children_links]
+        payload = CachedPayload(
+            body=NOTE_FULL.dump(note),
+            etag=full_note_etag(note.id, note.updated_at, links),
+        )
+        self.cache.set(key, payload, token)
+        return payload
+
+    async def _neighbour_ids(self, note_id: int) -> List[int]:
+        """ID заметок, связанных с данной (в любом направлении)."""
+        result = await self.db.execute(
+            select(NoteLink.parent_id, NoteLink.child_id).where(
+                or_(NoteLink.parent_id == note_id, NoteLink.child_id == note_id)))
+        return [row.child_id if row.parent_id == note_id else row.parent_id for row in result.all()]
+
+    async def _publish(self, event: ChangeEvent) -> None:
+        """Отправить событие в поток изменений; вызывается до commit."""
+        if not self.events_enabled:
+            return
+        await self.db.execute(_PUBLISH_SQL, {"channel": CHANGES_CHANNEL, "payloads": event.encode()})
+
+    def _invalidate_notes(self, note_ids: Sequence[int] = (), full_note_ids: Sequence[int] = ()) -> None:
+        """Сбросить кэш карточек note_ids и ответов /full для note_ids и full_note_ids.
+
+        Вызывается после commit, чтобы параллельное чтение не закэшировало
+        данные до изменения.
+        """
+        if not self.cache.enabled:
+            return
+        keys = [card_key(note_id) for note_id in note_ids]
+        keys += [full_key(note_id) for note_id in {*note_ids, *full_note_ids}]
+        self.cache.invalidate(*keys)
 
-        result = await self.db.execute(select(Note).offset(skip).limit(limit))
+    def _catalog_query(self, stmt, skip: int, limit: int, after: Optional[str],
+                       order_by: CatalogOrderBy, order: SortOrder):
+        keys = catalog_sort_keys(order_by)
+        stmt = stmt.order_by(*(key.desc() if order == "desc" else key.asc() for key in keys))
+        if after is not None:
+            stmt = stmt.where(catalog_after_clause(after, order_by, order))
+        return stmt.offset(skip).limit(limit)
+
+    async def get_notes(self, skip: int = 0, limit: int = 100, after: Optional[str] = None,
+                        order_by: CatalogOrderBy = "id", order: SortOrder = "asc") -> List[Note]:
+        """Получить страницу каталога заметок (полные ORM-объекты).
+
+        Args:
+          skip: смещение (OFFSET), оставлено для совместимости
+          limit: размер страницы
+          after: курсор из предыдущей страницы (keyset-пагинация)
+          order_by: поле сортировки, id добавляется для стабильного порядка
+          order: направление сортировки
+
+        Raises:
+          InvalidCursorError: курсор повреждён или выдан для другой сортировки
+        """
+        stmt = self._catalog_query(select(Note), skip, limit, after, order_by, order)
+        result = await self.db.execute(stmt)
         return result.scalars().all()
 
-    
+    async def get_note_summaries(self, skip: int = 0, limit: int = 100, after: Optional[str] = None,
+                                 order_by: CatalogOrderBy = "id",
+                                 order: SortOrder = "asc") -> Sequence[Row]:
+        """Получить страницу каталога только с полями NoteLinkSummary.
+
+        Выбирает id, title, importance (и updated_at для курсора) без content,
+        без загрузки связей и без identity map. Параметры как у get_notes.
+        """
+        columns = [Note.id, Note.title, Note.importance]
+        if order_by == "updated_at":
+            columns.append(Note.updated_at)
+        stmt = self._catalog_query(select(*columns), skip, limit, after, order_by, order)
+        result = await self.db.execute(stmt)
+        return result.all()
+
+    async def search_notes(self, query: str, limit: int = 20,
+                           after: Optional[str] = None) -> Sequence[Row]:
+        """Полнотекстовый поиск по заголовку и содержимому.
+
+        Использует GIN-индекс ix_note_search_vector, запрос разбирается
+        websearch_to_tsquery (кавычки, OR, -исключение). Заголовок весит
+        больше содержимого.
+
+        Args:
+          query: поисковый запрос
+          limit: размер страницы
+          after: курсор предыдущей страницы
+
+        Returns:
+          Строки (id, title, importance, rank) по убыванию rank, затем по id
+
+        Raises:
+          InvalidCursorError: курсор повреждён или выдан для другого запроса
+        """
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        rank = cast(func.ts_rank_cd(Note.search_vector, ts_query), Double)
+        stmt = (
+            select(Note.id, Note.title, Note.importance, rank.label("rank"))
+            .where(Note.search_vector.bool_op("@@")(ts_query))
+            .order_by(rank.desc(), Note.id)
+            .limit(limit)
+        )
+        if after is not None:
+            stmt = stmt.where(search_after_clause(after, query, rank))
+        result = await self.db.execute(stmt)
+        return result.all()
+
+    async def autocomplete_notes(self, prefix: str, limit: int = 10) -> Sequence[Row]:
+        """Подсказки заголовков для связывания заметок.
+
+        Сначала заголовки, начинающиеся с prefix, затем похожие по триграммам
+        (pg_trgm); оба условия обслуживает индекс ix_note_title_trgm.
+        """
+        needle = prefix.lower()
+        escaped = needle.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        title = func.lower(Note.title)
+        is_prefix = title.like(escaped + "%", escape="\\")
+        stmt = (
+            select(Note.id, Note.title, Note.importance)
+            .where(or_(is_prefix, title.bool_op("%")(needle)))
+            .order_by(is_prefix.desc(), func.similarity(title, needle).desc(), Note.id)
+            .limit(limit)
+        )
+        result = await self.db.execute(stmt)
+        return result.all()
+
+    async def get_notes_by_ids(self, note_ids: Sequence[int],
+                               fields: NoteBatchFields = "full") -> dict[int, Row]:
+        """Заметки по списку ID одним запросом (id = ANY(:ids)).
+
+        Args:
+          note_ids: ID заметок, повторы допускаются
+          fields: "summary" — id, title, importance; "full" — все поля NoteResponse
+
+        Returns:
+          Словарь id → строка; отсутствующих заметок в нём нет
+        """
+        if fields == "summary":
+            columns = (Note.id, Note.title, Note.importance)
+        else:
+            columns = (Note.id, Note.title, Note.content, Note.importance, Note.created_at, Note.updated_at)
+        result = await self.db.execute(
+            select(*columns).where(Note.id == any_(cast(sorted(set(note_ids)), ARRAY(Integer)))))
+        return {row.id: row for row in result.all()}
+
     async def update_note(self, note_id: int, 
-                          note_data: NoteUpdate) -> Optional[Note]:
-        # Обновление заметки
+                          note_data: NoteUpdate,
+                          expected_versions: Optional[Sequence[datetime]] = None) -> Optional[Note]:
+        # Обновление заметки.
+        # expected_versions — допустимые значения updated_at (из If-Match);
+        # проверка и запись выполняются одним UPDATE, поэтому гонки нет.
+        # При несовпадении версии у существующей заметки — NoteVersionConflict.
         new_data = note_data.model_dump(exclude_unset=True)
-        result = await self.db.execute(update(Note)
-                                        .where(Note.id == note_id)
-                                        .values(**new_data).returning(Note))
+        # Заголовок и важность видны в /full у соседних заметок
+        neighbour_ids: List[int] = []
+        if self.track_neighbours and {"title", "importance"} & new_data.keys():
+            neighbour_ids = await self._neighbour_ids(note_id)
+
+        stmt = update(Note).where(Note.id == note_id)
+        if expected_versions is not None:
+            stmt = stmt.where(Note.updated_at.in_(expected_versions))
+        result = await self.db.execute(stmt.values(**new_data).returning(Note))
+        note = result.scalar_one_or_none()
+        if note is None:
+            await self.db.rollback()
+            if expected_versions is not None and await self.get_note_version(note_id) is not None:
+                raise NoteVersionConflict(note_id)
+            return None
+        await self._publish(ChangeEvent("note.updated", note_ids=(note_id,), related_ids=tuple(neighbour_ids)))
         await self.db.commit()
-        return result.scalar_one_or_none()
+        self._invalidate_notes([note_id], neighbour_ids)
+        return note
     
     async def delete_note(self, note_id: int) -> bool:
-        # Удаление заметки
-        for_delete = await self.get_note(note_id)
-        
-        if for_delete is None:
+        # Удаление заметки; связи удаляются каскадно (ON DELETE CASCADE).
+        # Блокировка графа нужна только для пересчёта note_closure (см. LINK_GRAPH_LOCK_KEY)
+        ancestor_ids: List[int] = []
+        descendant_ids: List[int] = []
+        if self.closure is not None:
+            await self.lock_link_graph()
+            ancestor_ids = await self.closure.ancestor_ids(note_id)
+            descendant_ids = await self.closure.descendant_ids(note_id)
+        neighbour_ids = await self._neighbour_ids(note_id) if self.track_neighbours else []
+
+        result = await self.db.execute(
+            delete(Note).where(Note.id == note_id).returning(Note.id))
+        if result.scalar_one_or_none() is None:
+            await self.db.rollback()
             return False
-        else:
-            await self.db.delete(for_delete)
-            await self.db.commit()
-            return True
 
-    
+        if self.closure is not None:
+            await self.closure.rederive(ancestor_ids, descendant_ids)
+        await self._publish(ChangeEvent("note.deleted", note_ids=(note_id,), related_ids=tuple(neighbour_ids)))
+        await self.db.commit()
+        self._invalidate_notes([note_id], neighbour_ids)
+        self.graph_cache.invalidate()
+        return True
+
+
+    async def delete_notes(self, note_ids: Sequence[int]) -> int:
+        """Удалить пакет заметок одним запросом (для фоновых задач).
+
+        note_closure пересчитывается для пар предков и потомков пакета:
+        пакет не обязан быть замкнут по потомкам (задача delete_subtree
+        удаляет поддерево частями, и в него могли добавиться связи).
+
+        Returns:
+          Число удалённых заметок
+        """
+        if not note_ids:
+            return 0
+        ids = bindparam("ids", list(note_ids), type_=ARRAY(Integer))
+        ancestor_ids: List[int] = []
+        descendant_ids: List[int] = []
+        if self.closure is not None:
+            await self.lock_link_graph()
+            ancestor_ids, descendant_ids = await self.closure.related_ids(note_ids)
+        neighbour_ids: List[int] = []
+        if self.track_neighbours:
+            result = await self.db.execute(
+                select(NoteLink.parent_id, NoteLink.child_id)
+                .where(or_(NoteLink.parent_id == any_(ids), NoteLink.child_id == any_(ids))))
+            neighbour_ids = list({note_id for row in result.all() for note_id in row} - set(note_ids))
+        result = await self.db.execute(delete(Note).where(Note.id == any_(ids)).returning(Note.id))
+        deleted_ids = result.scalars().all()
+        if self.closure is not None:
+            await self.closure.remove_notes(ancestor_ids, descendant_ids)
+        await self._publish(ChangeEvent("note.deleted", note_ids=tuple(deleted_ids), related_ids=tuple(neighbour_ids)))
+        await self.db.commit()
+        self._invalidate_notes(note_ids, neighbour_ids)
+        self.graph_cache.invalidate()
+        return len(deleted_ids)
+
+    async def delete_note_links(self, note_id: int, limit: int) -> int:
+        """Удалить до limit связей заметки (в обоих направлениях).
+
+        Позволяет удалить заметку с большим числом связей несколькими
+        короткими транзакциями. note_closure не пересчитывается: её
+        пересчитает завершающий delete_note(note_id) по ещё не изменённым
+        парам предков и потомков заметки.
+
+        Returns:
+          Число удалённых связей
+        """
+        batch = (
+            select(NoteLink.id)
+            .where(or_(NoteLink.parent_id == note_id, NoteLink.child_id == note_id))
+            .limit(limit)
+        )
+        result = await self.db.execute(
+            delete(NoteLink).where(NoteLink.id.in_(batch))
+            .returning(NoteLink.id, NoteLink.parent_id, NoteLink.child_id))
+        rows = result.all()
+        related_ids = list({note_id for row in rows for note_id in (row.parent_id, row.child_id)})
+        if rows:
+            await self._publish(ChangeEvent(
+                "link.deleted", related_ids=tuple(related_ids), links=tuple(tuple(row) for row in rows)))
+        await self.db.commit()
+        self._invalidate_notes(full_note_ids=related_ids)
+        self.graph_cache.invalidate()
+        return len(rows)
+
+    async def lock_link_graph(self) -> None:
+        """Сериализовать изменения связей до конца текущей транзакции."""
+        await self.db.execute(select(func.pg_advisory_xact_lock(LINK_GRAPH_LOCK_KEY)))
+
     async def create_link(self, link_data: NoteLinkCreate) -> Optional[NoteLink]:
+        """Создать связь между заметками.
+
+        Выполняет фиксированное число запросов: блокировку графа, проверку
+        достижимости и INSERT ... ON CONFLICT DO NOTHING. Существование
+        заметок и уникальность связи проверяют FK и uq_note_link.
+
+        Returns:
+          Новая связь, или None если связь образует цикл, уже существует
+          или ссылается на несуществующую заметку
+        """
+        if link_data.parent_id == link_data.child_id:
+            return None
+
+        await self.lock_link_graph()
         if await self.check_circular_reference(link_data.parent_id, link_data.child_id):
+            await self.db.rollback()
             return None
-        # Создание связи между заметками
-        # if link_data.parent_id == link_data.child_id:
-        #     return None
-        parent = await self.get_note(link_data.parent_id)
-        child = await self.get_note(link_data.child_id)
-        
-        # exists = await self.db.execute(select(NoteLink).where(
-        #     and_(NoteLink.parent_id == link_data.parent_id,
-        #          NoteLink.child_id == link_data.child_id))
-        # ).scalar_one_or_none()
-
-        result = await self.db.execute(select(NoteLink).where(
-        and_(NoteLink.parent_id == link_data.parent_id,
-             NoteLink.child_id == link_data.child_id)))
-        exists = result.scalar_one_or_none()    
-        
-        if parent and child and exists is None:
-            new_link = NoteLink(**link_data.model_dump())
-            self.db.add(new_link)
-            await self.db.commit()
-            await self.db.refresh(new_link)
-            return new_link
-        
-        return None
+
+        stmt = (
+            insert(NoteLink)
+            .values(**link_data.model_dump())
+            .on_conflict_do_nothing(constraint="uq_note_link")
+            .returning(NoteLink)
+        )
+        try:
+            result = await self.db.execute(stmt)
+            new_link = result.scalar_one_or_none()
+        except IntegrityError:
+            # Нарушение FK: одной из заметок не существует
+            await self.db.rollback()
+            return None
+
+        if new_link is not None:
+            if self.closure is not None:
+                await self.closure.add_link(new_link.parent_id, new_link.child_id)
+            await self._publish(ChangeEvent(
+                "link.created", related_ids=(new_link.parent_id, new_link.child_id),
+                links=((new_link.id, new_link.parent_id, new_link.child_id),)))
+        await self.db.commit()
+        if new_link is not None:
+            self._invalidate_notes(full_note_ids=[new_link.parent_id, new_link.child_id])
+            self.graph_cache.invalidate()
+        return new_link
         
+    async def bulk_create_links(
+            self, links: Sequence[NoteLinkCreate],
+            before_commit: Optional[Callable[[List[Tuple[Optional[int], Optional[str]]]], Awaitable[None]]] = None,
+    ) -> List[Tuple[Optional[int], Optional[str]]]:
+        """Создать пакет связей с общей проверкой циклов.
+
+        Существующий подграф ниже новых связей загружается одним запросом,
+        циклы проверяются в памяти по существующим связям вместе со всем
+        пакетом, принятые связи вставляются одним INSERT ... ON CONFLICT.
+        Связи, замыкающие цикл, отклоняются в порядке следования в пакете.
+
+        Args:
+          links: связи пакета
+          before_commit: вызывается с результатами перед commit, в той же
+            транзакции (например, чтобы фоновая задача сохранила прогресс)
+
+        Returns:
+          Для каждой входной связи пара (id, None) если она создана,
+          или (None, причина) если отклонена
+        """
+        results: List[Tuple[Optional[int], Optional[str]]] = [(None, None)] * len(links)
+        if not links:
+            return results
+
+        await self.lock_link_graph()
+        note_ids = {link.parent_id for link in links} | {link.child_id for link in links}
+        result = await self.db.execute(
+            select(Note.id).where(Note.id == any_(bindparam("ids", list(note_ids), type_=ARRAY(Integer)))))
+        existing_ids = set(result.scalars().all())
+
+        candidates: List[int] = []
+        seen_pairs = set()
+        for index, link in enumerate(links):
+            pair = (link.parent_id, link.child_id)
+            if link.parent_id == link.child_id:
+                results[index] = (None, "Связь заметки с самой собой")
+            elif link.parent_id not in existing_ids or link.child_id not in existing_ids:
+                results[index] = (None, "Заметка не найдена")
+            elif pair in seen_pairs:
+                results[index] = (None, "Связь повторяется в пакете")
+            else:
+                seen_pairs.add(pair)
+                candidates.append(index)
+
+        result = await self.db.execute(
+            _DOWNSTREAM_EDGES_SQL, {"seed_ids": list({links[i].child_id for i in candidates})})
+        existing_edges = result.all()
+        adjacency = build_adjacency(existing_edges)
+        for index in candidates:
+            adjacency[links[index].parent_id].append(links[index].child_id)
+
+        accepted = candidates
+        if not is_acyclic(adjacency):
+            # Есть цикл: добавляем связи по одной и отклоняем замыкающие его
+            adjacency = build_adjacency(existing_edges)
+            accepted = []
+            for index in candidates:
+                link = links[index]
+                if has_path(adjacency, link.child_id, link.parent_id):
+                    results[index] = (None, "Связь образует цикл")
+                else:
+                    adjacency[link.parent_id].append(link.child_id)
+                    accepted.append(index)
+
+        result = await self.db.execute(_BULK_INSERT_LINKS_SQL, {
+            "parent_ids": [links[i].parent_id for i in accepted],
+            "child_ids": [links[i].child_id for i in accepted],
+        })
+        created = {(row.parent_id, row.child_id): row.id for row in result.all()}
+        for index in accepted:
+            link = links[index]
+            link_id = created.get((link.parent_id, link.child_id))
+            results[index] = (link_id, None) if link_id is not None else (None, "Связь уже существует")
+            if link_id is not None and self.closure is not None:
+                await self.closure.add_link(link.parent_id, link.child_id)
+
+        if created:
+            await self._publish(ChangeEvent(
+                "link.created", related_ids=tuple({note_id for pair in created for note_id in pair}),
+                links=tuple((link_id, *pair) for pair, link_id in created.items())))
+        if before_commit is not None:
+            await before_commit(results)
+        await self.db.commit()
+        self._invalidate_notes(full_note_ids=[note_id for pair in created for note_id in pair])
+        if created:
+            self.graph_cache.invalidate()
+        return results
+
+    async def _begin_snapshot(self) -> None:
+        """Начать транзакцию только для чтения с единым снимком данных.
+
+        REPEATABLE READ: все запросы транзакции видят одно состояние графа,
+        поэтому выгруженные связи согласованы с выгруженными заметками.
+        """
+        await self.db.connection(execution_options={
+            "isolation_level": "REPEATABLE READ",
+            "postgresql_readonly": True,
+        })
+
+    async def stream_export_notes(self, updated_since: Optional[datetime] = None) -> AsyncIterator[Note]:
+        """Все заметки по возрастанию id через серверный курсор.
+
+        В памяти одновременно не больше SETTINGS.export_batch_size заметок.
+
+        Args:
+          updated_since: только заметки, изменённые начиная с этого момента
+        """
+        stmt = select(Note).order_by(Note.id).execution_options(yield_per=SETTINGS.export_batch_size)
+        if updated_since is not None:
+            stmt = stmt.where(Note.updated_at >= updated_since)
+        result = await self.db.stream_scalars(stmt)
+        async for note in result:
+            yield note
+
+    async def stream_export_links(self) -> AsyncIterator[Row]:
+        """Все связи (id, parent_id, child_id) по возрастанию id через серверный курсор."""
+        stmt = (
+            select(NoteLink.id, NoteLink.parent_id, NoteLink.child_id)
+            .order_by(NoteLink.id)
+            .execution_options(yield_per=SETTINGS.export_batch_size)
+        )
+        result = await self.db.stream(stmt)
+        async for row in result:
+            yield row
+
+    async def export_graph(self, updated_since: Optional[datetime] = None) -> AsyncIterator[Union[Note, Row]]:
+        """Заметки, затем связи — из одного снимка БД.
+
+        У связей нет времени изменения, поэтому они выгружаются полностью
+        и при updated_since: получатель заменяет свой набор связей целиком.
+        """
+        await self._begin_snapshot()
+        try:
+            async for note in self.stream_export_notes(updated_since):
+                yield note
+            async for link in self.stream_export_links():
+                yield link
+        finally:
+            await self.db.rollback()
+
+    def _sync_changes_query(self, position: SyncPosition, upper_xid: int, limit: int):
+        """Следующие limit изменений после position с change_xid < upper_xid.
+
+        Каждый вид изменений выбирается по своему индексу, затем
+        части сливаются в общий порядок (change_xid, вид, id).
+        """
+        sources = (
+            (SYNC_NOTE, Note.change_xid, Note.id, ()),
+            (SYNC_LINK, NoteLink.change_xid, NoteLink.id, ()),
+            (SYNC_LINK_DELETED, SyncTombstone.change_xid, SyncTombstone.entity_id, (SyncTombstone.kind == "link",)),
+            (SYNC_NOTE_DELETED, SyncTombstone.change_xid, SyncTombstone.entity_id, (SyncTombstone.kind == "note",)),
+        )
+        parts = []
+        for kind, change_xid, entity_id, where in sources:
+            part = (
+                select(change_xid.label("change_xid"), literal(kind).label("kind"), entity_id.label("id"))
+                .where(sync_after_clause(change_xid, entity_id, kind, position), change_xid < upper_xid, *where)
+                .order_by(change_xid, entity_id)
+                .limit(limit)
+                .subquery()
+            )
+            parts.append(select(part))
+        changes = union_all(*parts).subquery()
+        return select(changes).order_by(changes.c.change_xid, changes.c.kind, changes.c.id).limit(limit)
+
+    async def get_changes(self, since: Optional[str] = None, limit: int = 1000) -> dict:
+        """Изменения заметок и связей после токена since (см. SyncPage).
+
+        Изменения упорядочены по номеру транзакции (change_xid), а не по
+        времени: время фиксации транзакций не совпадает с порядком их
+        начала, и граница по updated_at пропускала бы параллельные записи.
+        Выдаются только изменения завершённых транзакций (ниже xmin снимка),
+        поэтому позже с меньшим номером ничего не появится. Страница
+        читается из одного снимка; число запросов не зависит от limit.
+
+        Raises:
+          InvalidCursorError: токен повреждён
+        """
+        position = decode_sync_token(since) if since is not None else SYNC_START
+        await self._begin_snapshot()
+        try:
+            upper_xid = (await self.db.execute(_SNAPSHOT_XMIN_SQL)).scalar_one()
+            result = await self.db.execute(self._sync_changes_query(position, upper_xid, limit + 1))
+            changes = result.all()
+            has_more = len(changes) > limit
+            changes = changes[:limit]
+            ids: dict[int, List[int]] = {kind: [] for kind in range(4)}
+            for change in changes:
+                ids[change.kind].append(change.id)
+
+            notes: Sequence[Row] = []
+            if ids[SYNC_NOTE]:
+                result = await self.db.execute(
+                    select(Note.id, Note.title, Note.content, Note.importance, Note.created_at, Note.updated_at)
+                    .where(Note.id == any_(bindparam("ids", ids[SYNC_NOTE], type_=ARRAY(Integer))))
+                    .order_by(Note.id))
+                notes = result.all()
+            links: Sequence[Row] = []
+            if ids[SYNC_LINK]:
+                result = await self.db.execute(
+                    select(NoteLink.id, NoteLink.parent_id, NoteLink.child_id)
+                    .where(NoteLink.id == any_(bindparam("ids", ids[SYNC_LINK], type_=ARRAY(Integer))))
+                    .order_by(NoteLink.id))
+                links = result.all()
+        finally:
+            await self.db.rollback()
+
+        if has_more:
+            last = changes[-1]
+            next_position = (last.change_xid, last.kind, last.id)
+        else:
+            # Всё ниже границы выдано; при отстающей реплике граница может быть позади
+            next_position = max(position, (upper_xid, SYNC_START[1], SYNC_START[2]))
+        return {
+            "notes": notes,
+            "links": links,
+            "deleted_link_ids": ids[SYNC_LINK_DELETED],
+            "deleted_note_ids": ids[SYNC_NOTE_DELETED],
+            "next_token": sync_token(next_position),
+            "has_more": has_more,
+        }
+
     async def get_links_by_participant(self, note_id: int) -> List[NoteLink]:
+        if self.loaders is not None:
+            return await self.loaders.links_by_note.load(note_id)
         result = await self.db.execute(
             select(NoteLink).where(
                 or_(
@@ -113,56 +882,189 @@ class NoteService:
         return result.scalars().all()
     
     async def get_link_by_id(self, link_id: int) -> Optional[NoteLink]:
+        if self.loaders is not None:
+            return await self.loaders.links.load(link_id)
         result = await self.db.execute(select(NoteLink).where(NoteLink.id == link_id))
         return result.scalar_one_or_none()
     
     async def delete_link(self, link_id: int) -> bool:
-        for_delete = await self.get_link_by_id(link_id)
-        if for_delete is None:
+        # Блокировка графа нужна только для пересчёта note_closure (см. LINK_GRAPH_LOCK_KEY)
+        if self.closure is not None:
+            await self.lock_link_graph()
+
+        result = await self.db.execute(
+            delete(NoteLink).where(NoteLink.id == link_id)
+            .returning(NoteLink.parent_id, NoteLink.child_id))
+        deleted = result.one_or_none()
+        if deleted is None:
+            await self.db.rollback()
             return False
+
+        if self.closure is not None:
+            await self.closure.remove_link(deleted.parent_id, deleted.child_id)
+        await self._publish(ChangeEvent(
+            "link.deleted", related_ids=(deleted.parent_id, deleted.child_id),
+            links=((link_id, deleted.parent_id, deleted.child_id),)))
+        await self.db.commit()
+        self._invalidate_notes(full_note_ids=[deleted.parent_id, deleted.child_id])
+        self.graph_cache.invalidate()
+        return True
+
+    async def _walk(self, note_id: int, direction: Literal["up", "down"], max_depth: Optional[int] = None,
+                    limit: Optional[int] = None):
+        """Подзапрос предков ("up") или потомков ("down") заметки (колонки id, depth).
+
+        В отличие от _traversal подходит для поддеревьев любого размера:
+        связи достижимой части графа читаются одним запросом, а глубины
+        считаются в памяти (в отдельном потоке, не задерживая цикл событий).
+
+        Args:
+          note_id: ID исходной заметки (в результат не входит)
+          direction: направление обхода
+          max_depth: максимальная глубина обхода, None — без ограничения
+          limit: обход останавливается на уровне, где найдено столько узлов
+
+        Returns:
+          Subquery с колонками id и depth (минимальной), каждый узел встречается один раз
+        """
+        this_id, next_id = _WALK_COLUMNS[direction]
+        row = (await self.db.execute(
+            text(_WALK_SQL.format(this_id=this_id, next_id=next_id)), {"note_id": note_id})).one()
+        found = await asyncio.to_thread(
+            lambda: bfs_levels(build_adjacency(zip(row.this_ids or (), row.next_ids or ())),
+                               note_id, max_depth=max_depth, limit=limit))
+        stmt = _WALK_RESULT_SQL.bindparams(
+            bindparam("ids", [node for node, _ in found], type_=ARRAY(Integer)),
+            bindparam("depths", [depth for _, depth in found], type_=ARRAY(Integer)),
+        )
+        return stmt.columns(column("id", Integer), column("depth", Integer)).subquery("walk")
+
+    def _traversal(self, note_id: int, direction: TraversalDirection,
+                   max_depth: Optional[int] = None, max_nodes: Optional[int] = None):
+        """Подзапрос обхода графа в ширину от заметки (колонки id, depth).
+
+        Args:
+          note_id: ID исходной заметки (возвращается с depth = 0)
+          direction: направление обхода — "up", "down" или "both"
+          max_depth: максимальная глубина обхода, None — без ограничения
+          max_nodes: обход останавливается, когда найдено столько узлов
+            (не считая исходного); уровень, на котором достигнут предел,
+            возвращается целиком
+
+        Returns:
+          Subquery с колонками id и depth, каждый узел встречается один раз
+        """
+        stmt = text(_TRAVERSAL_SQL.format(neighbours=_NEIGHBOURS_SQL[direction])).bindparams(
+            bindparam("note_id", note_id, type_=Integer),
+            bindparam("max_depth", max_depth, type_=Integer),
+            bindparam("max_nodes", max_nodes, type_=Integer),
+        )
+        return stmt.columns(column("id", Integer), column("depth", Integer)).subquery("traversal")
+
+    async def _get_related(self, note_id: int, direction: Literal["up", "down"],
+                           max_depth: Optional[int], limit: Optional[int]) -> Sequence[Row]:
+        # Жёсткий предел глубины: ответ остаётся ограниченным и без max_depth
+        max_depth = min(max_depth or SETTINGS.graph_max_depth, SETTINGS.graph_max_depth)
+        if self.closure is not None:
+            traversal = self.closure.related(note_id, direction, max_depth=max_depth)
+        elif limit is not None and limit <= SETTINGS.graph_max_nodes:
+            # Небольшой limit: обход в ширину останавливается, как только узлов достаточно
+            traversal = self._traversal(note_id, direction, max_depth=max_depth, max_nodes=limit)
         else:
-            await self.db.delete(for_delete)
-            await self.db.commit()
-            return True
+            traversal = await self._walk(note_id, direction, max_depth=max_depth, limit=limit)
+        stmt = (
+            select(
+                Note.id, Note.title, Note.content, Note.importance,
+                Note.created_at, Note.updated_at, traversal.c.depth,
+            )
+            .join(traversal, traversal.c.id == Note.id)
+            .where(traversal.c.depth > 0)
+            .order_by(traversal.c.depth, Note.id)
+            .limit(limit)
+        )
+        result = await self.db.execute(stmt)
+        return result.all()
 
-    async def get_ancestors(self, note_id: int) -> List[Note]:
-        """Получить всех предков заметки."""
-        note = await self.get_note(note_id)
-        if not note:
-            return []
+    async def get_ancestors(self, note_id: int, max_depth: Optional[int] = None,
+                            limit: Optional[int] = None) -> Sequence[Row]:
+        """Получить всех предков заметки (каждого один раз, с кратчайшим расстоянием).
 
-        parents = note.parents
-        ancestors = []
+        Args:
+          note_id: ID заметки
+          max_depth: максимальное число связей до предка
+          limit: максимальное число возвращаемых предков
 
-        for parent in parents:
-            ancestors.append(parent)
-            parent_ancestors = await self.get_ancestors(parent.id)
-            ancestors.extend(parent_ancestors)
+        Returns:
+          Строки с полями заметки и depth, отсортированные по (depth, id)
+        """
+        return await self._get_related(note_id, "up", max_depth, limit)
 
-        return ancestors
+    async def get_descendants(self, note_id: int, max_depth: Optional[int] = None,
+                              limit: Optional[int] = None) -> Sequence[Row]:
+        """Получить всех потомков заметки (каждого один раз, с кратчайшим расстоянием).
 
-    async def get_descendants(self, note_id: int) -> List[Note]:
-        note = await self.get_note(note_id)
-        if not note:
-            return []
+        Args:
+          note_id: ID заметки
+          max_depth: максимальное число связей до потомка
+          limit: максимальное число возвращаемых потомков
+
+        Returns:
+          Строки с полями заметки и depth, отсортированные по (depth, id)
+        """
+        return await self._get_related(note_id, "down", max_depth, limit)
+
+    async def get_subgraph(self, note_id: int, direction: TraversalDirection, max_depth: int,
+                           max_nodes: int) -> Optional[Tuple[Sequence[Row], List[Tuple[int, int]], bool]]:
+        """Окрестность заметки: узлы и связи между ними.
 
-        children = note.children
-        descendants = []
+        Узлы берутся обходом в ширину (таблица note_closure не используется:
+        обход и так останавливается на max_nodes) и упорядочены по (depth, id),
+        поэтому усечение по max_nodes детерминировано: остаются ближайшие
+        узлы, при равной глубине — с меньшим id.
 
-        for child in children:
-            descendants.append(child)
-            child_descendants = await self.get_descendants(child.id)
-            descendants.extend(child_descendants)
+        Args:
+          note_id: ID исходной заметки (входит в узлы первой)
+          direction: направление обхода — "up", "down" или "both"
+          max_depth: максимальная глубина обхода
+          max_nodes: максимальное число узлов вместе с исходным
+
+        Returns:
+          (узлы (id, title, importance), рёбра (parent_id, child_id) между
+          возвращёнными узлами, признак усечения), или None если заметки нет
+        """
+        traversal = self._traversal(note_id, direction, max_depth=max_depth, max_nodes=max_nodes)
+        # count(*) OVER () считается до LIMIT: больше max_nodes — окрестность усечена
+        result = await self.db.execute(
+            select(Note.id, Note.title, Note.importance, func.count().over().label("total"))
+            .join(traversal, traversal.c.id == Note.id)
+            .order_by(traversal.c.depth, Note.id)
+            .limit(max_nodes)
+        )
+        nodes = result.all()
+        if not nodes or nodes[0].id != note_id:
+            return None
 
-        return descendants
+        node_ids = [node.id for node in nodes]
+        result = await self.db.execute(
+            select(NoteLink.parent_id, NoteLink.child_id)
+            .where(NoteLink.parent_id == any_(cast(node_ids, ARRAY(Integer))),
+                   NoteLink.child_id == any_(cast(node_ids, ARRAY(Integer))))
+            .order_by(NoteLink.parent_id, NoteLink.child_id)
+        )
+        edges = [(row.parent_id, row.child_id) for row in result.all()]
+        return nodes, edges, nodes[0].total > max_nodes
 
     async def check_circular_reference(self, parent_id: int, child_id: int) -> bool:
+        """Проверить, замкнёт ли связь parent → child цикл.
+
+        Цикл возникает, если parent уже достижим из child.
+        """
         if parent_id == child_id:
             return True
 
-        ancestors = await self.get_ancestors(child_id)
+        if self.closure is not None:
+            return await self.closure.is_reachable(child_id, parent_id)
 
-        if parent_id in [ancestor.id for ancestor in ancestors]:
-            return True
-        
-        return False
+        result = await self.db.execute(
+            _REACHABILITY_SQL, {"start": child_id, "target": parent_id})
+        return result.scalar_one_or_none() is not None
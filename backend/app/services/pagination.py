@@ -0,0 +1,138 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, List, Literal, Tuple
+
+from sqlalchemy import and_, func, or_, tuple_
+from sqlalchemy.sql import ColumnElement
+
+from app.models.note import Note
+
+CatalogOrderBy = Literal["id", "importance", "updated_at"]
+SortOrder = Literal["asc", "desc"]
+
+# Заметки без важности сортируются как importance = -1 (совпадает с индексом ix_note_importance_id)
+NO_IMPORTANCE = -1
+
+
+class InvalidCursorError(ValueError):
+    """Курсор повреждён или выдан для другой сортировки."""
+
+
+def encode_cursor(payload: Any) -> str:
+    """Упаковать значения ключа в непрозрачный курсор (base64url от JSON)."""
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Any:
+    """Распаковать курсор, выданный encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Некорректный курсор") from e
+
+
+def catalog_sort_keys(order_by: CatalogOrderBy) -> Tuple[ColumnElement, ...]:
+    """Выражения ключа сортировки каталога; id всегда последний для стабильности."""
+    if order_by == "importance":
+        return (func.coalesce(Note.importance, NO_IMPORTANCE), Note.id)
+    if order_by == "updated_at":
+        return (Note.updated_at, Note.id)
+    return (Note.id,)
+
+
+def catalog_cursor(note: Any, order_by: CatalogOrderBy, order: SortOrder) -> str:
+    """Курсор, указывающий на позицию сразу после заметки note."""
+    if order_by == "importance":
+        key: List[Any] = [note.importance if note.importance is not None else NO_IMPORTANCE, note.id]
+    elif order_by == "updated_at":
+        key = [note.updated_at.isoformat(), note.id]
+    else:
+        key = [note.id]
+    return encode_cursor({"o": order_by, "d": order, "k": key})
+
+
+def catalog_after_clause(cursor: str, order_by: CatalogOrderBy, order: SortOrder) -> ColumnElement:
+    """Условие WHERE для строк после курсора в заданной сортировке."""
+    payload = decode_cursor(cursor)
+    if not isinstance(payload, dict) or payload.get("o") != order_by or payload.get("d") != order:
+        raise InvalidCursorError("Курсор выдан для другой сортировки")
+
+    keys = catalog_sort_keys(order_by)
+    values = payload.get("k")
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursorError("Некорректный курсор")
+    try:
+        if order_by == "updated_at":
+            values = [datetime.fromisoformat(values[0]), int(values[1])]
+        else:
+            values = [int(v) for v in values]
+    except (TypeError, ValueError) as e:
+        raise InvalidCursorError("Некорректный курсор") from e
+
+    if order == "desc":
+        return tuple_(*keys) < tuple_(*values)
+    return tuple_(*keys) > tuple_(*values)
+
+
+def _query_fingerprint(query: str) -> str:
+    return hashlib.sha1(query.encode()).hexdigest()[:12]
+
+
+def search_cursor(hit: Any, query: str) -> str:
+    """Курсор поиска после результата hit (сортировка rank DESC, id ASC)."""
+    return encode_cursor({"q": _query_fingerprint(query), "k": [hit.rank, hit.id]})
+
+
+def search_after_clause(cursor: str, query: str, rank: ColumnElement) -> ColumnElement:
+    """Условие WHERE для результатов поиска после курсора."""
+    payload = decode_cursor(cursor)
+    if not isinstance(payload, dict) or payload.get("q") != _query_fingerprint(query):
+        raise InvalidCursorError("Курсор выдан для другого запроса")
+    values = payload.get("k")
+    try:
+        last_rank, last_id = float(values[0]), int(values[1])
+    except (TypeError, ValueError, IndexError) as e:
+        raise InvalidCursorError("Некорректный курсор") from e
+    return or_(rank < last_rank, and_(rank == last_rank, Note.id > last_id))
+
+
+# Позиция в журнале изменений GET /sync: (change_xid, вид изменения, id).
+# Виды упорядочены так, чтобы изменения одной транзакции применялись
+# по порядку: заметки, связи, удалённые связи, удалённые заметки.
+SyncPosition = Tuple[int, int, int]
+SYNC_NOTE, SYNC_LINK, SYNC_LINK_DELETED, SYNC_NOTE_DELETED = range(4)
+SYNC_START: SyncPosition = (0, -1, 0)
+
+
+def sync_token(position: SyncPosition) -> str:
+    """Токен синхронизации: изменения после позиции position."""
+    return encode_cursor({"s": list(position)})
+
+
+def decode_sync_token(token: str) -> SyncPosition:
+    """Позиция из токена, выданного sync_token."""
+    payload = decode_cursor(token)
+    try:
+        change_xid, kind, entity_id = (int(value) for value in payload["s"])
+    except (TypeError, ValueError, KeyError) as e:
+        raise InvalidCursorError("Некорректный токен синхронизации") from e
+    return change_xid, kind, entity_id
+
+
+def sync_after_clause(change_xid: ColumnElement, entity_id: ColumnElement, kind: int,
+                      position: SyncPosition) -> ColumnElement:
+    """Условие WHERE для изменений вида kind после позиции position.
+
+    Для одного вида сравнение сводится к (change_xid, id) и выполняется
+    по индексу (change_xid, id).
+    """
+    last_xid, last_kind, last_id = position
+    if kind > last_kind:
+        return change_xid >= last_xid
+    if kind == last_kind:
+        return tuple_(change_xid, entity_id) > tuple_(last_xid, last_id)
+    return change_xid > last_xid
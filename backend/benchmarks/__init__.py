@@ -0,0 +1,7 @@
+"""Нагрузочные замеры NoteService и HTTP-маршрутов на синтетических графах.
+
+Запуск из каталога backend (БД из .env будет ОЧИЩЕНА при генерации):
+    python -m benchmarks generate --shape diamond --nodes 100000 --allow-truncate
+    python -m benchmarks run --out benchmarks/results/before.json
+    python -m benchmarks compare benchmarks/results/before.json benchmarks/results/after.json
+"""
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from app.db.session import SessionLocal, engine
+
+from .compare import compare_results, format_report, load_results
+from .generator import GraphSpec, generate_graph
+from .runner import run_benchmarks
+
+
+async def _generate(args: argparse.Namespace) -> None:
+    spec = GraphSpec(
+        shape=args.shape,
+        nodes=args.nodes,
+        branching=args.branching,
+        width=args.width,
+        fan_in=args.fan_in,
+        edges_per_node=args.edges_per_node,
+        seed=args.seed,
+    )
+    try:
+        async with SessionLocal() as session:
+            nodes, edges = await generate_graph(session, spec, closure=args.closure)
+    finally:
+        await engine.dispose()
+    print(f"Создан граф {spec.shape}: заметок {nodes}, связей {edges}")
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    try:
+        return await run_benchmarks(
+            iterations=args.iterations,
+            warmup=args.warmup,
+            seed=args.seed,
+            only=args.only,
+            http=not args.no_http,
+            service=not args.no_service,
+            serialization=not args.no_serialization,
+            include_export=args.export,
+        )
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Нагрузочные замеры на синтетических графах")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="очистить БД и создать синтетический граф")
+    generate.add_argument("--shape", choices=["chain", "fanout", "diamond", "random"], default="diamond")
+    generate.add_argument("--nodes", type=int, default=10_000)
+    generate.add_argument("--branching", type=int, default=10, help="fanout: детей у узла")
+    generate.add_argument("--width", type=int, default=100, help="diamond: ширина слоя")
+    generate.add_argument("--fan-in", type=int, default=3, help="diamond: родителей у узла")
+    generate.add_argument("--edges-per-node", type=float, default=2.0, help="random: связей на узел")
+    generate.add_argument("--seed", type=int, default=42)
+    generate.add_argument("--closure", action="store_true", help="перестроить note_closure")
+    generate.add_argument("--allow-truncate", action="store_true",
+                          help="подтвердить удаление всех заметок и связей в БД")
+
+    run = commands.add_parser("run", help="выполнить замеры")
+    run.add_argument("--iterations", type=int, default=50)
+    run.add_argument("--warmup", type=int, default=5)
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--only", help="только сценарии, в имени которых есть эта подстрока")
+    run.add_argument("--no-http", action="store_true", help="без HTTP-сценариев")
+    run.add_argument("--no-service", action="store_true", help="без сценариев NoteService")
+    run.add_argument("--no-serialization", action="store_true", help="без сценариев сериализации")
+    run.add_argument("--export", action="store_true", help="включить полную выгрузку графа")
+    run.add_argument("--out", help="файл для результатов в JSON")
+
+    compare = commands.add_parser("compare", help="сравнить два прогона")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=0.2,
+                         help="допустимый рост задержки (доля), по умолчанию 0.2")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        if not args.allow_truncate:
+            parser.error("generate удаляет все заметки и связи; добавьте --allow-truncate")
+        asyncio.run(_generate(args))
+        return 0
+
+    if args.command == "run":
+        results = asyncio.run(_run(args))
+        for name, result in results["results"].items():
+            print(f"{name:<50} p50 {result['p50_ms']:>9.2f} мс  p99 {result['p99_ms']:>9.2f} мс  "
+                  f"SQL {result['statements_mean']:g}" + (f"  ошибок {result['errors']}" if result["errors"] else ""))
+        if args.out:
+            os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"Результаты записаны в {args.out}")
+        return 0
+
+    comparisons, unmatched = compare_results(load_results(args.old), load_results(args.new), args.threshold)
+    print(format_report(comparisons, unmatched))
+    return 1 if any(c.regression for c in comparisons) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Сравнение двух файлов результатов и поиск регрессий."""
+import json
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# Разница меньше этого порога считается шумом, даже если в процентах она велика
+NOISE_FLOOR_MS = 0.5
+
+
+@dataclass
+class Comparison:
+    name: str
+    old_p50: float
+    new_p50: float
+    old_p90: float
+    new_p90: float
+    old_statements: float
+    new_statements: float
+    regression: Optional[str] = None
+
+
+def load_results(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _slower(old: float, new: float, threshold: float) -> bool:
+    return new - old > NOISE_FLOOR_MS and new > old * (1 + threshold)
+
+
+def compare_results(old: dict, new: dict, threshold: float = 0.2) -> Tuple[List[Comparison], List[str]]:
+    """Сравнить сценарии, присутствующие в обоих прогонах.
+
+    Регрессия — рост p50 или p90 больше чем на threshold (доля) и больше
+    NOISE_FLOOR_MS, либо рост среднего числа SQL-запросов на вызов.
+
+    Returns:
+      Сравнения по сценариям и имена сценариев, которые есть только в одном прогоне
+    """
+    old_results, new_results = old["results"], new["results"]
+    comparisons = []
+    for name in sorted(old_results.keys() & new_results.keys()):
+        a, b = old_results[name], new_results[name]
+        item = Comparison(name, a["p50_ms"], b["p50_ms"], a["p90_ms"], b["p90_ms"],
+                          a["statements_mean"], b["statements_mean"])
+        reasons = []
+        if b["statements_mean"] > a["statements_mean"]:
+            reasons.append("SQL-запросов больше")
+        if _slower(a["p50_ms"], b["p50_ms"], threshold):
+            reasons.append("p50")
+        if _slower(a["p90_ms"], b["p90_ms"], threshold):
+            reasons.append("p90")
+        if b["errors"] > a["errors"]:
+            reasons.append("ошибки")
+        item.regression = ", ".join(reasons) or None
+        comparisons.append(item)
+    unmatched = sorted(old_results.keys() ^ new_results.keys())
+    return comparisons, unmatched
+
+
+def _change(old: float, new: float) -> str:
+    if not old:
+        return "   n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def format_report(comparisons: List[Comparison], unmatched: List[str]) -> str:
+    width = max([len(c.name) for c in comparisons] + [8])
+    lines = [f"{'сценарий':<{width}}  {'p50, мс':>17} {'':>7}  {'p90, мс':>17} {'':>7}  {'SQL':>11}"]
+    for c in comparisons:
+        lines.append(
+            f"{c.name:<{width}}  {c.old_p50:>8.2f}→{c.new_p50:<8.2f} {_change(c.old_p50, c.new_p50)}  "
+            f"{c.old_p90:>8.2f}→{c.new_p90:<8.2f} {_change(c.old_p90, c.new_p90)}  "
+            f"{c.old_statements:>5g}→{c.new_statements:<5g}"
+            + (f"  РЕГРЕССИЯ: {c.regression}" if c.regression else "")
+        )
+    if unmatched:
+        lines.append("Только в одном из прогонов: " + ", ".join(unmatched))
+    regressions = sum(1 for c in comparisons if c.regression)
+    lines.append(f"Регрессий: {regressions} из {len(comparisons)}")
+    return "\n".join(lines)
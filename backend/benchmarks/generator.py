@@ -0,0 +1,109 @@
+"""Генерация синтетических графов заметок прямо в БД.
+
+Формы графа:
+  chain    — одна цепочка 1 → 2 → ... → n (глубина n);
+  fanout   — дерево, у каждого узла до branching детей (широкие уровни);
+  diamond  — слои ширины width, каждый узел связан с fan_in случайными
+             узлами предыдущего слоя (много ромбов, общих предков);
+  random   — случайный DAG: рёбра только от меньшего id к большему.
+
+Все формы ацикличны. Заметки вставляются одним INSERT ... SELECT
+generate_series, связи — через COPY, поэтому 10^6 узлов создаются за
+десятки секунд.
+"""
+import random
+from dataclasses import dataclass
+from typing import Iterator, Literal, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.note import NoteLink
+from app.services.closure_service import ClosureService
+
+GraphShape = Literal["chain", "fanout", "diamond", "random"]
+
+# Связи передаются в COPY блоками такого размера
+COPY_BATCH = 50_000
+
+
+@dataclass
+class GraphSpec:
+    shape: GraphShape
+    nodes: int
+    branching: int = 10  # fanout: детей у узла
+    width: int = 100  # diamond: ширина слоя
+    fan_in: int = 3  # diamond: родителей у узла
+    edges_per_node: float = 2.0  # random: среднее число связей на узел
+    seed: int = 42
+
+
+def iter_edges(spec: GraphSpec) -> Iterator[Tuple[int, int]]:
+    """Связи (parent_id, child_id) графа; узлы нумеруются с 1."""
+    rng = random.Random(spec.seed)
+    n = spec.nodes
+    if spec.shape == "chain":
+        for node_id in range(1, n):
+            yield node_id, node_id + 1
+    elif spec.shape == "fanout":
+        for child_id in range(2, n + 1):
+            yield (child_id - 2) // spec.branching + 1, child_id
+    elif spec.shape == "diamond":
+        for child_id in range(spec.width + 1, n + 1):
+            layer_start = (child_id - 1) // spec.width * spec.width + 1
+            previous = range(layer_start - spec.width, layer_start)
+            for parent_id in rng.sample(previous, min(spec.fan_in, len(previous))):
+                yield parent_id, child_id
+    else:
+        seen = set()
+        for _ in range(int(n * spec.edges_per_node)):
+            a, b = rng.randint(1, n), rng.randint(1, n)
+            if a == b:
+                continue
+            edge = (min(a, b), max(a, b))
+            if edge not in seen:
+                seen.add(edge)
+                yield edge
+
+
+async def generate_graph(session: AsyncSession, spec: GraphSpec, closure: bool = False) -> Tuple[int, int]:
+    """Очистить заметки и связи и создать граф по spec.
+
+    Args:
+      closure: перестроить таблицу note_closure (если она используется)
+
+    Returns:
+      Число заметок и связей
+    """
+    await session.execute(text("TRUNCATE note, sync_tombstone RESTART IDENTITY CASCADE"))
+    # Заголовки из нескольких слов, чтобы поиск и подсказки находили совпадения
+    await session.execute(text("""
+        INSERT INTO note (title, content, importance)
+        SELECT 'note ' || g || ' topic ' || (g % 97),
+               'content of note ' || g || ' about topic ' || (g % 97) || ' ' || repeat('lorem ipsum ', 10),
+               CASE WHEN g % 5 = 0 THEN NULL ELSE g % 10 END
+        FROM generate_series(1, :n) AS g
+    """), {"n": spec.nodes})
+
+    connection = await session.connection()
+    raw = await connection.get_raw_connection()
+    total_edges = 0
+    batch = []
+    for edge in iter_edges(spec):
+        batch.append(edge)
+        if len(batch) >= COPY_BATCH:
+            await raw.driver_connection.copy_records_to_table(
+                NoteLink.__tablename__, records=batch, columns=["parent_id", "child_id"])
+            total_edges += len(batch)
+            batch = []
+    if batch:
+        await raw.driver_connection.copy_records_to_table(
+            NoteLink.__tablename__, records=batch, columns=["parent_id", "child_id"])
+        total_edges += len(batch)
+
+    if closure:
+        await ClosureService(session).rebuild()
+    await session.execute(text("ANALYZE note"))
+    await session.execute(text("ANALYZE notelink"))
+    await session.commit()
+    return spec.nodes, total_edges
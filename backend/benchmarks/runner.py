@@ -0,0 +1,385 @@
+"""Замеры задержки и числа SQL-запросов для методов NoteService и HTTP-маршрутов.
+
+Каждый сценарий выполняется warmup раз без учёта и iterations раз с
+замером. Для каждого сценария сохраняются перцентили задержки и число
+SQL-запросов на вызов (через app.db.statements).
+
+Сервисные сценарии работают без кэша заметок, чтобы мерить путь до БД.
+HTTP-сценарии идут через ASGI-приложение в том же процессе с обычными
+настройками; кэш заметок очищается перед каждым сценарием.
+Сценарии serialization.* не обращаются к БД и сравнивают сериализацию
+одних и тех же строк обычным путём FastAPI (валидация в модель и
+dump_json) и через RowSerializer.
+"""
+import math
+import platform
+import random
+import statistics
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from pydantic import TypeAdapter
+from sqlalchemy import func, select
+
+from app.core.config import SETTINGS
+from app.db.session import SessionLocal
+from app.db.statements import record_statements
+from app.models.note import Note, NoteLink
+from app.schemas.note import (
+    NoteCreate, NoteLinkCreate, NoteLinkSummary, NoteUpdate, NoteWithDepth, NoteWithRelationsOptimized,
+)
+from app.schemas.serialization import NOTE_FULL, NOTE_SUMMARY, NOTE_WITH_DEPTH
+from app.services.cache import NoteCache, get_note_cache
+from app.services.graph_service import GraphService
+from app.services.graph_snapshot import GraphSnapshotCache
+from app.services.note_service import NoteService
+from app.services.pagination import catalog_cursor, sync_token
+
+CaseFn = Callable[[int], Awaitable[Any]]
+
+
+@dataclass
+class CaseResult:
+    name: str
+    iterations: int
+    p50_ms: float = 0.0
+    p90_ms: float = 0.0
+    p99_ms: float = 0.0
+    mean_ms: float = 0.0
+    max_ms: float = 0.0
+    statements_mean: float = 0.0
+    statements_max: int = 0
+    errors: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class BenchContext:
+    """Параметры графа, общие для всех сценариев."""
+    note_count: int
+    link_count: int
+    max_note_id: int
+    max_link_id: int
+    rng: random.Random
+    created_note_ids: List[int] = field(default_factory=list)
+    created_link_ids: List[int] = field(default_factory=list)
+
+    def note_id(self) -> int:
+        return self.rng.randint(1, self.max_note_id)
+
+    def link_id(self) -> int:
+        return self.rng.randint(1, max(self.max_link_id, 1))
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Перцентиль q (0..1) методом ближайшего ранга."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+async def measure(name: str, fn: CaseFn, iterations: int, warmup: int,
+                  on_error: Optional[Callable[[], Awaitable[None]]] = None) -> CaseResult:
+    """Выполнить сценарий и собрать статистику."""
+    durations: List[float] = []
+    statements: List[int] = []
+    result = CaseResult(name=name, iterations=iterations)
+    for i in range(warmup + iterations):
+        with record_statements() as recorder:
+            start = time.perf_counter()
+            try:
+                await fn(i)
+            except Exception as e:  # ошибка сценария не должна останавливать прогон
+                result.errors += 1
+                result.error = result.error or f"{type(e).__name__}: {e}"[:300]
+                if on_error is not None:
+                    await on_error()
+                continue
+            elapsed = time.perf_counter() - start
+        if i >= warmup:
+            durations.append(elapsed * 1000)
+            statements.append(recorder.count)
+
+    if durations:
+        durations.sort()
+        result.p50_ms = round(percentile(durations, 0.5), 3)
+        result.p90_ms = round(percentile(durations, 0.9), 3)
+        result.p99_ms = round(percentile(durations, 0.99), 3)
+        result.mean_ms = round(statistics.fmean(durations), 3)
+        result.max_ms = round(durations[-1], 3)
+        result.statements_mean = round(statistics.fmean(statements), 2)
+        result.statements_max = max(statements)
+    return result
+
+
+async def load_context(seed: int) -> BenchContext:
+    async with SessionLocal() as session:
+        note_count, max_note_id = (await session.execute(
+            select(func.count(), func.coalesce(func.max(Note.id), 0)))).one()
+        link_count, max_link_id = (await session.execute(
+            select(func.count(), func.coalesce(func.max(NoteLink.id), 0)))).one()
+    if not note_count:
+        raise SystemExit("В БД нет заметок: сначала python -m benchmarks generate")
+    return BenchContext(note_count, link_count, max_note_id, max_link_id, random.Random(seed))
+
+
+def _service_cases(svc: NoteService, ctx: BenchContext, include_export: bool) -> Dict[str, CaseFn]:
+    middle = SimpleNamespace(id=ctx.max_note_id // 2)
+    after = catalog_cursor(middle, "id", "asc")
+    # Клиент, у которого уже всё есть: изменений после токена нет
+    up_to_date = sync_token((2 ** 62, -1, 0))
+
+    async def create_link(i: int) -> None:
+        parent_id, child_id = sorted(ctx.rng.sample(range(1, ctx.max_note_id + 1), 2))
+        link = await svc.create_link(NoteLinkCreate(parent_id=parent_id, child_id=child_id))
+        if link is not None:
+            ctx.created_link_ids.append(link.id)
+
+    async def delete_link(i: int) -> None:
+        if ctx.created_link_ids:
+            await svc.delete_link(ctx.created_link_ids.pop())
+
+    async def create_note(i: int) -> None:
+        note = await svc.create_note(NoteCreate(title=f"bench note {i}", content="bench", importance=i % 10))
+        ctx.created_note_ids.append(note.id)
+
+    async def delete_note(i: int) -> None:
+        if ctx.created_note_ids:
+            await svc.delete_note(ctx.created_note_ids.pop())
+
+    async def bulk_create_links(i: int) -> None:
+        note_ids = await svc.bulk_create_notes([NoteCreate(title=f"bulk link {i} {k}") for k in range(101)])
+        await svc.bulk_create_links([
+            NoteLinkCreate(parent_id=a, child_id=b) for a, b in zip(note_ids, note_ids[1:])])
+
+    async def export_graph(i: int) -> None:
+        async for _ in svc.export_graph():
+            pass
+
+    cases: Dict[str, CaseFn] = {
+        "get_note": lambda i: svc.get_note(ctx.note_id()),
+        "get_full_note": lambda i: svc.get_full_note(ctx.note_id()),
+        "get_note_version": lambda i: svc.get_note_version(ctx.note_id()),
+        "get_full_note_version": lambda i: svc.get_full_note_version(ctx.note_id()),
+        "get_note_payload": lambda i: svc.get_note_payload(ctx.note_id()),
+        "get_full_note_payload": lambda i: svc.get_full_note_payload(ctx.note_id()),
+        "get_notes": lambda i: svc.get_notes(limit=100),
+        "get_note_summaries.first_page": lambda i: svc.get_note_summaries(limit=100),
+        "get_note_summaries.offset_middle": lambda i: svc.get_note_summaries(skip=ctx.max_note_id // 2, limit=100),
+        "get_note_summaries.keyset_middle": lambda i: svc.get_note_summaries(after=after, limit=100),
+        "get_note_summaries.by_importance": lambda i: svc.get_note_summaries(
+            limit=100, order_by="importance", order="desc"),
+        "search_notes": lambda i: svc.search_notes(f"topic {i % 97}", limit=20),
+        "autocomplete_notes": lambda i: svc.autocomplete_notes(f"note {ctx.note_id()}"[:8], limit=10),
+        "get_notes_by_ids": lambda i: svc.get_notes_by_ids([ctx.note_id() for _ in range(100)]),
+        "get_links_by_participant": lambda i: svc.get_links_by_participant(ctx.note_id()),
+        "get_link_by_id": lambda i: svc.get_link_by_id(ctx.link_id()),
+        "get_ancestors": lambda i: svc.get_ancestors(ctx.note_id(), limit=100),
+        "get_descendants": lambda i: svc.get_descendants(ctx.note_id(), limit=100),
+        "get_descendants.depth3": lambda i: svc.get_descendants(ctx.note_id(), max_depth=3),
+        "get_subgraph": lambda i: svc.get_subgraph(ctx.note_id(), "both", max_depth=2, max_nodes=200),
+        "check_circular_reference": lambda i: svc.check_circular_reference(ctx.note_id(), ctx.note_id()),
+        "get_changes.first_page": lambda i: svc.get_changes(limit=1000),
+        "get_changes.up_to_date": lambda i: svc.get_changes(up_to_date, limit=1000),
+        "create_note": create_note,
+        "update_note": lambda i: svc.update_note(ctx.note_id(), NoteUpdate(importance=i % 10)),
+        "delete_note": delete_note,
+        "create_link": create_link,
+        "delete_link": delete_link,
+        "bulk_create_notes.100": lambda i: svc.bulk_create_notes(
+            [NoteCreate(title=f"bulk {i} {k}") for k in range(100)]),
+        "bulk_create_links.100": bulk_create_links,
+    }
+    if include_export:
+        cases["export_graph"] = export_graph
+    return cases
+
+
+def _graph_cases(session) -> Dict[str, CaseFn]:
+    # Построение снимка — без кэша (TTL 0), чтение — по построенному снимку
+    build = GraphService(session, cache=GraphSnapshotCache(ttl_seconds=0))
+    cached = GraphService(session, cache=GraphSnapshotCache(ttl_seconds=3600))
+    return {
+        "graph.build_snapshot": lambda i: build.get_snapshot(),
+        "graph.stats": lambda i: cached.get_stats(),
+        "graph.roots": lambda i: cached.get_roots(limit=1000),
+        "graph.topo_order.first_page": lambda i: cached.get_topo_order(limit=1000),
+    }
+
+
+def _http_cases(client: httpx.AsyncClient, ctx: BenchContext, include_export: bool) -> Dict[str, CaseFn]:
+    etags: Dict[int, str] = {}
+
+    async def get(url: str, **kwargs) -> httpx.Response:
+        response = await client.get(url, **kwargs)
+        if response.status_code >= 500:
+            raise RuntimeError(f"{url}: HTTP {response.status_code}")
+        return response
+
+    async def conditional_get(i: int) -> None:
+        # Каждую заметку сначала получаем целиком, затем перепроверяем по ETag (304)
+        note_id = ctx.note_id() if i % 2 == 0 or not etags else next(iter(etags))
+        if note_id in etags:
+            await get(f"/notes/{note_id}", headers={"If-None-Match": etags.pop(note_id)})
+        else:
+            response = await get(f"/notes/{note_id}")
+            if "etag" in response.headers:
+                etags[note_id] = response.headers["etag"]
+
+    async def post_and_delete_link(i: int) -> None:
+        parent_id, child_id = sorted(ctx.rng.sample(range(1, ctx.max_note_id + 1), 2))
+        response = await client.post("/links/", json={"parent_id": parent_id, "child_id": child_id})
+        if response.status_code == 201:
+            ctx.created_link_ids.append(response.json()["id"])
+
+    async def delete_link(i: int) -> None:
+        if ctx.created_link_ids:
+            await client.delete(f"/links/{ctx.created_link_ids.pop()}")
+
+    async def export(i: int) -> None:
+        async with client.stream("GET", "/export") as response:
+            async for _ in response.aiter_raw():
+                pass
+
+    cases: Dict[str, CaseFn] = {
+        "GET /notes/{id}": lambda i: get(f"/notes/{ctx.note_id()}"),
+        "GET /notes/{id} conditional": conditional_get,
+        "GET /notes/{id}/full": lambda i: get(f"/notes/{ctx.note_id()}/full"),
+        "GET /notes/": lambda i: get("/notes/", params={"limit": 100}),
+        "GET /notes/ order_by=updated_at": lambda i: get(
+            "/notes/", params={"limit": 100, "order_by": "updated_at", "order": "desc"}),
+        "GET /notes/search": lambda i: get("/notes/search", params={"q": f"topic {i % 97}"}),
+        "GET /notes/autocomplete": lambda i: get("/notes/autocomplete", params={"q": "note 1"}),
+        "GET /notes/batch": lambda i: get(
+            "/notes/batch", params={"ids": ",".join(str(ctx.note_id()) for _ in range(100))}),
+        "GET /notes/{id}/ancestors": lambda i: get(f"/notes/{ctx.note_id()}/ancestors", params={"limit": 100}),
+        "GET /notes/{id}/descendants": lambda i: get(f"/notes/{ctx.note_id()}/descendants", params={"limit": 100}),
+        "GET /notes/{id}/graph": lambda i: get(f"/notes/{ctx.note_id()}/graph", params={"depth": 2}),
+        "GET /links/by-note/{id}": lambda i: get(f"/links/by-note/{ctx.note_id()}"),
+        "GET /links/{id}": lambda i: get(f"/links/{ctx.link_id()}"),
+        "GET /graph/stats": lambda i: get("/graph/stats"),
+        "GET /graph/topo-order": lambda i: get("/graph/topo-order", params={"limit": 1000}),
+        "POST /notes/": lambda i: client.post("/notes/", json={"title": f"bench http {i}"}),
+        "PUT /notes/{id}": lambda i: client.put(f"/notes/{ctx.note_id()}", json={"importance": i % 10}),
+        "POST /links/": post_and_delete_link,
+        "DELETE /links/{id}": delete_link,
+    }
+    if include_export:
+        cases["GET /export"] = export
+    return cases
+
+
+async def _serialization_cases() -> Dict[str, CaseFn]:
+    async with SessionLocal() as session:
+        svc = NoteService(session, cache=NoteCache())
+        catalog = await svc.get_note_summaries(limit=100)
+        descendants = await svc.get_descendants(1, limit=100)
+        # Заметка с наибольшим числом родителей — самый тяжёлый ответ /full
+        busiest = (await session.execute(
+            select(NoteLink.child_id).group_by(NoteLink.child_id)
+            .order_by(func.count().desc()).limit(1))).scalar() or 1
+        full_note = await svc.get_full_note(busiest)
+
+    def generic(model, value, many: bool = True) -> Callable[[], bytes]:
+        # То же, что делает FastAPI для response_model: валидация и dump_json
+        adapter = TypeAdapter(List[model] if many else model)
+        return lambda: adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+    calls = {
+        "catalog.generic": generic(NoteLinkSummary, catalog),
+        "catalog.fast": lambda: NOTE_SUMMARY.dump_many(catalog),
+        "descendants.generic": generic(NoteWithDepth, descendants),
+        "descendants.fast": lambda: NOTE_WITH_DEPTH.dump_many(descendants),
+        "full.generic": generic(NoteWithRelationsOptimized, full_note, many=False),
+        "full.fast": lambda: NOTE_FULL.dump(full_note),
+    }
+
+    def case(call: Callable[[], bytes]) -> CaseFn:
+        async def run(i: int) -> None:
+            call()
+        return run
+
+    return {name: case(call) for name, call in calls.items()}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmarks(iterations: int = 50, warmup: int = 5, seed: int = 42,
+                         only: Optional[str] = None, http: bool = True, service: bool = True,
+                         serialization: bool = True, include_export: bool = False) -> dict:
+    """Прогнать все сценарии и вернуть результаты в виде словаря для JSON.
+
+    Args:
+      only: выполнять только сценарии, в имени которых есть эта подстрока
+      include_export: включить полную выгрузку графа (выполняется один раз)
+    """
+    ctx = await load_context(seed)
+    results: List[CaseResult] = []
+
+    def selected(name: str) -> bool:
+        return only is None or only in name
+
+    def runs_for(name: str) -> tuple:
+        return (1, 0) if "export" in name else (iterations, warmup)
+
+    if service:
+        async with SessionLocal() as session:
+            svc = NoteService(session, cache=NoteCache())
+
+            async def reset_session() -> None:
+                await session.rollback()
+
+            cases = {**_service_cases(svc, ctx, include_export), **_graph_cases(session)}
+            for name, fn in cases.items():
+                if not selected(name):
+                    continue
+                count, warm = runs_for(name)
+                results.append(await measure(f"service.{name}", fn, count, warm, on_error=reset_session))
+                await session.rollback()
+                session.expunge_all()
+
+    if serialization:
+        # Вызовы короткие, поэтому итераций больше, чем в сценариях с БД
+        for name, fn in (await _serialization_cases()).items():
+            if selected(name):
+                results.append(await measure(f"serialization.{name}", fn, iterations * 20, warmup))
+
+    if http:
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, fn in _http_cases(client, ctx, include_export).items():
+                if not selected(name):
+                    continue
+                get_note_cache().clear()
+                count, warm = runs_for(name)
+                results.append(await measure(f"http.{name}", fn, count, warm))
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "notes": ctx.note_count,
+            "links": ctx.link_count,
+            "iterations": iterations,
+            "warmup": warmup,
+            "seed": seed,
+            "note_closure_enabled": SETTINGS.note_closure_enabled,
+            "note_cache_enabled": SETTINGS.note_cache_enabled,
+        },
+        "results": {result.name: asdict(result) for result in results},
+    }
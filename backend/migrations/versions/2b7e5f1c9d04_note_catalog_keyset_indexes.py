@@ -0,0 +1,30 @@
+"""note catalog keyset indexes
+
+Revision ID: 2b7e5f1c9d04
+Revises: 9c41d2e7a8b3
+Create Date: 2026-10-17 02:15:59.483708
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b7e5f1c9d04'
+down_revision: Union[str, Sequence[str], None] = '9c41d2e7a8b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_note_importance_id', 'note', [sa.literal_column('coalesce(importance, -1)'), 'id'], unique=False)
+    op.create_index('ix_note_updated_at_id', 'note', ['updated_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_note_updated_at_id', table_name='note')
+    op.drop_index('ix_note_importance_id', table_name='note')
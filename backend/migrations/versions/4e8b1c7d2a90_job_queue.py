@@ -0,0 +1,59 @@
+"""job queue
+
+Revision ID: 4e8b1c7d2a90
+Revises: 6d3a8f0e4c21
+Create Date: 2026-10-17 03:05:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8b1c7d2a90'
+down_revision: Union[str, Sequence[str], None] = '6d3a8f0e4c21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('job',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False, comment='Тип задачи'),
+    sa.Column('status', sa.String(length=20), server_default='pending', nullable=False,
+              comment='pending, running, succeeded или failed'),
+    sa.Column('params', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'{}'::jsonb"),
+              nullable=False, comment='Параметры задачи'),
+    sa.Column('state', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'{}'::jsonb"),
+              nullable=False, comment='Позиция для продолжения после перезапуска'),
+    sa.Column('progress_done', sa.Integer(), server_default='0', nullable=False, comment='Обработано элементов'),
+    sa.Column('progress_total', sa.Integer(), nullable=True, comment='Всего элементов, если известно'),
+    sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True, comment='Итог выполнения'),
+    sa.Column('error', sa.Text(), nullable=True, comment='Последняя ошибка'),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False, comment='Число запусков'),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False,
+              comment='Время постановки в очередь'),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True, comment='Время первого запуска'),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True, comment='Время завершения'),
+    sa.CheckConstraint("status IN ('pending', 'running', 'succeeded', 'failed')", name='ck_job_status'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_job_active_id', 'job', ['id'], unique=False,
+                    postgresql_where=sa.text("status IN ('pending', 'running')"))
+    op.create_table('job_item',
+    sa.Column('job_id', sa.Integer(), nullable=False, comment='ID задачи'),
+    sa.Column('note_id', sa.Integer(), nullable=False, comment='ID заметки'),
+    sa.ForeignKeyConstraint(['job_id'], ['job.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('job_id', 'note_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('job_item')
+    op.drop_index('ix_job_active_id', table_name='job', postgresql_where=sa.text("status IN ('pending', 'running')"))
+    op.drop_table('job')
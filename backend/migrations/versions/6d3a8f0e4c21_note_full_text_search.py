@@ -0,0 +1,43 @@
+"""note full text search
+
+Revision ID: 6d3a8f0e4c21
+Revises: 2b7e5f1c9d04
+Create Date: 2026-10-17 02:19:31.069303
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d3a8f0e4c21'
+down_revision: Union[str, Sequence[str], None] = '2b7e5f1c9d04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(content, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column('note', sa.Column('search_vector', postgresql.TSVECTOR(),
+                                    sa.Computed(SEARCH_VECTOR_SQL, persisted=True),
+                                    nullable=True, comment='Полнотекстовый индекс заголовка и содержимого'))
+    op.create_index('ix_note_search_vector', 'note', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_note_title_trgm', 'note', [sa.literal_column('lower(title) gin_trgm_ops')],
+                    unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_note_title_trgm', table_name='note')
+    op.drop_index('ix_note_search_vector', table_name='note')
+    op.drop_column('note', 'search_vector')
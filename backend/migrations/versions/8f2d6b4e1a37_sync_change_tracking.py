@@ -0,0 +1,93 @@
+"""sync change tracking
+
+Revision ID: 8f2d6b4e1a37
+Revises: 4e8b1c7d2a90
+Create Date: 2026-10-17 04:10:37.905214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2d6b4e1a37'
+down_revision: Union[str, Sequence[str], None] = '4e8b1c7d2a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+CHANGE_XID_SQL = "pg_current_xact_id()::text::bigint"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Существующим строкам — 0 (без перезаписи таблиц): они попадут
+    # в первую синхронизацию; новым — номер транзакции
+    for table in ('note', 'notelink'):
+        op.add_column(table, sa.Column('change_xid', sa.BigInteger(), server_default='0', nullable=False,
+                                       comment='Транзакция последнего изменения' if table == 'note'
+                                       else 'Транзакция создания связи'))
+        op.alter_column(table, 'change_xid', server_default=sa.text(CHANGE_XID_SQL))
+    op.create_index('ix_note_change_xid_id', 'note', ['change_xid', 'id'], unique=False)
+    op.create_index('ix_notelink_change_xid_id', 'notelink', ['change_xid', 'id'], unique=False)
+
+    op.create_table('sync_tombstone',
+    sa.Column('kind', sa.String(length=10), nullable=False, comment='note или link'),
+    sa.Column('entity_id', sa.Integer(), nullable=False, comment='ID удалённой заметки или связи'),
+    sa.Column('change_xid', sa.BigInteger(), server_default=sa.text(CHANGE_XID_SQL), nullable=False,
+              comment='Транзакция удаления'),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False,
+              comment='Время удаления'),
+    sa.CheckConstraint("kind IN ('note', 'link')", name='ck_sync_tombstone_kind'),
+    sa.PrimaryKeyConstraint('kind', 'entity_id')
+    )
+    op.create_index('ix_sync_tombstone_kind_change_xid', 'sync_tombstone', ['kind', 'change_xid', 'entity_id'],
+                    unique=False)
+
+    op.execute(f"""
+        CREATE FUNCTION sync_set_change_xid() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.change_xid := {CHANGE_XID_SQL};
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER note_change_xid BEFORE UPDATE ON note
+        FOR EACH ROW EXECUTE FUNCTION sync_set_change_xid()
+    """)
+    # Один INSERT на оператор DELETE; каскадное удаление связей тоже вызывает триггер
+    op.execute("""
+        CREATE FUNCTION sync_record_tombstones() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO sync_tombstone (kind, entity_id)
+            SELECT TG_ARGV[0], deleted.id FROM deleted
+            ON CONFLICT (kind, entity_id) DO UPDATE
+            SET change_xid = EXCLUDED.change_xid, deleted_at = EXCLUDED.deleted_at;
+            RETURN NULL;
+        END
+        $$
+    """)
+    for table, kind in (('note', 'note'), ('notelink', 'link')):
+        op.execute(f"""
+            CREATE TRIGGER {table}_tombstone AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS deleted
+            FOR EACH STATEMENT EXECUTE FUNCTION sync_record_tombstones('{kind}')
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER notelink_tombstone ON notelink")
+    op.execute("DROP TRIGGER note_tombstone ON note")
+    op.execute("DROP FUNCTION sync_record_tombstones()")
+    op.execute("DROP TRIGGER note_change_xid ON note")
+    op.execute("DROP FUNCTION sync_set_change_xid()")
+    op.drop_index('ix_sync_tombstone_kind_change_xid', table_name='sync_tombstone')
+    op.drop_table('sync_tombstone')
+    op.drop_index('ix_notelink_change_xid_id', table_name='notelink')
+    op.drop_index('ix_note_change_xid_id', table_name='note')
+    op.drop_column('notelink', 'change_xid')
+    op.drop_column('note', 'change_xid')
@@ -0,0 +1,42 @@
+"""note closure table
+
+Revision ID: 9c41d2e7a8b3
+Revises: 5f05678c2b4d
+Create Date: 2026-10-17 02:14:30.338703
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c41d2e7a8b3'
+down_revision: Union[str, Sequence[str], None] = '5f05678c2b4d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('note_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False, comment='ID заметки-предка'),
+    sa.Column('descendant_id', sa.Integer(), nullable=False, comment='ID заметки-потомка'),
+    sa.Column('depth', sa.Integer(), nullable=False, comment='Длина кратчайшего пути'),
+    sa.CheckConstraint('ancestor_id <> descendant_id', name='ck_note_closure_not_reflexive'),
+    sa.CheckConstraint('depth > 0', name='ck_note_closure_depth'),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['note.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['note.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_note_closure_descendant', 'note_closure', ['descendant_id', 'depth'], unique=False)
+    op.create_index('ix_note_closure_ancestor_depth', 'note_closure', ['ancestor_id', 'depth'], unique=False)
+    # Таблица заполняется командой python -m app.commands.rebuild_closure
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_note_closure_ancestor_depth', table_name='note_closure')
+    op.drop_index('ix_note_closure_descendant', table_name='note_closure')
+    op.drop_table('note_closure')
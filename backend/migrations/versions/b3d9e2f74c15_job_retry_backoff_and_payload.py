@@ -0,0 +1,43 @@
+"""job retry backoff and payload
+
+Revision ID: b3d9e2f74c15
+Revises: 8f2d6b4e1a37
+Create Date: 2026-10-17 14:22:41.902113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d9e2f74c15'
+down_revision: Union[str, Sequence[str], None] = '8f2d6b4e1a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('job', sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=True,
+                                   comment='Входные данные задачи; читаются только при выполнении'))
+    op.add_column('job', sa.Column('run_after', sa.DateTime(timezone=True), nullable=True,
+                                   comment='Не запускать раньше (пауза перед повтором после ошибки)'))
+    # Данные уже поставленных импортов переносятся из params в payload
+    op.execute("""
+        UPDATE job
+        SET payload = params,
+            params = jsonb_build_object(
+                'notes', jsonb_array_length(COALESCE(params->'notes', '[]'::jsonb)),
+                'links', jsonb_array_length(COALESCE(params->'links', '[]'::jsonb)))
+        WHERE kind = 'bulk_import'
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("UPDATE job SET params = payload WHERE kind = 'bulk_import' AND payload IS NOT NULL")
+    op.drop_column('job', 'run_after')
+    op.drop_column('job', 'payload')
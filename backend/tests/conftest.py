@@ -0,0 +1,123 @@
+"""Общие фикстуры тестов.
+
+Тесты работают с отдельной базой TEST_POSTGRES_DB (по умолчанию
+<POSTGRES_DB>_test на том же сервере): при первом запуске она создаётся
+и мигрируется до head, перед каждым тестом таблицы очищаются.
+
+Роль реплики играет база <TEST_POSTGRES_DB>_replica — копия схемы
+тестовой базы, пересоздаваемая при каждом запуске. Пока тест не объявит
+реплику доступной (replica_monitor.healthy), чтение идёт в основную базу.
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import AsyncIterator
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# До импорта приложения: SETTINGS и движки создаются при импорте
+os.environ["POSTGRES_DB"] = os.getenv("TEST_POSTGRES_DB") or f"{os.getenv('POSTGRES_DB', 'notes')}_test"
+REPLICA_POSTGRES_DB = f"{os.environ['POSTGRES_DB']}_replica"
+os.environ["DB_REPLICA_URL"] = (
+    f"postgresql+asyncpg://{os.getenv('POSTGRES_USER', 'notes')}:{os.getenv('POSTGRES_PASSWORD', 'notes')}"
+    f"@{os.getenv('POSTGRES_HOST', 'db')}:{os.getenv('POSTGRES_PORT', '5432')}/{REPLICA_POSTGRES_DB}"
+)
+
+import asyncpg
+import httpx
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import select, text
+
+from app.core.config import SETTINGS
+from app.db.session import SessionLocal, engine
+from app.models.note import NoteClosure
+from app.services.cache import get_note_cache
+from app.services.graph_snapshot import get_graph_snapshot_cache
+from app.services.note_service import NoteService
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+async def _connect_maintenance() -> asyncpg.Connection:
+    return await asyncpg.connect(
+        host=SETTINGS.postgres_host, port=SETTINGS.postgres_port, user=SETTINGS.postgres_user,
+        password=SETTINGS.postgres_password, database="postgres")
+
+
+async def _create_database() -> None:
+    connection = await _connect_maintenance()
+    try:
+        exists = await connection.fetchval("SELECT 1 FROM pg_database WHERE datname = $1", SETTINGS.postgres_db)
+        if not exists:
+            await connection.execute(f'CREATE DATABASE "{SETTINGS.postgres_db}"')
+    finally:
+        await connection.close()
+
+
+async def _create_replica_database() -> None:
+    # Копия уже мигрированной тестовой базы; к ней ещё никто не подключён
+    connection = await _connect_maintenance()
+    try:
+        await connection.execute(f'DROP DATABASE IF EXISTS "{REPLICA_POSTGRES_DB}"')
+        await connection.execute(f'CREATE DATABASE "{REPLICA_POSTGRES_DB}" TEMPLATE "{SETTINGS.postgres_db}"')
+    finally:
+        await connection.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database() -> None:
+    """Тестовая база со схемой head и её копия в роли реплики."""
+    asyncio.run(_create_database())
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    command.upgrade(config, "head")
+    asyncio.run(_create_replica_database())
+
+
+@pytest.fixture(autouse=True)
+async def clean_db(database: None) -> AsyncIterator[None]:
+    """Пустые таблицы и кэши процесса перед каждым тестом."""
+    async with engine.begin() as connection:
+        await connection.execute(text("TRUNCATE note, sync_tombstone, job RESTART IDENTITY CASCADE"))
+    get_note_cache().clear()
+    get_graph_snapshot_cache().invalidate()
+    yield
+
+
+@pytest.fixture
+async def client() -> AsyncIterator[httpx.AsyncClient]:
+    """HTTP-клиент приложения без сети и без lifespan (фоновые задачи не запускаются)."""
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def create_note(client: httpx.AsyncClient, title: str, **fields) -> int:
+    response = await client.post("/notes/", json={"title": title, **fields})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+async def create_link(client: httpx.AsyncClient, parent_id: int, child_id: int) -> int:
+    response = await client.post("/links/", json={"parent_id": parent_id, "child_id": child_id})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+async def closure_rows() -> list:
+    async with SessionLocal() as session:
+        result = await session.execute(select(NoteClosure.ancestor_id, NoteClosure.descendant_id, NoteClosure.depth)
+                                       .order_by(NoteClosure.ancestor_id, NoteClosure.descendant_id))
+        return [tuple(row) for row in result.all()]
+
+
+async def rebuilt_closure_rows() -> list:
+    """Замыкание после полного перестроения по текущим связям."""
+    async with SessionLocal() as session:
+        await NoteService(session, closure_enabled=True).closure.rebuild()
+        await session.commit()
+    return await closure_rows()
@@ -0,0 +1,53 @@
+from app.core.config import SETTINGS
+from app.db.statements import STATEMENT_BUDGETS, assert_max_statements
+from tests.conftest import create_note
+
+
+async def test_batch_keeps_request_order_and_marks_missing(client):
+    a = await create_note(client, "a", content="text a", importance=1)
+    b = await create_note(client, "b")
+    response = await client.post("/notes/batch", json={"ids": [b, 999_999, a, b]})
+    assert response.status_code == 200
+    items = response.json()
+    assert [(item["id"], item["found"]) for item in items] == [(b, True), (999_999, False), (a, True), (b, True)]
+    assert items[1]["note"] is None
+    assert items[2]["note"]["content"] == "text a" and items[2]["note"]["importance"] == 1
+    assert items[0]["note"] == items[3]["note"] == (await client.get(f"/notes/{b}")).json()
+
+
+async def test_batch_of_missing_ids_only(client):
+    response = await client.post("/notes/batch", json={"ids": [5, 6]})
+    assert response.json() == [{"id": 5, "found": False, "note": None}, {"id": 6, "found": False, "note": None}]
+
+
+async def test_batch_summary_fields(client):
+    a = await create_note(client, "a", content="text a", importance=4)
+    response = await client.post("/notes/batch", json={"ids": [a], "fields": "summary"})
+    assert response.json()[0]["note"] == {"id": a, "title": "a", "importance": 4}
+
+
+async def test_get_batch_accepts_repeated_and_comma_separated_ids(client):
+    a = await create_note(client, "a")
+    b = await create_note(client, "b")
+    response = await client.get("/notes/batch", params=[("ids", f"{a},{b}"), ("ids", "404"), ("fields", "summary")])
+    items = response.json()
+    assert [(item["id"], item["found"]) for item in items] == [(a, True), (b, True), (404, False)]
+    assert items[0]["note"] == {"id": a, "title": "a", "importance": None}
+
+
+async def test_batch_rejects_invalid_requests(client, monkeypatch):
+    assert (await client.post("/notes/batch", json={"ids": []})).status_code == 422
+    assert (await client.post("/notes/batch", json={"ids": [1], "fields": "all"})).status_code == 422
+    assert (await client.get("/notes/batch", params={"ids": "1,x"})).status_code == 422
+    assert (await client.get("/notes/batch", params={"ids": ","})).status_code == 422
+    monkeypatch.setattr(SETTINGS, "batch_max_ids", 2)
+    assert (await client.post("/notes/batch", json={"ids": [1, 2, 3]})).status_code == 413
+    assert (await client.get("/notes/batch", params={"ids": "1,2,3"})).status_code == 413
+
+
+async def test_batch_is_one_query_for_any_size(client):
+    response = await client.post("/notes/bulk", json=[{"title": f"n{i}"} for i in range(100)])
+    ids = [item["id"] for item in response.json()["results"]]
+    with assert_max_statements(STATEMENT_BUDGETS["POST /notes/batch"]):
+        response = await client.post("/notes/batch", json={"ids": ids + [999_999]})
+    assert sum(item["found"] for item in response.json()) == 100
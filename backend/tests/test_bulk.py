@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from app.core.config import SETTINGS
+from app.db.statements import STATEMENT_BUDGETS, assert_max_statements
+from tests.conftest import create_link, create_note
+
+
+def errors(response) -> list:
+    return [item["error"] for item in response.json()["results"]]
+
+
+async def test_bulk_notes_report_errors_per_item(client):
+    response = await client.post("/notes/bulk", json=[
+        {"title": "a", "importance": 3},
+        {"content": "без заголовка"},
+        {"title": "b", "importance": 12},
+        "не объект",
+        {"title": "c", "content": "текст"},
+    ])
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 3)
+    assert [item["index"] for item in body["results"]] == [0, 1, 2, 3, 4]
+    assert [error is None for error in errors(response)] == [True, False, False, False, True]
+    assert errors(response)[1].startswith("title:") and errors(response)[2].startswith("importance:")
+
+    first, last = body["results"][0]["id"], body["results"][4]["id"]
+    assert (await client.get(f"/notes/{first}")).json()["importance"] == 3
+    assert (await client.get(f"/notes/{last}")).json()["content"] == "текст"
+    assert len((await client.get("/notes/")).json()) == 2
+
+
+async def test_bulk_notes_from_ndjson(client):
+    lines = [json.dumps({"title": "a"}), "{broken", "", json.dumps({"title": "b"})]
+    response = await client.post("/notes/bulk", content="\n".join(lines),
+                                 headers={"Content-Type": "application/x-ndjson"})
+    assert response.json()["created"] == 2
+    # Пустые строки пропускаются, позиции считаются по элементам
+    assert [error is None for error in errors(response)] == [True, False, True]
+    assert errors(response)[1].startswith("Некорректный JSON")
+
+
+async def test_bulk_rejects_malformed_and_oversized_body(client, monkeypatch):
+    assert (await client.post("/notes/bulk", content="{not json")).status_code == 400
+    assert (await client.post("/notes/bulk", json={"title": "a"})).status_code == 400
+    monkeypatch.setattr(SETTINGS, "bulk_max_items", 2)
+    assert (await client.post("/notes/bulk", json=[{"title": "a"}] * 3)).status_code == 413
+    response = await client.post("/links/bulk", content="{}\n{}\n{}",
+                                 headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 413
+
+
+async def test_bulk_links_report_errors_per_item(client):
+    a, b, c = [await create_note(client, name) for name in "abc"]
+    await create_link(client, a, b)
+    response = await client.post("/links/bulk", json=[
+        {"parent_id": b, "child_id": c},
+        {"parent_id": a, "child_id": a},
+        {"parent_id": a, "child_id": 999_999},
+        {"parent_id": b, "child_id": c},
+        {"parent_id": a, "child_id": b},
+        {"parent_id": c, "child_id": a},
+        {"parent_id": "x"},
+        {"parent_id": a, "child_id": c},
+    ])
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 6)
+    assert errors(response)[:6] == [
+        None, "Связь заметки с самой собой", "Заметка не найдена", "Связь повторяется в пакете",
+        "Связь уже существует", "Связь образует цикл"]
+    assert errors(response)[6].startswith("parent_id:") and errors(response)[7] is None
+    created = {item["id"] for item in body["results"] if item["id"] is not None}
+    links = (await client.get(f"/links/by-note/{c}")).json()
+    assert {link["id"] for link in links} == created
+
+
+@pytest.mark.parametrize("endpoint", ["POST /notes/bulk", "POST /links/bulk"])
+async def test_bulk_statement_count_does_not_grow_with_batch(client, monkeypatch, endpoint):
+    monkeypatch.setattr(SETTINGS, "note_closure_enabled", False)
+    monkeypatch.setattr(SETTINGS, "events_enabled", False)
+    if endpoint == "POST /notes/bulk":
+        url, body = "/notes/bulk", [{"title": f"n{i}"} for i in range(200)]
+    else:
+        response = await client.post("/notes/bulk", json=[{"title": f"n{i}"} for i in range(201)])
+        ids = [item["id"] for item in response.json()["results"]]
+        url, body = "/links/bulk", [{"parent_id": parent_id, "child_id": child_id}
+                                    for parent_id, child_id in zip(ids, ids[1:])]
+
+    with assert_max_statements(STATEMENT_BUDGETS[endpoint], endpoint):
+        response = await client.post(url, json=body)
+    assert response.json()["created"] == 200
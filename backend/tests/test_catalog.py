@@ -0,0 +1,80 @@
+import pytest
+
+from app.services.pagination import encode_cursor
+from tests.conftest import create_note
+
+
+async def read_pages(client, limit: int, **params) -> list:
+    """Все страницы каталога по курсору: список страниц из id."""
+    pages = []
+    after = None
+    while True:
+        query = {"limit": limit, **params, **({"after": after} if after else {})}
+        response = await client.get("/notes/", params=query)
+        assert response.status_code == 200, response.text
+        pages.append([note["id"] for note in response.json()])
+        after = response.headers.get("x-next-cursor")
+        if after is None:
+            return pages
+
+
+async def create_notes(client, importances) -> list:
+    return [await create_note(client, f"n{i}", importance=value) for i, value in enumerate(importances)]
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+async def test_importance_pages_through_ties(client, order):
+    importances = [5, None, 5, 5, 1, None, 5, 1]
+    ids = await create_notes(client, importances)
+    # Без важности — как importance = -1; при равной важности порядок по id
+    expected = [note_id for _, note_id in sorted(
+        ((-1 if value is None else value, note_id) for value, note_id in zip(importances, ids)),
+        reverse=order == "desc")]
+
+    pages = await read_pages(client, 3, order_by="importance", order=order)
+    assert [note_id for page in pages for note_id in page] == expected
+    assert [len(page) for page in pages] == [3, 3, 2]
+
+
+async def test_updated_at_pages_through_ties(client):
+    # Заметки одного пакета создаются одной транзакцией и получают одинаковый updated_at
+    response = await client.post("/notes/bulk", json=[{"title": f"n{i}"} for i in range(5)])
+    ids = [item["id"] for item in response.json()["results"]]
+    pages = await read_pages(client, 2, order_by="updated_at", order="desc")
+    assert [note_id for page in pages for note_id in page] == sorted(ids, reverse=True)
+
+
+async def test_inserts_between_pages_do_not_shift_rows(client):
+    ids = await create_notes(client, [3, 3, 3, 3, 3, 3])
+    first = await client.get("/notes/", params={"limit": 3, "order_by": "importance"})
+    seen = [note["id"] for note in first.json()]
+    assert seen == ids[:3]
+
+    # Новые заметки до позиции курсора (меньшая важность) и после неё
+    low_1, low_2, tie, high = await create_notes(client, [1, 1, 3, 7])
+    pages = await read_pages(client, 3, order_by="importance", after=first.headers["x-next-cursor"])
+    rest = [note_id for page in pages for note_id in page]
+    assert rest == ids[3:] + [tie, high]
+    assert low_1 not in rest and low_2 not in rest
+
+
+@pytest.mark.parametrize("cursor", [
+    "garbage",
+    "e30",  # {}
+    encode_cursor({"o": "id", "d": "asc", "k": [1]}),  # другая сортировка
+    encode_cursor({"o": "importance", "d": "desc", "k": [1, 1]}),  # другое направление
+    encode_cursor({"o": "importance", "d": "asc", "k": [1]}),
+    encode_cursor({"o": "importance", "d": "asc", "k": ["x", 1]}),
+    encode_cursor({"q": "0123456789ab", "k": [0.5, 1]}),  # курсор поиска
+])
+async def test_invalid_or_foreign_cursor_is_rejected(client, cursor):
+    await create_notes(client, [1, 2])
+    response = await client.get("/notes/", params={"order_by": "importance", "after": cursor})
+    assert response.status_code == 400
+
+
+async def test_catalog_cursor_is_rejected_by_search(client):
+    await create_note(client, "alpha")
+    first = await client.get("/notes/", params={"limit": 1})
+    response = await client.get("/notes/search", params={"q": "alpha", "after": first.headers["x-next-cursor"]})
+    assert response.status_code == 400
@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import text
+
+from app.core.config import SETTINGS
+from app.db.session import SessionLocal, engine
+from app.services.closure_service import ClosureService, check_closure_built
+from tests.conftest import closure_rows, create_link, create_note, rebuilt_closure_rows
+
+
+@pytest.fixture
+def closure(monkeypatch) -> None:
+    monkeypatch.setattr(SETTINGS, "note_closure_enabled", True)
+
+
+async def diamond(client) -> dict:
+    """a -> b -> d, a -> c -> d, d -> e, a -> e."""
+    ids = {name: await create_note(client, name) for name in "abcde"}
+    links = {}
+    for parent, child in ("ab", "ac", "bd", "cd", "de", "ae"):
+        links[parent + child] = await create_link(client, ids[parent], ids[child])
+    return {**ids, **links}
+
+
+async def test_create_links_matches_rebuild(client, closure):
+    ids = await diamond(client)
+    rows = await closure_rows()
+    assert (ids["a"], ids["e"], 1) in rows and (ids["b"], ids["e"], 2) in rows
+    assert rows == await rebuilt_closure_rows()
+
+
+@pytest.mark.parametrize("link", ["ab", "bd", "de", "ae"])
+async def test_delete_link_matches_rebuild(client, closure, link):
+    ids = await diamond(client)
+    assert (await client.delete(f"/links/{ids[link]}")).status_code == 200
+    assert await closure_rows() == await rebuilt_closure_rows()
+
+
+@pytest.mark.parametrize("note", "abcde")
+async def test_delete_note_matches_rebuild(client, closure, note):
+    ids = await diamond(client)
+    assert (await client.delete(f"/notes/{ids[note]}")).status_code == 200
+    assert await closure_rows() == await rebuilt_closure_rows()
+
+
+async def test_is_built_detects_missing_and_stale_table(client, closure):
+    ids = await diamond(client)
+    async with SessionLocal() as session:
+        assert await ClosureService(session).is_built()
+
+    # Таблица не построена: связи созданы при выключенной note_closure_enabled
+    async with engine.begin() as connection:
+        await connection.execute(text("TRUNCATE note_closure"))
+    async with SessionLocal() as session:
+        assert not await ClosureService(session).is_built()
+    await rebuilt_closure_rows()
+
+    # Таблица устарела: связь удалена в обход её поддержки
+    async with engine.begin() as connection:
+        await connection.execute(text("DELETE FROM notelink WHERE id = :id"), {"id": ids["ae"]})
+    async with SessionLocal() as session:
+        assert not await ClosureService(session).is_built()
+
+
+async def test_startup_refuses_unbuilt_closure(client, monkeypatch):
+    # Связи созданы при выключенной note_closure_enabled: таблица пуста
+    await diamond(client)
+    await check_closure_built()
+
+    monkeypatch.setattr(SETTINGS, "note_closure_enabled", True)
+    with pytest.raises(RuntimeError, match="rebuild_closure"):
+        await check_closure_built()
+    await rebuilt_closure_rows()
+    await check_closure_built()
@@ -0,0 +1,73 @@
+from tests.conftest import create_link, create_note
+
+
+async def test_full_etag_changes_with_links(client):
+    parent_id = await create_note(client, "parent")
+    child_id = await create_note(client, "child")
+    response = await client.get(f"/notes/{child_id}/full")
+    etag = response.headers["etag"]
+    assert "last-modified" not in response.headers
+
+    response = await client.get(f"/notes/{child_id}/full", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    link_id = await create_link(client, parent_id, child_id)
+    response = await client.get(f"/notes/{child_id}/full", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["parents"][0]["id"] == parent_id
+    linked_etag = response.headers["etag"]
+    assert linked_etag != etag
+
+    await client.delete(f"/links/{link_id}")
+    response = await client.get(f"/notes/{child_id}/full", headers={"If-None-Match": linked_etag})
+    assert response.status_code == 200
+    assert response.json()["parents"] == []
+
+
+async def test_full_ignores_if_modified_since(client):
+    # Время изменения связей не хранится: дата клиента не доказывает актуальность /full
+    parent_id = await create_note(client, "parent")
+    child_id = await create_note(client, "child")
+    await create_link(client, parent_id, child_id)
+    response = await client.get(
+        f"/notes/{child_id}/full", headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+    assert response.status_code == 200
+
+
+async def test_card_supports_if_modified_since(client):
+    note_id = await create_note(client, "note")
+    response = await client.get(f"/notes/{note_id}")
+    last_modified = response.headers["last-modified"]
+
+    response = await client.get(f"/notes/{note_id}", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+
+async def test_if_match_on_update(client):
+    note_id = await create_note(client, "note")
+    etag = (await client.get(f"/notes/{note_id}")).headers["etag"]
+
+    response = await client.put(f"/notes/{note_id}", json={"title": "v2"}, headers={"If-Match": etag})
+    assert response.status_code == 200
+    new_etag = response.headers["etag"]
+    # Старая версия и слабый ETag не подходят
+    response = await client.put(f"/notes/{note_id}", json={"title": "v3"}, headers={"If-Match": etag})
+    assert response.status_code == 412
+    response = await client.put(f"/notes/{note_id}", json={"title": "v3"}, headers={"If-Match": f"W/{new_etag}"})
+    assert response.status_code == 412
+    response = await client.put(f"/notes/{note_id}", json={"title": "v3"}, headers={"If-Match": "*"})
+    assert response.status_code == 200
+    assert (await client.get(f"/notes/{note_id}")).json()["title"] == "v3"
+
+
+async def test_if_match_on_missing_note_fails_precondition(client):
+    note_id = await create_note(client, "note")
+    etag = (await client.get(f"/notes/{note_id}")).headers["etag"]
+    await client.delete(f"/notes/{note_id}")
+
+    # Заметки нет: ни "*", ни её прежний ETag не совпадают с текущим состоянием
+    for if_match in ("*", etag):
+        response = await client.put(f"/notes/{note_id}", json={"title": "v2"}, headers={"If-Match": if_match})
+        assert response.status_code == 412, if_match
+    response = await client.put(f"/notes/{note_id}", json={"title": "v2"})
+    assert response.status_code == 404
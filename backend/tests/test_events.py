@@ -0,0 +1,106 @@
+import asyncio
+
+import asyncpg
+import pytest
+
+from app.core.config import SETTINGS
+from app.services.events import CHANGES_CHANNEL, MAX_PAYLOAD_BYTES, PROCESS_ID, ChangeEvent
+from tests.conftest import create_note
+
+
+@pytest.fixture
+async def notifications(monkeypatch):
+    """Уведомления канала изменений, полученные отдельным соединением с LISTEN."""
+    monkeypatch.setattr(SETTINGS, "events_enabled", True)
+    queue: asyncio.Queue = asyncio.Queue()
+    connection = await asyncpg.connect(
+        host=SETTINGS.postgres_host, port=SETTINGS.postgres_port, user=SETTINGS.postgres_user,
+        password=SETTINGS.postgres_password, database=SETTINGS.postgres_db)
+    await connection.add_listener(CHANGES_CHANNEL, lambda *args: queue.put_nowait(args[-1]))
+    try:
+        yield queue
+    finally:
+        await connection.close()
+
+
+async def next_event(queue: asyncio.Queue) -> ChangeEvent:
+    return ChangeEvent.decode(await asyncio.wait_for(queue.get(), timeout=5))
+
+
+async def test_writes_publish_change_events(client, notifications):
+    parent_id = await create_note(client, "parent")
+    child_id = await create_note(client, "child")
+    assert await next_event(notifications) == ChangeEvent("note.created", note_ids=(parent_id,))
+    assert await next_event(notifications) == ChangeEvent("note.created", note_ids=(child_id,))
+
+    response = await client.post("/links/", json={"parent_id": parent_id, "child_id": child_id})
+    link_id = response.json()["id"]
+    event = await next_event(notifications)
+    assert event.type == "link.created"
+    assert event.links == ((link_id, parent_id, child_id),)
+    assert set(event.related_ids) == {parent_id, child_id}
+    assert event.origin == PROCESS_ID
+
+    await client.put(f"/notes/{parent_id}", json={"title": "renamed"})
+    assert await next_event(notifications) == ChangeEvent(
+        "note.updated", note_ids=(parent_id,), related_ids=(child_id,))
+
+
+async def test_rolled_back_write_publishes_nothing(client, notifications):
+    note_id = await create_note(client, "note")
+    await next_event(notifications)
+
+    # Связь с несуществующей заметкой отклоняется, транзакция откатывается вместе с pg_notify
+    response = await client.post("/links/", json={"parent_id": note_id, "child_id": 10_000})
+    assert response.status_code != 201
+    await client.delete(f"/notes/{note_id}")
+    event = await next_event(notifications)
+    assert event.type == "note.deleted" and event.note_ids == (note_id,)
+
+
+def assert_parts_cover(event: ChangeEvent, payloads: list) -> None:
+    """Части события укладываются в предел NOTIFY и вместе дают всё событие."""
+    parts = [ChangeEvent.decode(payload) for payload in payloads]
+    assert len(parts) > 1
+    assert all(len(payload.encode()) <= MAX_PAYLOAD_BYTES for payload in payloads)
+    assert {part.type for part in parts} == {event.type}
+    links = [link for part in parts for link in part.links]
+    assert sorted(links) == sorted(event.links)
+    assert {note_id for part in parts for note_id in part.note_ids} == set(event.note_ids)
+    assert {note_id for part in parts for note_id in part.related_ids} == set(event.related_ids)
+    for part in parts:
+        # Каждая связь приходит вместе с заметками на её концах
+        assert {note_id for _, parent_id, child_id in part.links
+                for note_id in (parent_id, child_id)} <= set(part.related_ids)
+
+
+def test_large_link_event_is_split_by_link():
+    links = tuple((100_000 + i, 1_000_000 + i, 2_000_000 + i) for i in range(400))
+    related = tuple(note_id for _, parent_id, child_id in links for note_id in (parent_id, child_id))
+    event = ChangeEvent("link.deleted", related_ids=related + (7,), links=links)
+    assert len(event.to_json()) > MAX_PAYLOAD_BYTES
+    assert_parts_cover(event, event.encode())
+
+
+def test_large_note_event_is_split():
+    event = ChangeEvent("note.deleted", note_ids=tuple(range(1_000_000, 1_001_500)),
+                        related_ids=tuple(range(2_000_000, 2_000_300)))
+    assert_parts_cover(event, event.encode())
+
+
+async def test_bulk_links_event_reaches_listeners_in_parts(client, notifications):
+    response = await client.post("/notes/bulk", json=[{"title": f"n{i}"} for i in range(301)])
+    ids = [item["id"] for item in response.json()["results"]]
+    await next_event(notifications)
+
+    response = await client.post("/links/bulk", json=[
+        {"parent_id": parent_id, "child_id": child_id} for parent_id, child_id in zip(ids, ids[1:])])
+    assert response.json()["created"] == 300
+    links = []
+    while len(links) < 300:
+        event = await next_event(notifications)
+        assert event.type == "link.created"
+        assert {note_id for _, parent_id, child_id in event.links
+                for note_id in (parent_id, child_id)} <= set(event.related_ids)
+        links.extend(event.links)
+    assert sorted(child_id for _, _, child_id in links) == ids[1:]
@@ -0,0 +1,36 @@
+import gzip
+import json
+
+from app.db.session import engine
+from tests.conftest import create_link, create_note
+
+
+def parse_ndjson(body: bytes) -> list:
+    return [json.loads(line) for line in body.splitlines()]
+
+
+async def test_export_streams_notes_then_links(client):
+    parent_id = await create_note(client, "parent")
+    child_id = await create_note(client, "child", content="text")
+    link_id = await create_link(client, parent_id, child_id)
+
+    response = await client.get("/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = parse_ndjson(response.content)
+    assert [(row["type"], row["id"]) for row in rows] == [
+        ("note", parent_id), ("note", child_id), ("link", link_id)]
+    assert rows[1]["content"] == "text"
+    assert rows[2] == {"type": "link", "id": link_id, "parent_id": parent_id, "child_id": child_id}
+    # Сессия выгрузки закрыта вместе с генератором тела
+    assert engine.pool.checkedout() == 0
+
+
+async def test_export_gzip(client):
+    note_id = await create_note(client, "note")
+    response = await client.get("/export", params={"compression": "gzip"})
+    assert response.headers["content-type"] == "application/gzip"
+    assert parse_ndjson(gzip.decompress(response.content)) == parse_ndjson(
+        (await client.get("/export")).content)
+    assert parse_ndjson(gzip.decompress(response.content))[0]["id"] == note_id
+    assert engine.pool.checkedout() == 0
@@ -0,0 +1,63 @@
+from app.services.graph_snapshot import GraphSnapshot, get_graph_snapshot_cache
+from tests.conftest import create_link, create_note
+
+
+async def build_graph(client) -> dict:
+    """a -> b -> d, a -> c -> d, e (без связей)."""
+    ids = {name: await create_note(client, name) for name in "abcde"}
+    for parent, child in ("ab", "ac", "bd", "cd"):
+        await create_link(client, ids[parent], ids[child])
+    return ids
+
+
+def titles(response) -> list:
+    return [row["title"] for row in response.json()]
+
+
+async def test_stats(client):
+    await build_graph(client)
+    stats = (await client.get("/graph/stats")).json()
+    assert {key: stats[key] for key in ("notes", "links", "roots", "leaves", "isolated", "acyclic", "max_depth")} == {
+        "notes": 5, "links": 4, "roots": 2, "leaves": 2, "isolated": 1, "acyclic": True, "max_depth": 2}
+    assert stats["depth_distribution"] == [2, 2, 1]
+
+
+async def test_roots_and_leaves_pages(client):
+    await build_graph(client)
+    response = await client.get("/graph/roots", params={"limit": 1})
+    assert titles(response) == ["a"]
+    response = await client.get("/graph/roots", params={"limit": 1, "after": response.headers["x-next-cursor"]})
+    assert titles(response) == ["e"]
+    assert titles(await client.get("/graph/leaves")) == ["d", "e"]
+
+    response = await client.get("/graph/roots", params={"after": "garbage"})
+    assert response.status_code == 400
+
+
+async def test_topo_cursor_survives_rebuild_of_same_graph(client):
+    await build_graph(client)
+    first = await client.get("/graph/topo-order", params={"limit": 2})
+    assert titles(first) == ["a", "e"]
+    cursor = first.headers["x-next-cursor"]
+
+    # Перестроение (TTL, другой процесс) того же графа даёт ту же версию
+    get_graph_snapshot_cache().invalidate()
+    response = await client.get("/graph/topo-order", params={"limit": 2, "after": cursor})
+    assert response.status_code == 200
+    assert titles(response) == ["b", "c"]
+
+
+async def test_topo_cursor_rejected_after_graph_change(client):
+    ids = await build_graph(client)
+    cursor = (await client.get("/graph/topo-order", params={"limit": 2})).headers["x-next-cursor"]
+
+    await create_link(client, ids["e"], ids["a"])
+    response = await client.get("/graph/topo-order", params={"limit": 2, "after": cursor})
+    assert response.status_code == 409
+
+
+def test_snapshot_version_depends_on_content():
+    graph = ([1, 2, 3], [1, 1], [2, 3])
+    assert GraphSnapshot(*graph).version == GraphSnapshot(*graph).version
+    assert GraphSnapshot([1, 2, 3], [1], [2]).version != GraphSnapshot(*graph).version
+    assert GraphSnapshot([1, 2, 4], [1, 1], [2, 4]).version != GraphSnapshot(*graph).version
@@ -0,0 +1,196 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select, text, update
+
+from app.core.config import SETTINGS
+from app.db.session import SessionLocal, engine
+from app.models.job import Job
+from app.services import job_runner as job_runner_module
+from app.services.job_runner import EXHAUSTED_ERROR, JOB_LOCK_CLASS, JobRunner
+from app.services.note_service import NoteService
+from tests.conftest import closure_rows, create_link, create_note, rebuilt_closure_rows
+
+
+@pytest.fixture
+def runner() -> JobRunner:
+    return JobRunner(concurrency=0, poll_interval=0.1, batch_size=2, max_attempts=2, retry_backoff=30)
+
+
+@pytest.fixture
+def calls(monkeypatch) -> list:
+    """Задачи kind="probe": выполнение записывается, params.fail — упасть с ошибкой."""
+    calls = []
+
+    async def probe(ctx):
+        calls.append(ctx.job_id)
+        if ctx.params.get("fail"):
+            raise RuntimeError("probe failed")
+        return {"ok": True}
+    monkeypatch.setitem(job_runner_module.JOB_HANDLERS, "probe", probe)
+    return calls
+
+
+async def add_job(**values) -> int:
+    async with SessionLocal() as session:
+        job = Job(kind="probe", **{"params": {}, **values})
+        session.add(job)
+        await session.commit()
+        return job.id
+
+
+async def get_job(job_id: int) -> Job:
+    async with SessionLocal() as session:
+        return await session.get(Job, job_id)
+
+
+async def test_claims_jobs_in_order(runner, calls):
+    first = await add_job()
+    second = await add_job()
+    assert await runner.run_next() is True
+    assert await runner.run_next() is True
+    assert await runner.run_next() is False
+    assert calls == [first, second]
+    job = await get_job(first)
+    assert (job.status, job.attempts, job.result) == ("succeeded", 1, {"ok": True})
+
+
+async def test_skips_job_locked_by_another_worker(runner, calls):
+    locked = await add_job()
+    free = await add_job()
+    async with engine.connect() as other:
+        await other.execute(select(func.pg_advisory_lock(JOB_LOCK_CLASS, locked)))
+        assert await runner.run_next() is True
+        assert calls == [free]
+        await other.execute(select(func.pg_advisory_unlock(JOB_LOCK_CLASS, locked)))
+        await other.commit()
+    assert await runner.run_next() is True
+    assert calls == [free, locked]
+
+
+async def test_failed_job_is_retried_after_backoff(runner, calls):
+    job_id = await add_job(params={"fail": True})
+    assert await runner.run_next() is True
+    job = await get_job(job_id)
+    assert (job.status, job.attempts, job.error) == ("pending", 1, "probe failed")
+    delay = job.run_after - datetime.now(timezone.utc)
+    assert timedelta(seconds=25) < delay <= timedelta(seconds=30)
+
+    # До истечения паузы задача не захватывается
+    assert await runner.run_next() is False
+
+    async with SessionLocal() as session:
+        await session.execute(update(Job).where(Job.id == job_id).values(run_after=func.now()))
+        await session.commit()
+    assert await runner.run_next() is True
+    job = await get_job(job_id)
+    assert (job.status, job.attempts, job.run_after) == ("failed", 2, None)
+    assert job.finished_at is not None
+    assert calls == [job_id, job_id]
+
+
+async def test_backoff_doubles_with_attempts(runner, calls):
+    job_id = await add_job(params={"fail": True}, attempts=1)
+    runner.max_attempts = 3
+    await runner.run_next()
+    job = await get_job(job_id)
+    assert job.attempts == 2
+    assert timedelta(seconds=55) < job.run_after - datetime.now(timezone.utc) <= timedelta(seconds=60)
+
+
+async def test_exhausted_job_is_not_started_again(runner, calls):
+    # Процесс упал во время последней попытки: running без блокировки
+    job_id = await add_job(status="running", attempts=2)
+    assert await runner.run_next() is False
+    assert calls == []
+    job = await get_job(job_id)
+    assert (job.status, job.attempts, job.error) == ("failed", 2, EXHAUSTED_ERROR)
+
+
+async def test_crashed_job_is_resumed(runner, calls):
+    job_id = await add_job(status="running", attempts=1)
+    assert await runner.run_next() is True
+    job = await get_job(job_id)
+    assert (job.status, job.attempts) == ("succeeded", 2)
+
+
+async def test_bulk_import_keeps_payload_out_of_params(client, runner):
+    response = await client.post("/jobs", json={"kind": "bulk_import", "params": {
+        "notes": [{"title": "a"}, {"title": "b"}, {"title": "c"}],
+        "links": [{"parent_id": 1, "child_id": 2}, {"parent_id": 2, "child_id": 3}],
+    }})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    async with SessionLocal() as session:
+        params, payload = (await session.execute(
+            select(Job.params, Job.payload).where(Job.id == job_id))).one()
+    assert params == {"notes": 3, "links": 2}
+    assert len(payload["notes"]) == 3
+
+    assert await runner.run_next() is True
+    job = (await client.get(f"/jobs/{job_id}")).json()
+    assert job["status"] == "succeeded"
+    assert job["result"]["notes_created"] == 3 and job["result"]["links_created"] == 2
+    assert job["progress_done"] == job["progress_total"] == 5
+
+
+async def test_bulk_import_resumes_links_after_crash(client, runner, monkeypatch):
+    notes = [await create_note(client, f"n{i}") for i in range(4)]
+    response = await client.post("/jobs", json={"kind": "bulk_import", "params": {"links": [
+        {"parent_id": notes[0], "child_id": notes[1]},
+        {"parent_id": notes[1], "child_id": notes[2]},
+        {"parent_id": notes[2], "child_id": notes[3]},
+    ]}})
+    job_id = response.json()["id"]
+
+    # Процесс «падает» сразу после commit первого пакета связей
+    bulk_create_links = NoteService.bulk_create_links
+
+    async def crash_after_commit(self, links, **kwargs):
+        await bulk_create_links(self, links, **kwargs)
+        monkeypatch.setattr(NoteService, "bulk_create_links", bulk_create_links)
+        raise RuntimeError("crash")
+    monkeypatch.setattr(NoteService, "bulk_create_links", crash_after_commit)
+
+    assert await runner.run_next() is True
+    job = await get_job(job_id)
+    assert (job.status, job.state["links_done"], job.state["links_created"]) == ("pending", 2, 2)
+
+    async with SessionLocal() as session:
+        await session.execute(update(Job).where(Job.id == job_id).values(run_after=func.now()))
+        await session.commit()
+    assert await runner.run_next() is True
+    job = (await client.get(f"/jobs/{job_id}")).json()
+    assert job["status"] == "succeeded"
+    assert job["result"]["links_created"] == 3
+    assert job["result"]["links_failed"] == 0 and job["result"]["errors"] == []
+
+
+async def test_delete_notes_rederives_closure(client, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "note_closure_enabled", True)
+    ids = {name: await create_note(client, name) for name in "abcdefg"}
+    for parent, child in ("ab", "bc", "cd", "de", "ac", "cf", "fe", "dg", "bg"):
+        await create_link(client, ids[parent], ids[child])
+
+    # Набор не замкнут по потомкам: c — потомок b и предок d
+    async with SessionLocal() as session:
+        assert await NoteService(session).delete_notes([ids["b"], ids["d"]]) == 2
+    after_delete = await closure_rows()
+    assert (ids["a"], ids["g"], 3) not in after_delete
+    assert after_delete == await rebuilt_closure_rows()
+
+
+async def test_delete_subtree_job_with_closure(client, runner, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "note_closure_enabled", True)
+    ids = {name: await create_note(client, name) for name in "abcdef"}
+    for parent, child in ("ab", "bc", "cd", "be", "ae", "ef"):
+        await create_link(client, ids[parent], ids[child])
+
+    response = await client.post("/jobs", json={
+        "kind": "delete_subtree", "params": {"note_id": ids["b"], "descendants": True}})
+    assert await runner.run_next() is True
+    job = (await client.get(f"/jobs/{response.json()['id']}")).json()
+    assert job["result"] == {"notes_deleted": 5}
+    assert await closure_rows() == await rebuilt_closure_rows() == []
+    async with engine.connect() as connection:
+        assert (await connection.execute(text("SELECT array_agg(title) FROM note"))).scalar() == ["a"]
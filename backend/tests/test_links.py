@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.config import SETTINGS
+from app.db.session import SessionLocal, engine
+from app.schemas.note import NoteLinkCreate
+from app.services.note_service import LINK_GRAPH_LOCK_KEY, NoteService
+from tests.conftest import create_link, create_note
+
+
+@pytest.fixture(params=[False, True], ids=["cte", "closure"])
+def closure_enabled(request, monkeypatch) -> bool:
+    monkeypatch.setattr(SETTINGS, "note_closure_enabled", request.param)
+    return request.param
+
+
+async def chain(client, count: int) -> list:
+    """n0 -> n1 -> ... -> n{count-1}."""
+    ids = [await create_note(client, f"n{i}") for i in range(count)]
+    for parent_id, child_id in zip(ids, ids[1:]):
+        await create_link(client, parent_id, child_id)
+    return ids
+
+
+async def post_link(client, parent_id: int, child_id: int):
+    return await client.post("/links/", json={"parent_id": parent_id, "child_id": child_id})
+
+
+async def test_rejects_direct_cycle(client, closure_enabled):
+    a, b = await chain(client, 2)
+    assert (await post_link(client, b, a)).status_code == 400
+    assert (await post_link(client, a, a)).status_code == 400
+
+
+async def test_rejects_indirect_cycle(client, closure_enabled):
+    a, b, c, d = await chain(client, 4)
+    assert (await post_link(client, d, a)).status_code == 400
+    assert (await post_link(client, c, b)).status_code == 400
+    # Обход в другую сторону цикла не образует
+    assert (await post_link(client, a, d)).status_code == 201
+
+
+async def test_bulk_rejects_cycle_closed_within_batch(client, closure_enabled):
+    a, b, c = [await create_note(client, name) for name in "abc"]
+    response = await client.post("/links/bulk", json=[
+        {"parent_id": a, "child_id": b},
+        {"parent_id": b, "child_id": c},
+        {"parent_id": c, "child_id": a},
+        {"parent_id": a, "child_id": c},
+    ])
+    body = response.json()
+    assert (body["created"], body["failed"]) == (3, 1)
+    assert [item["error"] for item in body["results"]] == [None, None, "Связь образует цикл", None]
+    descendants = (await client.get(f"/notes/{a}/descendants")).json()
+    assert {note["id"] for note in descendants} == {b, c}
+
+
+async def test_bulk_rejects_cycle_through_existing_links(client, closure_enabled):
+    a, b, c = await chain(client, 3)
+    d = await create_note(client, "d")
+    response = await client.post("/links/bulk", json=[
+        {"parent_id": c, "child_id": d},
+        {"parent_id": d, "child_id": a},
+    ])
+    assert [item["error"] for item in response.json()["results"]] == [None, "Связь образует цикл"]
+
+
+async def test_concurrent_links_cannot_close_cycle(client, closure_enabled, monkeypatch):
+    a, b = [await create_note(client, name) for name in "ab"]
+    checked = []
+    check_circular_reference = NoteService.check_circular_reference
+
+    async def check_then_wait(self, parent_id, child_id):
+        # Проверившая цикл транзакция ждёт, пока проверку выполнит и другая
+        found = await check_circular_reference(self, parent_id, child_id)
+        checked.append(parent_id)
+        for _ in range(30):
+            if len(checked) == 2:
+                break
+            await asyncio.sleep(0.01)
+        return found
+    monkeypatch.setattr(NoteService, "check_circular_reference", check_then_wait)
+
+    async def link(parent_id: int, child_id: int):
+        async with SessionLocal() as session:
+            return await NoteService(session).create_link(NoteLinkCreate(parent_id=parent_id, child_id=child_id))
+
+    # Без общей блокировки обе проверки видели бы граф без связей и обе связи были бы вставлены
+    created = await asyncio.gather(link(a, b), link(b, a))
+    assert sum(link is not None for link in created) == 1
+    links = (await client.get(f"/links/by-note/{a}")).json()
+    assert len(links) == 1
+
+
+async def wait_blocked(task: asyncio.Task) -> bool:
+    """Ждёт ли задача чужую блокировку (не завершается за разумное время)."""
+    done, _ = await asyncio.wait({task}, timeout=0.3)
+    return not done
+
+
+@pytest.mark.parametrize("path", ["link", "note"])
+async def test_delete_takes_graph_lock_only_with_closure(client, closure_enabled, path):
+    a, b = await chain(client, 2)
+    link_id = (await client.get(f"/links/by-note/{a}")).json()[0]["id"]
+    url = f"/links/{link_id}" if path == "link" else f"/notes/{b}"
+
+    async with engine.connect() as other:
+        await other.execute(select(func.pg_advisory_lock(LINK_GRAPH_LOCK_KEY)))
+        task = asyncio.create_task(client.delete(url))
+        try:
+            # Пересчёт note_closure ждёт блокировку графа, простое удаление — нет
+            assert await wait_blocked(task) is closure_enabled
+        finally:
+            await other.execute(select(func.pg_advisory_unlock(LINK_GRAPH_LOCK_KEY)))
+            await other.commit()
+        response = await task
+    assert response.status_code == 200
+    assert (await client.get(f"/notes/{a}/descendants")).json() == []
@@ -0,0 +1,97 @@
+import asyncio
+
+from app.db.session import SessionLocal
+from app.db.statements import record_statements
+from app.services.loader import BatchLoader, NoteLoaders
+from tests.conftest import create_link, create_note
+
+
+class Source:
+    """batch_fn, записывающий каждый пакет ключей; fail — упасть на следующем пакете."""
+
+    def __init__(self, values: dict):
+        self.values = values
+        self.batches = []
+        self.fail = False
+
+    async def __call__(self, keys):
+        self.batches.append(list(keys))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("batch failed")
+        return {key: self.values[key] for key in keys if key in self.values}
+
+
+async def test_concurrent_loads_share_one_batch():
+    source = Source({1: "a", 2: "b", 3: "c"})
+    loader = BatchLoader(source)
+    results = await asyncio.gather(*(loader.load(key) for key in [2, 1, 2, 9, 3, 1, 2]))
+    assert results == ["b", "a", "b", None, "c", "a", "b"]
+    # Один вызов, каждый ключ один раз, в порядке первого запроса
+    assert source.batches == [[2, 1, 9, 3]]
+
+
+async def test_loaded_keys_are_memoized_until_clear():
+    source = Source({1: "a", 2: "b"})
+    loader = BatchLoader(source, default=list)
+    assert await loader.load_many([1, 5]) == ["a", []]
+    assert await loader.load_many([1, 2, 5]) == ["a", "b", []]
+    assert source.batches == [[1, 5], [2]]
+    loader.clear()
+    assert await loader.load(1) == "a"
+    assert source.batches[-1] == [1]
+
+
+async def test_loads_in_later_iterations_form_new_batches():
+    source = Source({key: key * 10 for key in range(6)})
+    loader = BatchLoader(source)
+
+    async def load_after(delay_steps: int, keys):
+        for _ in range(delay_steps):
+            await asyncio.sleep(0)
+        return await loader.load_many(keys)
+
+    # Пакет отправляется после текущего прохода цикла: поздние ключи уходят следующим запросом
+    results = await asyncio.gather(load_after(0, [0, 1]), load_after(0, [1, 2]), load_after(5, [2, 3, 4]))
+    assert results == [[0, 10], [10, 20], [20, 30, 40]]
+    assert source.batches == [[0, 1, 2], [3, 4]]
+
+
+async def test_batch_error_reaches_every_waiter_and_is_not_memoized():
+    source = Source({1: "a", 2: "b"})
+    loader = BatchLoader(source)
+    source.fail = True
+    results = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), return_exceptions=True)
+    assert len(source.batches) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    # Ошибка не запоминается: следующая загрузка повторяет запрос
+    source.fail = False
+    assert await loader.load_many([1, 2]) == ["a", "b"]
+    assert source.batches == [[1, 2], [1, 2]]
+
+
+async def test_note_loaders_issue_one_query_per_batch(client):
+    a = await create_note(client, "a")
+    b = await create_note(client, "b")
+    link_id = await create_link(client, a, b)
+
+    async with SessionLocal() as session:
+        loaders = NoteLoaders(session)
+        with record_statements() as recorder:
+            notes = await asyncio.gather(*(loaders.notes.load(note_id) for note_id in [a, b, a, 404]))
+            by_note = await asyncio.gather(loaders.links_by_note.load(a), loaders.links_by_note.load(b),
+                                           loaders.links_by_note.load(404))
+            # Связи из links_by_note уже известны загрузчику связей
+            link = await loaders.links.load(link_id)
+        assert recorder.count == 2
+        assert [note.title if note else None for note in notes] == ["a", "b", "a", None]
+        assert [[item.id for item in links] for links in by_note] == [[link_id], [link_id], []]
+        assert link is by_note[0][0]
+
+        # После commit запомненные значения сбрасываются
+        await session.commit()
+        with record_statements() as recorder:
+            await loaders.notes.load(a)
+        assert recorder.count == 1
+
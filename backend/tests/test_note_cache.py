@@ -0,0 +1,44 @@
+from app.services.cache import full_key, get_note_cache
+from tests.conftest import create_link, create_note
+
+
+async def test_update_invalidates_neighbours_full_payload(client):
+    parent_id = await create_note(client, "parent")
+    child_id = await create_note(client, "child")
+    await create_link(client, parent_id, child_id)
+    cache = get_note_cache()
+
+    response = await client.get(f"/notes/{child_id}/full")
+    assert response.json()["parents"][0]["title"] == "parent"
+    assert cache.get(full_key(child_id)) is not None
+
+    response = await client.put(f"/notes/{parent_id}", json={"title": "renamed"})
+    assert response.status_code == 200
+    assert cache.get(full_key(child_id)) is None
+
+    response = await client.get(f"/notes/{child_id}/full")
+    assert response.json()["parents"][0]["title"] == "renamed"
+
+
+async def test_content_update_keeps_neighbours_cached(client):
+    # content не входит в /full соседей, их записи кэша остаются
+    parent_id = await create_note(client, "parent")
+    child_id = await create_note(client, "child")
+    await create_link(client, parent_id, child_id)
+    await client.get(f"/notes/{child_id}/full")
+
+    await client.put(f"/notes/{parent_id}", json={"content": "new content"})
+    assert get_note_cache().get(full_key(child_id)) is not None
+
+
+async def test_delete_invalidates_neighbours_full_payload(client):
+    parent_id = await create_note(client, "parent")
+    child_id = await create_note(client, "child")
+    await create_link(client, parent_id, child_id)
+    await client.get(f"/notes/{child_id}/full")
+
+    response = await client.delete(f"/notes/{parent_id}")
+    assert response.status_code == 200
+    assert get_note_cache().get(full_key(child_id)) is None
+    response = await client.get(f"/notes/{child_id}/full")
+    assert response.json()["parents"] == []
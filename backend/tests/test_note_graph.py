@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import text
+
+from app.core.config import SETTINGS
+from app.db.session import engine
+from tests.conftest import create_link, create_note
+
+
+async def build(client, links: str) -> dict:
+    """Заметки по буквам и связи из пар букв: "ab bc" — a -> b -> c."""
+    pairs = links.split()
+    ids = {name: await create_note(client, name) for name in sorted({name for pair in pairs for name in pair})}
+    for parent, child in pairs:
+        await create_link(client, ids[parent], ids[child])
+    return ids
+
+
+async def get_graph(client, note_id: int, **params) -> dict:
+    response = await client.get(f"/notes/{note_id}/graph", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def names(graph: dict) -> list:
+    return [node["title"] for node in graph["nodes"]]
+
+
+def edge_names(graph: dict) -> list:
+    titles = {node["id"]: node["title"] for node in graph["nodes"]}
+    return [titles[parent_id] + titles[child_id] for parent_id, child_id in graph["edges"]]
+
+
+async def test_neighbourhood_by_direction(client):
+    ids = await build(client, "ab ac bd cd de")
+    graph = await get_graph(client, ids["d"], depth=1)
+    assert graph["root_id"] == ids["d"] and names(graph) == ["d", "b", "c", "e"]
+    assert edge_names(graph) == ["bd", "cd", "de"]
+    assert graph["truncated"] is False
+
+    assert names(await get_graph(client, ids["d"], depth=5, direction="up")) == ["d", "b", "c", "a"]
+    assert names(await get_graph(client, ids["b"], depth=5, direction="down")) == ["b", "d", "e"]
+    # Узлы по удалённости, а ромб не даёт повторов
+    graph = await get_graph(client, ids["a"], depth=5, direction="down")
+    assert names(graph) == ["a", "b", "c", "d", "e"]
+    assert edge_names(graph) == ["ab", "ac", "bd", "cd", "de"]
+
+
+async def test_depth_limits_neighbourhood(client):
+    ids = await build(client, "ab bc cd de")
+    graph = await get_graph(client, ids["a"], depth=2)
+    assert names(graph) == ["a", "b", "c"] and edge_names(graph) == ["ab", "bc"]
+    # Ограничение глубины — не усечение по max_nodes
+    assert graph["truncated"] is False
+
+
+async def test_max_nodes_keeps_nearest_nodes_deterministically(client):
+    ids = await build(client, "ab ac ad ae bf bg bh")
+    graph = await get_graph(client, ids["a"], depth=3, direction="down", max_nodes=3)
+    assert names(graph) == ["a", "b", "c"] and edge_names(graph) == ["ab", "ac"]
+    assert graph["truncated"] is True
+    assert await get_graph(client, ids["a"], depth=3, direction="down", max_nodes=3) == graph
+
+    graph = await get_graph(client, ids["a"], depth=3, direction="down", max_nodes=6)
+    assert names(graph) == ["a", "b", "c", "d", "e", "f"] and graph["truncated"] is True
+    # Окрестность ровно из max_nodes узлов не усечена
+    graph = await get_graph(client, ids["a"], depth=3, direction="down", max_nodes=8)
+    assert len(graph["nodes"]) == 8 and graph["truncated"] is False
+
+
+async def test_cycle_does_not_repeat_nodes(client):
+    ids = await build(client, "ab bc")
+    # Цикл вставлен в обход проверки create_link
+    async with engine.begin() as connection:
+        await connection.execute(text("INSERT INTO notelink (parent_id, child_id) VALUES (:c, :a)"),
+                                 {"c": ids["c"], "a": ids["a"]})
+    graph = await get_graph(client, ids["a"], depth=10, direction="both")
+    assert names(graph) == ["a", "b", "c"]
+    assert edge_names(graph) == ["ab", "bc", "ca"]
+
+
+async def test_missing_note_and_invalid_limits(client):
+    ids = await build(client, "ab")
+    assert (await client.get("/notes/999999/graph")).status_code == 404
+    for params in ({"depth": 0}, {"depth": 51}, {"max_nodes": 0},
+                   {"max_nodes": SETTINGS.graph_max_nodes + 1}, {"direction": "sideways"}):
+        response = await client.get(f"/notes/{ids['a']}/graph", params=params)
+        assert response.status_code == 422, params
+
+
+@pytest.mark.parametrize("max_nodes", [1, 2])
+async def test_single_node_limit(client, max_nodes):
+    ids = await build(client, "ab ac")
+    graph = await get_graph(client, ids["a"], max_nodes=max_nodes)
+    assert names(graph) == ["a", "b"][:max_nodes] and graph["truncated"] is True
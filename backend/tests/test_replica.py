@@ -0,0 +1,73 @@
+import httpx
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.requests import Request
+
+from app.db import replica
+from app.db.session import replica_engine
+from app.services.cache import get_note_cache
+from app.services.note_service import NoteService
+from tests.conftest import REPLICA_POSTGRES_DB, create_note
+
+
+@pytest.fixture
+async def healthy_replica(monkeypatch):
+    """Реплика доступна; в ней одна заметка, которой нет в основной базе."""
+    monkeypatch.setattr(replica.replica_monitor, "healthy", True)
+    async with replica_engine.begin() as connection:
+        await connection.execute(text("TRUNCATE note, sync_tombstone, job RESTART IDENTITY CASCADE"))
+        await connection.execute(text("INSERT INTO note (title) VALUES ('from replica')"))
+    yield
+
+
+async def test_reads_go_to_replica_until_client_writes(client, healthy_replica):
+    note_id = await create_note(client, "from primary")
+    get_note_cache().clear()
+    # После записи клиент читает из основной базы (cookie PRIMARY_COOKIE)
+    response = await client.get(f"/notes/{note_id}")
+    assert response.json()["title"] == "from primary"
+
+    client.cookies.clear()
+    get_note_cache().clear()
+    response = await client.get(f"/notes/{note_id}")
+    assert response.json()["title"] == "from replica"
+
+
+async def test_unavailable_replica_falls_back_to_primary(client, healthy_replica, monkeypatch):
+    note_id = await create_note(client, "from primary")
+    client.cookies.clear()
+    get_note_cache().clear()
+
+    missing = create_async_engine(replica_engine.url.set(database=f"{REPLICA_POSTGRES_DB}_missing"))
+    monkeypatch.setattr(replica, "replica_engine", missing)
+    try:
+        response = await client.get(f"/notes/{note_id}")
+    finally:
+        await missing.dispose()
+    assert response.json()["title"] == "from primary"
+    assert replica.replica_monitor.healthy is False
+
+
+async def test_snapshot_options_apply_on_replica(healthy_replica):
+    request = Request({"type": "http", "headers": []})
+    async with replica.read_session(request) as db:
+        await NoteService(db)._begin_snapshot()
+        row = (await db.execute(text(
+            "SELECT current_database(), current_setting('transaction_isolation'), "
+            "current_setting('transaction_read_only')"))).one()
+    assert tuple(row) == (REPLICA_POSTGRES_DB, "repeatable read", "on")
+
+
+async def test_export_and_sync_read_replica_snapshot(client: httpx.AsyncClient, healthy_replica):
+    await create_note(client, "from primary")
+    client.cookies.clear()
+
+    response = await client.get("/export")
+    assert response.status_code == 200
+    assert [line for line in response.text.splitlines() if "from replica" in line]
+    assert "from primary" not in response.text
+
+    response = await client.get("/sync")
+    assert response.status_code == 200
+    assert [note["title"] for note in response.json()["notes"]] == ["from replica"]
@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import text
+
+from app.db.session import engine
+from tests.conftest import create_note
+
+
+@pytest.fixture
+async def trigram() -> None:
+    """Автодополнение по похожести требует pg_trgm (его ставит миграция полнотекстового поиска)."""
+    async with engine.connect() as connection:
+        installed = (await connection.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))).scalar()
+    if not installed:
+        pytest.skip("pg_trgm недоступен на этом сервере PostgreSQL")
+
+
+def titles(response) -> list:
+    assert response.status_code == 200, response.text
+    return [hit["title"] for hit in response.json()]
+
+
+async def test_title_match_ranks_above_content_match(client):
+    await create_note(client, "Recipes", content="apple pie")
+    await create_note(client, "Pie", content="dough")
+    await create_note(client, "Pie pie", content="pie")
+    await create_note(client, "Shopping", content="milk")
+    assert titles(await client.get("/notes/search", params={"q": "pie"})) == ["Pie pie", "Pie", "Recipes"]
+
+
+async def test_search_query_syntax(client):
+    await create_note(client, "red apple")
+    await create_note(client, "green apple")
+    await create_note(client, "red pepper")
+    assert titles(await client.get("/notes/search", params={"q": "apple -green"})) == ["red apple"]
+    assert set(titles(await client.get("/notes/search", params={"q": "apple or pepper"}))) == {
+        "red apple", "green apple", "red pepper"}
+    assert titles(await client.get("/notes/search", params={"q": '"apple red"'})) == []
+
+
+async def test_search_pages_through_equal_ranks(client):
+    for i in range(5):
+        await create_note(client, f"note {i}")
+    seen = []
+    params = {"q": "note", "limit": 2}
+    while True:
+        response = await client.get("/notes/search", params=params)
+        seen.extend(titles(response))
+        if "x-next-cursor" not in response.headers:
+            break
+        params["after"] = response.headers["x-next-cursor"]
+    assert seen == [f"note {i}" for i in range(5)]
+
+    response = await client.get("/notes/search", params={"q": "other", "after": params["after"]})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("query", [" ", "-", "&|!", "a"])
+async def test_blank_or_short_query_finds_nothing(client, query):
+    await create_note(client, "alpha", content="beta")
+    assert titles(await client.get("/notes/search", params={"q": query})) == []
+
+
+async def test_empty_query_is_rejected(client):
+    assert (await client.get("/notes/search", params={"q": ""})).status_code == 422
+    assert (await client.get("/notes/search")).status_code == 422
+    assert (await client.get("/notes/autocomplete", params={"q": ""})).status_code == 422
+
+
+async def test_autocomplete_prefers_prefix_then_similar_titles(client, trigram):
+    await create_note(client, "Projection")
+    await create_note(client, "Project plan")
+    await create_note(client, "Prjoect plan")
+    await create_note(client, "Shopping")
+    assert set(titles(await client.get("/notes/autocomplete", params={"q": "proj"}))) == {
+        "Project plan", "Projection"}
+    # Опечатка: совпадения по префиксу нет, находятся похожие заголовки по убыванию похожести
+    assert titles(await client.get("/notes/autocomplete", params={"q": "projcet plan"})) == [
+        "Project plan", "Prjoect plan"]
+
+
+async def test_autocomplete_short_prefix_and_wildcards(client, trigram):
+    await create_note(client, "a_b")
+    await create_note(client, "axb")
+    await create_note(client, "b")
+    assert titles(await client.get("/notes/autocomplete", params={"q": "a"})) == ["a_b", "axb"]
+    # _ и % в запросе — обычные символы, а не шаблоны LIKE
+    assert titles(await client.get("/notes/autocomplete", params={"q": "a_"})) == ["a_b"]
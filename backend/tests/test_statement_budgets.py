@@ -0,0 +1,47 @@
+import pytest
+
+from app.core.config import SETTINGS
+from app.db.statements import STATEMENT_BUDGETS, assert_max_statements
+from app.services.cache import get_note_cache
+from tests.conftest import create_link, create_note
+
+# Запрос к каждому эндпоинту из STATEMENT_BUDGETS над графом grandparent -> parent -> child
+REQUESTS = {
+    "POST /notes/": lambda ids: ("POST", "/notes/", {"title": "new"}),
+    "POST /notes/bulk": lambda ids: ("POST", "/notes/bulk", [{"title": "a"}, {"title": "b"}]),
+    "GET /notes/": lambda ids: ("GET", "/notes/", None),
+    "GET /notes/{note_id}": lambda ids: ("GET", f"/notes/{ids['parent']}", None),
+    "GET /notes/{note_id}/full": lambda ids: ("GET", f"/notes/{ids['parent']}/full", None),
+    "GET /notes/{note_id}/ancestors": lambda ids: ("GET", f"/notes/{ids['child']}/ancestors", None),
+    "GET /notes/{note_id}/descendants": lambda ids: ("GET", f"/notes/{ids['grandparent']}/descendants", None),
+    "GET /notes/{note_id}/graph": lambda ids: ("GET", f"/notes/{ids['parent']}/graph", None),
+    "POST /notes/batch": lambda ids: ("POST", "/notes/batch", {"ids": list(ids.values())}),
+    "PUT /notes/{note_id}": lambda ids: ("PUT", f"/notes/{ids['parent']}", {"title": "renamed"}),
+    "DELETE /notes/{note_id}": lambda ids: ("DELETE", f"/notes/{ids['parent']}", None),
+    "POST /links/": lambda ids: ("POST", "/links/", {"parent_id": ids["grandparent"], "child_id": ids["child"]}),
+    "POST /links/bulk": lambda ids: ("POST", "/links/bulk", [
+        {"parent_id": ids["grandparent"], "child_id": ids["child"]}, {"parent_id": ids["child"], "child_id": ids["parent"]}]),
+    "GET /links/{link_id}": lambda ids: ("GET", f"/links/{ids['link']}", None),
+    "GET /links/by-note/{note_id}": lambda ids: ("GET", f"/links/by-note/{ids['parent']}", None),
+    "DELETE /links/{link_id}": lambda ids: ("DELETE", f"/links/{ids['link']}", None),
+}
+
+
+def test_every_budget_has_a_request():
+    assert REQUESTS.keys() == STATEMENT_BUDGETS.keys()
+
+
+@pytest.mark.parametrize("endpoint", list(STATEMENT_BUDGETS))
+async def test_endpoint_within_statement_budget(client, monkeypatch, endpoint):
+    monkeypatch.setattr(SETTINGS, "note_closure_enabled", False)
+    monkeypatch.setattr(SETTINGS, "events_enabled", False)
+    ids = {name: await create_note(client, name) for name in ("grandparent", "parent", "child")}
+    ids["link"] = await create_link(client, ids["grandparent"], ids["parent"])
+    await create_link(client, ids["parent"], ids["child"])
+    # Бюджет считается для холодного кэша: попадание в кэш только уменьшает число запросов
+    get_note_cache().clear()
+
+    method, url, body = REQUESTS[endpoint](ids)
+    with assert_max_statements(STATEMENT_BUDGETS[endpoint], endpoint):
+        response = await client.request(method, url, json=body)
+    assert response.status_code < 300, response.text
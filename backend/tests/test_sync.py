@@ -0,0 +1,111 @@
+from sqlalchemy import text
+
+from app.db.session import engine
+from tests.conftest import create_link, create_note
+
+
+async def sync(client, since=None, **params) -> dict:
+    if since is not None:
+        params["since"] = since
+    response = await client.get("/sync", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def sync_all(client, since=None, limit=1000) -> tuple:
+    """Все страницы от since; возвращает страницы и последний токен."""
+    pages = []
+    while True:
+        page = await sync(client, since, limit=limit)
+        pages.append(page)
+        since = page["next_token"]
+        if not page["has_more"]:
+            return pages, since
+
+
+async def test_initial_sync_and_up_to_date(client):
+    parent_id = await create_note(client, "parent")
+    child_id = await create_note(client, "child")
+    link_id = await create_link(client, parent_id, child_id)
+
+    page = await sync(client)
+    assert [note["id"] for note in page["notes"]] == [parent_id, child_id]
+    assert [link["id"] for link in page["links"]] == [link_id]
+    assert page["has_more"] is False
+
+    # Изменений после токена нет: пустая страница, токен не откатывается назад
+    again = await sync(client, page["next_token"])
+    assert again == {"notes": [], "links": [], "deleted_link_ids": [], "deleted_note_ids": [],
+                     "next_token": again["next_token"], "has_more": False}
+    assert (await sync(client, again["next_token"]))["notes"] == []
+
+
+async def test_changes_after_token(client):
+    parent_id = await create_note(client, "parent")
+    child_id = await create_note(client, "child")
+    other_id = await create_note(client, "other")
+    link_id = await create_link(client, parent_id, child_id)
+    other_link_id = await create_link(client, parent_id, other_id)
+    token = (await sync(client))["next_token"]
+
+    await client.put(f"/notes/{child_id}", json={"title": "renamed"})
+    await client.delete(f"/links/{link_id}")
+    # Удаление заметки удаляет её связи каскадно: они тоже попадают в удалённые
+    await client.delete(f"/notes/{other_id}")
+
+    page = await sync(client, token)
+    assert [(note["id"], note["title"]) for note in page["notes"]] == [(child_id, "renamed")]
+    assert page["links"] == []
+    assert sorted(page["deleted_link_ids"]) == sorted([link_id, other_link_id])
+    assert page["deleted_note_ids"] == [other_id]
+
+
+async def test_deleted_after_creation_in_same_window(client):
+    token = (await sync(client))["next_token"]
+    note_id = await create_note(client, "short-lived")
+    await client.delete(f"/notes/{note_id}")
+
+    page = await sync(client, token)
+    assert page["notes"] == []
+    assert page["deleted_note_ids"] == [note_id]
+
+
+async def test_paging_covers_every_change_once(client):
+    note_ids = [await create_note(client, f"note {i}") for i in range(5)]
+    link_ids = [await create_link(client, note_ids[0], child_id) for child_id in note_ids[1:]]
+
+    pages, token = await sync_all(client, limit=3)
+    assert [len(page["notes"]) + len(page["links"]) for page in pages] == [3, 3, 3]
+    assert [page["has_more"] for page in pages] == [True, True, False]
+    assert [note["id"] for page in pages for note in page["notes"]] == note_ids
+    assert [link["id"] for page in pages for link in page["links"]] == link_ids
+
+    await client.delete(f"/links/{link_ids[0]}")
+    pages, _ = await sync_all(client, token, limit=3)
+    assert [page["deleted_link_ids"] for page in pages] == [[link_ids[0]]]
+
+
+async def test_tombstone_triggers(client):
+    parent_id = await create_note(client, "parent")
+    child_id = await create_note(client, "child")
+    link_id = await create_link(client, parent_id, child_id)
+
+    await client.delete(f"/notes/{parent_id}")
+    async with engine.connect() as connection:
+        rows = (await connection.execute(text(
+            "SELECT kind, entity_id, change_xid > 0 FROM sync_tombstone ORDER BY kind"))).all()
+        child_xid_before = (await connection.execute(
+            text("SELECT change_xid FROM note WHERE id = :id"), {"id": child_id})).scalar()
+    assert [tuple(row) for row in rows] == [("link", link_id, True), ("note", parent_id, True)]
+
+    # Изменение заметки переносит её change_xid вперёд
+    await client.put(f"/notes/{child_id}", json={"content": "changed"})
+    async with engine.connect() as connection:
+        child_xid_after = (await connection.execute(
+            text("SELECT change_xid FROM note WHERE id = :id"), {"id": child_id})).scalar()
+    assert child_xid_after > child_xid_before
+
+
+async def test_invalid_token(client):
+    response = await client.get("/sync", params={"since": "garbage"})
+    assert response.status_code == 400
@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import text
+
+from app.core.config import SETTINGS
+from app.db.session import engine
+from tests.conftest import create_link, create_note
+
+# Пути запросов: без limit — обход всей достижимой части графа (_walk),
+# с небольшим limit — обход в ширину с остановкой по числу узлов (_traversal)
+PATHS = [pytest.param({}, id="walk"), pytest.param({"limit": 100}, id="bounded")]
+
+
+async def build_diamond(client) -> dict:
+    """a -> b -> d -> e, a -> c -> d, a -> e: у d и e несколько путей разной длины."""
+    ids = {name: await create_note(client, name) for name in "abcde"}
+    for parent, child in ("ab", "ac", "bd", "cd", "de", "ae"):
+        await create_link(client, ids[parent], ids[child])
+    return ids
+
+
+def depths(response, ids: dict) -> list:
+    names = {note_id: name for name, note_id in ids.items()}
+    assert response.status_code == 200, response.text
+    return [(names[row["id"]], row["depth"]) for row in response.json()]
+
+
+@pytest.mark.parametrize("params", PATHS)
+async def test_diamond_each_node_once_with_min_depth(client, params):
+    ids = await build_diamond(client)
+    response = await client.get(f"/notes/{ids['a']}/descendants", params=params)
+    assert depths(response, ids) == [("b", 1), ("c", 1), ("e", 1), ("d", 2)]
+    response = await client.get(f"/notes/{ids['e']}/ancestors", params=params)
+    assert depths(response, ids) == [("a", 1), ("d", 1), ("b", 2), ("c", 2)]
+
+
+@pytest.mark.parametrize("params", PATHS)
+async def test_cycle_terminates(client, params):
+    ids = await build_diamond(client)
+    # Цикл в обход проверки create_link (например, старые данные)
+    async with engine.begin() as connection:
+        await connection.execute(text("INSERT INTO notelink (parent_id, child_id) VALUES (:p, :c)"),
+                                 {"p": ids["e"], "c": ids["a"]})
+
+    # Исходная заметка на цикле не входит в собственных потомков и предков
+    response = await client.get(f"/notes/{ids['a']}/descendants", params=params)
+    assert depths(response, ids) == [("b", 1), ("c", 1), ("e", 1), ("d", 2)]
+    response = await client.get(f"/notes/{ids['b']}/ancestors", params=params)
+    assert depths(response, ids) == [("a", 1), ("e", 2), ("d", 3), ("c", 4)]
+
+
+@pytest.mark.parametrize("params", PATHS)
+async def test_max_depth(client, params):
+    ids = await build_diamond(client)
+    response = await client.get(f"/notes/{ids['a']}/descendants", params={**params, "max_depth": 1})
+    assert depths(response, ids) == [("b", 1), ("c", 1), ("e", 1)]
+    response = await client.get(f"/notes/{ids['e']}/ancestors", params={**params, "max_depth": 1})
+    assert depths(response, ids) == [("a", 1), ("d", 1)]
+
+
+@pytest.mark.parametrize("graph_max_nodes", [5000, 1], ids=["bounded", "walk"])
+async def test_limit(client, monkeypatch, graph_max_nodes):
+    monkeypatch.setattr(SETTINGS, "graph_max_nodes", graph_max_nodes)
+    ids = await build_diamond(client)
+    response = await client.get(f"/notes/{ids['a']}/descendants", params={"limit": 2})
+    assert depths(response, ids) == [("b", 1), ("c", 1)]
+    response = await client.get(f"/notes/{ids['e']}/ancestors", params={"limit": 3})
+    assert depths(response, ids) == [("a", 1), ("d", 1), ("b", 2)]
+
+
+async def test_hard_depth_cap(client, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "graph_max_depth", 1)
+    ids = await build_diamond(client)
+    response = await client.get(f"/notes/{ids['a']}/descendants")
+    assert depths(response, ids) == [("b", 1), ("c", 1), ("e", 1)]
+
+
+async def test_unknown_note_has_no_relatives(client):
+    response = await client.get("/notes/12345/descendants")
+    assert response.json() == []